@@ -13,12 +13,16 @@ and uses modular functions from other files:
 import os
 from insert_update import insert_or_update_address
 from get_records import get_all_records
-from get_records_pagination import get_records_pagination , get_total_pages
+from get_records_pagination import KeysetPager , TablePager , print_records
+from page_cache import PageCache , CachedPager
 
 if __name__ == '__main__':
     # Set the environment variable to authenticate with Google Cloud
     os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = 'credentials.json'
 
+    # Pages shown in this session, kept when leaving and entering the pagination menu again
+    page_cache = PageCache()
+
     while True:
         # Main menu options
         user_choice = input("Please Choose an option. \n 1. Get all records \n 2. Insert/Update Address \n 3. Get paginated records \n 4. Exit \n Your Choice: ")
@@ -29,15 +33,32 @@ if __name__ == '__main__':
 
         elif user_choice == '2':
             # Insert a new address or update an existing one
-            insert_or_update_address()
+            emp_id_input = input("Enter employee id: ").strip()
+            if not emp_id_input.isdigit():
+                print("Invalid employee id.")
+                continue
+            insert_or_update_address({
+                "emp_id": int(emp_id_input),
+                "addressline1": input("Enter address line 1: "),
+                "addressline2": input("Enter address line 2: "),
+                "city": input("Enter city: "),
+                "state": input("Enter state: "),
+            })
 
         elif user_choice == '3':
             # Get user-defined page size, default to 5 if invalid
             page_size_input = input("Enter page size (default 5): ")
             page_size = int(page_size_input) if page_size_input.isdigit() else 5
 
+            # Snapshot mode runs the join once and reads pages from its result table
+            snapshot_input = input("Run the query once and page through its result table? (y/N): ").strip().lower()
+            pager = TablePager(page_size) if snapshot_input == 'y' else KeysetPager(page_size)
+
+            # Cached pages, the next page is fetched in the background while the current one is read
+            pager = CachedPager(pager, page_cache)
+
             # Calculate total number of pages
-            total_pages = get_total_pages(page_size=page_size)
+            total_pages = pager.total_pages
 
             # Get starting page from user input (default to 1)
             input_page = input("Enter starting page number (default 1): ")
@@ -46,7 +67,7 @@ if __name__ == '__main__':
             while True:
                 print(f"\n--- Showing Page {current_page} of {total_pages} ---")
                 # Display paginated records for the current page
-                get_records_pagination(page_size=page_size, page_number=current_page)
+                print_records(pager.page(current_page))
 
                 # Navigation prompt
                 nav = input("\nEnter 'next', 'prev', page number to jump, or 'exit' to return to main menu: ").strip().lower()
@@ -62,13 +83,14 @@ if __name__ == '__main__':
                 # Navigate to previous page
                 elif nav == 'prev':
                     
-                    if current_page > 0:
+                    if current_page > 1:
                         current_page -= 1
                     else:
                         print("You're already on the first page.")
 
                 # Exit pagination loop and return to main menu
                 elif nav == 'exit':
+                    pager.close()
                     break
 
                 # Jump to specific page if valid
@@ -0,0 +1,145 @@
+"""
+Process-wide BigQuery client shared by the other modules.
+
+The client, its credentials and its pooled HTTP session are created once, on first use, and reused by every call,
+so a page turn or an insert does not pay a new auth handshake and connection.
+Project and dataset come from the BIGQUERY_PROJECT / BIGQUERY_DATASET environment variables or configure().
+Tests can inject their own client (e.g. a local fake) with set_client().
+"""
+import os
+import threading
+
+# Project and dataset of the tables, can be changed with configure()
+settings = {
+    "project": os.environ.get("BIGQUERY_PROJECT", "bigquery-458315"),
+    "dataset": os.environ.get("BIGQUERY_DATASET", "practice"),
+    "pool_size": int(os.environ.get("BIGQUERY_POOL_SIZE", 10)),
+}
+
+_client = None
+_storage_client = None
+# True once set_client() was called, the storage client is then never created
+_injected = False
+_lock = threading.Lock()
+
+
+def configure(project=None, dataset=None, pool_size=None):
+    """
+    Change the project, dataset or HTTP pool size. The shared client is rebuilt on next use.
+
+    Args:
+        project (str, optional): Google Cloud project of the tables.
+        dataset (str, optional): Dataset of the tables.
+        pool_size (int, optional): Maximum number of pooled HTTP connections.
+    """
+    if project:
+        settings["project"] = project
+    if dataset:
+        settings["dataset"] = dataset
+    if pool_size:
+        settings["pool_size"] = pool_size
+    reset_client()
+
+
+def create_client():
+    """
+    Build a BigQuery client with the default credentials and an HTTP session pooling up to pool_size connections.
+
+    Returns:
+        google.cloud.bigquery.Client: A new client.
+    """
+    import google.auth
+    from google.auth.transport.requests import AuthorizedSession
+    from google.cloud import bigquery
+    from requests.adapters import HTTPAdapter
+
+    # Credentials are looked up once, the token is refreshed by the session when it expires
+    credentials, _ = google.auth.default(scopes=["https://www.googleapis.com/auth/cloud-platform"])
+
+    # Keep-alive connections reused by all requests, enough for concurrent page prefetches
+    session = AuthorizedSession(credentials)
+    adapter = HTTPAdapter(pool_connections=settings["pool_size"], pool_maxsize=settings["pool_size"])
+    session.mount("https://", adapter)
+
+    return bigquery.Client(project=settings["project"], credentials=credentials, _http=session)
+
+
+def get_client(client=None):
+    """
+    Get the shared client, created on first call.
+
+    Args:
+        client (optional): Client to use instead, returned as is. Default is None.
+
+    Returns:
+        google.cloud.bigquery.Client: The shared client, or the given one.
+    """
+    global _client
+    if client is not None:
+        return client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = create_client()
+    return _client
+
+
+def get_storage_client():
+    """
+    Get the shared BigQuery Storage Read API client, used to download results as Arrow in parallel streams.
+
+    Returns:
+        google.cloud.bigquery_storage.BigQueryReadClient: The shared client, None if google-cloud-bigquery-storage
+        is not installed (results are then downloaded through the REST API).
+    """
+    global _storage_client
+    if _storage_client is None and not _injected:
+        try:
+            from google.cloud import bigquery_storage
+        except ImportError:
+            return None
+        with _lock:
+            if _storage_client is None:
+                _storage_client = bigquery_storage.BigQueryReadClient()
+    return _storage_client
+
+
+def set_client(client, storage_client=None):
+    """
+    Replace the shared client, e.g. with a fake client in tests.
+
+    Args:
+        client: Object with the methods of google.cloud.bigquery.Client used by the modules.
+        storage_client (optional): Storage Read API client to use with it. Default is None (REST downloads).
+    """
+    global _client, _storage_client, _injected
+    with _lock:
+        _client = client
+        _storage_client = storage_client
+        _injected = True
+
+
+def reset_client():
+    """
+    Close and forget the shared client, the next get_client() builds a new one.
+    """
+    global _client, _storage_client, _injected
+    with _lock:
+        if _client is not None and hasattr(_client, "close"):
+            _client.close()
+        _client = None
+        _storage_client = None
+        _injected = False
+
+
+def table_id(table):
+    """
+    Full id of a table of the configured dataset.
+
+    Args:
+        table (str): Name of the table, e.g. employee.
+
+    Returns:
+        str: project.dataset.table
+    """
+    return f'{settings["project"]}.{settings["dataset"]}.{table}'
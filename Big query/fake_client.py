@@ -0,0 +1,138 @@
+"""
+Local stand-in for google.cloud.bigquery.Client that serves Arrow record batches, to run the modules without
+a Google Cloud project: query().result() returns a row iterator with a schema and to_arrow_iterable().
+Inject it with bigquery_client.set_client(FakeClient(...)) or pass it as client=.
+
+Run this file to check the CSV and Parquet exports of get_records, including an empty result.
+"""
+import os
+import tempfile
+from datetime import datetime, timezone
+
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from google.cloud import bigquery
+
+from get_records import arrow_schema, export_all_records
+
+
+# Columns returned by all_records_query
+RECORD_SCHEMA = [
+    bigquery.SchemaField("id", "INTEGER"),
+    bigquery.SchemaField("full_name", "STRING"),
+    bigquery.SchemaField("salary", "INTEGER"),
+    bigquery.SchemaField("department_id", "INTEGER"),
+    bigquery.SchemaField("departmentName", "STRING"),
+    bigquery.SchemaField("designation_id", "INTEGER"),
+    bigquery.SchemaField("designationName", "STRING"),
+    bigquery.SchemaField("full_address", "STRING"),
+    bigquery.SchemaField("city", "STRING"),
+    bigquery.SchemaField("state", "STRING"),
+    bigquery.SchemaField("created_at", "TIMESTAMP"),
+    bigquery.SchemaField("updated_at", "TIMESTAMP"),
+]
+
+
+class FakeRowIterator:
+    """
+    Result of a fake query.
+
+    Args:
+        schema (list): SchemaField of every column.
+        batches (list): pyarrow.RecordBatch served by to_arrow_iterable.
+    """
+
+    def __init__(self, schema, batches):
+        self.schema = schema
+        self.batches = batches
+        self.total_rows = sum(batch.num_rows for batch in batches)
+
+    def to_arrow_iterable(self, bqstorage_client=None, max_queue_size=None):
+        yield from self.batches
+
+
+class FakeClient:
+    """
+    Client whose every query returns the same batches. The queries run are kept in queries.
+
+    Args:
+        batches (list): pyarrow.RecordBatch of the result.
+        schema (list, optional): SchemaField of every column. Default is RECORD_SCHEMA.
+    """
+
+    def __init__(self, batches, schema=RECORD_SCHEMA):
+        self.batches = batches
+        self.schema = schema
+        self.queries = []
+
+    def query(self, query, job_config=None):
+        self.queries.append(query)
+        result = FakeRowIterator(self.schema, self.batches)
+        return type("FakeQueryJob", (), {"result": lambda job: result})()
+
+
+def record_batches(num_rows, batch_size=1000):
+    """
+    Employee records made up for the fake client.
+
+    Args:
+        num_rows (int): Number of records.
+        batch_size (int, optional): Records per batch. Default is 1000.
+
+    Returns:
+        list: pyarrow.RecordBatch with the schema of all_records_query.
+    """
+    schema = arrow_schema(RECORD_SCHEMA)
+    now = datetime.now(timezone.utc)
+    batches = []
+    for start in range(0, num_rows, batch_size):
+        ids = range(start + 1, min(start + batch_size, num_rows) + 1)
+        columns = {
+            "id": list(ids),
+            "full_name": [f"First{i} Last{i}" for i in ids],
+            "salary": [1000 * (i % 50 + 1) for i in ids],
+            "department_id": [i % 5 for i in ids],
+            "departmentName": [f"Department {i % 5}" for i in ids],
+            "designation_id": [i % 7 for i in ids],
+            "designationName": [f"Designation {i % 7}" for i in ids],
+            "full_address": [f"{i} Street , Block {i % 9}" for i in ids],
+            "city": ["Ahmedabad"] * len(ids),
+            "state": ["Gujarat"] * len(ids),
+            "created_at": [now] * len(ids),
+            "updated_at": [now] * len(ids),
+        }
+        batches.append(pa.record_batch([pa.array(columns[field.name], type=field.type) for field in schema],
+                                       schema=schema))
+    return batches
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        client = FakeClient(record_batches(2500))
+
+        # Headerless numeric CSV, the input of Process_csv_pl
+        csv_path = os.path.join(tmp_dir, "records.csv")
+        data = export_all_records(csv_path, "csv", header=False, columns=["id", "salary"], client=client)
+        table = pa_csv.read_csv(csv_path, read_options=pa_csv.ReadOptions(autogenerate_column_names=True))
+        assert data["rows"] == table.num_rows == 2500 and table.num_columns == 2
+        assert table.column(0).to_pylist()[:3] == [1, 2, 3]
+
+        # Parquet keeps every column and its type
+        parquet_path = os.path.join(tmp_dir, "records.parquet")
+        data = export_all_records(parquet_path, "parquet", client=client)
+        table = pq.read_table(parquet_path)
+        assert data["rows"] == table.num_rows == 2500 and data["batches"] == 3
+        assert table.schema.names == [field.name for field in RECORD_SCHEMA]
+
+        # An empty result still writes the file, CSV with its header
+        empty = FakeClient([])
+        empty_csv = os.path.join(tmp_dir, "empty.csv")
+        export_all_records(empty_csv, "csv", columns=["id", "salary"], client=empty)
+        with open(empty_csv) as f:
+            assert f.read() == '"id","salary"\n'
+        empty_parquet = os.path.join(tmp_dir, "empty.parquet")
+        export_all_records(empty_parquet, "parquet", client=empty)
+        assert pq.read_table(empty_parquet).num_rows == 0
+
+    print("CSV and Parquet exports OK")
@@ -1,7 +1,55 @@
-from google.cloud import bigquery
+import sys
+import argparse
+from argparse import Namespace
+import pyarrow as pa
 from google.api_core.exceptions import GoogleAPICallError, RetryError
 
-def get_all_records():
+from bigquery_client import get_client, get_storage_client, table_id
+
+# Output formats of export_all_records
+EXPORT_FORMATS = ["csv", "parquet"]
+
+
+def all_records_query():
+    """
+    Builds the query joining every employee with its department, designation and address.
+    There is no ORDER BY, so the result can be read in parallel streams.
+
+    Returns:
+        str: The query.
+    """
+    # Define Table
+    table_employee = table_id("employee")
+    table_address = table_id("address")
+    table_department = table_id("department")
+    table_designation = table_id("designation")
+
+    return f"""
+        SELECT
+        e.id,
+        CONCAT(e.fname, ' ', e.lname) AS full_name,
+        e.salary,
+        e.department_id,
+        d.departmentName,
+        e.designation_id,
+        des.designationName,
+        CONCAT(a.addressline1,' , ',a.addressline2) as full_address,
+        a.city ,
+        a.state ,
+        e.created_at,
+        e.updated_at
+
+        FROM `{table_employee}` e
+        LEFT JOIN `{table_department}` d
+        ON e.department_id = d.department_id
+        LEFT JOIN `{table_designation}` des
+        ON e.designation_id = des.designation_id
+        LEFT JOIN `{table_address}` a
+        ON e.id = a.employee_id
+    """
+
+
+def get_all_records(client=None):
     """
     Fetches all employee records from the BigQuery `employee` table and joins related data
     from the `department`, `designation`, and `address` tables.
@@ -18,48 +66,20 @@ def get_all_records():
 
     The results are printed in a tabular format.
 
+    Args:
+        client (google.cloud.bigquery.Client, optional): Client to use. Default is the shared client.
+
     Raises:
         GoogleAPICallError: If there is an error during the BigQuery API call.
         RetryError: If a retryable error occurs and retry attempts fail.
         Exception: For any other unexpected errors.
     """
     try:
-        # Initialize the Big query client
-        client = bigquery.Client()
-
-        # Define Table
-        project_id = "bigquery-458315"
-        dataset_id = "practice"
-
-        table_employee = f'{project_id}.{dataset_id}.employee'
-        table_address = f'{project_id}.{dataset_id}.address'
-        table_department = f'{project_id}.{dataset_id}.department'
-        table_designation = f'{project_id}.{dataset_id}.designation'
+        # Shared Big query client
+        client = get_client(client)
 
         # Query to get all records
-        query = f"""
-            SELECT
-            e.id,
-            CONCAT(e.fname, ' ', e.lname) AS full_name,
-            e.salary,
-            e.department_id,
-            d.departmentName,
-            e.designation_id,
-            des.designationName,
-            CONCAT(a.addressline1,' , ',a.addressline2) as full_address,
-            a.city ,
-            a.state ,
-            e.created_at,
-            e.updated_at
-
-            FROM `{table_employee}` e
-            LEFT JOIN `{table_department}` d
-            ON e.department_id = d.department_id
-            LEFT JOIN `{table_designation}` des
-            ON e.designation_id = des.designation_id
-            LEFT JOIN `{table_address}` a
-            ON e.id = a.employee_id
-        """
+        query = all_records_query()
 
         # Run the query
         query_job = client.query(query)
@@ -84,4 +104,132 @@ def get_all_records():
         print(f"BigQuery API Error: {e}")
     # If any unexpected error occured
     except Exception as e:
-        print(f"Unexpected Error: {e}")
\ No newline at end of file
+        print(f"Unexpected Error: {e}")
+
+
+def arrow_schema(bq_schema):
+    """
+    Arrow schema of a query result, the same conversion the client uses for empty results.
+
+    Args:
+        bq_schema (list): SchemaField of every column.
+
+    Returns:
+        pyarrow.Schema: The schema, None if a column has no Arrow type.
+    """
+    from google.cloud.bigquery import _pandas_helpers
+    return _pandas_helpers.bq_to_arrow_schema(bq_schema)
+
+
+def new_writer(sink, schema, file_format, header):
+    """
+    Args:
+        sink (str or file): Path or binary file to write to.
+        schema (pyarrow.Schema): Schema of the batches.
+        file_format (str): csv or parquet.
+        header (bool): Write the column names as first CSV line.
+
+    Returns:
+        pyarrow.csv.CSVWriter or pyarrow.parquet.ParquetWriter: Writer of record batches.
+    """
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+
+    if file_format == "parquet":
+        return pq.ParquetWriter(sink, schema)
+    return pa_csv.CSVWriter(sink, schema, write_options=pa_csv.WriteOptions(include_header=header))
+
+
+def export_all_records(output="-", file_format="csv", header=True, columns=None, client=None,
+                       bqstorage_client=None, max_queue_size=4):
+    """
+    Exports all employee records as Arrow record batches written in bulk to a CSV or Parquet file, or CSV on stdout.
+    With the BigQuery Storage Read API the result is downloaded in parallel streams, otherwise page by page
+    through the REST API. At most max_queue_size batches wait to be written, so memory does not grow with the table.
+    A CSV without header and with numeric columns only (e.g. columns=["id", "salary"]) can be read by Process_csv_pl.
+
+    Args:
+        output (str, optional): Path of the output file, "-" for stdout. Default is "-".
+        file_format (str, optional): csv or parquet. Default is csv.
+        header (bool, optional): Write the column names as first CSV line. Default is True.
+        columns (list, optional): Columns to export, in this order. Default is None (all columns).
+        client (google.cloud.bigquery.Client, optional): Client to use. Default is the shared client.
+        bqstorage_client (optional): Storage Read API client. Default is the shared one, if installed.
+        max_queue_size (int, optional): Downloaded batches waiting to be written. Default is 4.
+
+    Returns:
+        dict: Number of rows and batches written, output and format.
+
+    Raises:
+        ValueError: If the format is unknown or parquet is written to stdout.
+        GoogleAPICallError: If there is an error during the BigQuery API call.
+        RetryError: If a retryable error occurs and retry attempts fail.
+    """
+    if file_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown format {file_format}, expected one of {', '.join(EXPORT_FORMATS)}")
+    if file_format == "parquet" and output == "-":
+        raise ValueError("Parquet needs an output file")
+
+    writer = None
+    rows = 0
+    batches = 0
+    try:
+        # Shared Big query clients
+        client = get_client(client)
+        if bqstorage_client is None:
+            bqstorage_client = get_storage_client()
+
+        # Run the query and download the result as Arrow record batches
+        result = client.query(all_records_query()).result()
+        record_batches = result.to_arrow_iterable(bqstorage_client=bqstorage_client, max_queue_size=max_queue_size)
+
+        # Writer made from the schema of the result before any row arrives, an empty result still gives
+        # a file (with its CSV header) for the next step to read
+        schema = arrow_schema(result.schema)
+        if schema is not None and columns:
+            schema = pa.schema([schema.field(column) for column in columns])
+        sink = sys.stdout.buffer if output == "-" else output
+        if schema is not None:
+            writer = new_writer(sink, schema, file_format, header)
+
+        for batch in record_batches:
+            if columns:
+                batch = batch.select(columns)
+
+            # A column type BigQuery has no Arrow type for: schema of the first batch
+            if writer is None:
+                schema = batch.schema
+                writer = new_writer(sink, schema, file_format, header)
+            # Storage API batches may differ from the converted schema in nullability or metadata
+            elif not batch.schema.equals(schema):
+                batch = batch.cast(schema)
+            writer.write_batch(batch)
+            rows += batch.num_rows
+            batches += 1
+
+        return {"rows": rows, "batches": batches, "output": output, "format": file_format}
+
+    # If there is errror related to big query
+    except (GoogleAPICallError, RetryError) as e:
+        print(f"BigQuery API Error: {e}", file=sys.stderr)
+        raise
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+if __name__ == '__main__':
+    # Set up command line argument parsing
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-o',type=str,default="-",help="Output file, - for stdout")
+    parser.add_argument('--format',type=str,default="csv",choices=EXPORT_FORMATS,help="Output format")
+    parser.add_argument('--no-header',action='store_true',help="Do not write the CSV header")
+    parser.add_argument('-c',type=str,default=None,help="Comma separated columns to export e.g. id,salary")
+
+    # Parse the command-line arguments
+    args:Namespace = parser.parse_args()
+
+    data = export_all_records(args.o, args.format, not args.no_header, args.c.split(',') if args.c else None)
+
+    # Keep stdout for the exported rows
+    print(f'Exported {data["rows"]} rows in {data["batches"]} batches to {data["output"]}', file=sys.stderr)
@@ -1,100 +1,140 @@
 import math
+import time
 from google.cloud import bigquery
 from google.api_core.exceptions import GoogleAPICallError, RetryError
 
+from bigquery_client import get_client, table_id
 
-def get_total_pages(page_size):
+
+# Tables read by the records query, their modification times make the data version
+RECORD_TABLES = ["employee", "address", "department", "designation"]
+
+# Number of employees with the time it was counted, per employee table
+total_rows_cache = {}
+
+
+def records_query(employee_page):
+    """
+    Builds the query joining one page of employees with their department, designation and address.
+    Only the employees of the page are joined, so the cost of a page does not grow with the page number.
+
+    Args:
+        employee_page (str): Query selecting the employees of the page.
+
+    Returns:
+        str: The query, ordered by employee id.
+    """
+    # Full table references
+    table_address = table_id("address")
+    table_department = table_id("department")
+    table_designation = table_id("designation")
+
+    return f"""
+        WITH page AS ({employee_page})
+        SELECT
+        e.id,
+        CONCAT(e.fname, ' ', e.lname) AS full_name,
+        e.salary,
+        e.department_id,
+        d.departmentName,
+        e.designation_id,
+        des.designationName,
+        CONCAT(a.addressline1,' , ',a.addressline2) as full_address,
+        a.city ,
+        a.state ,
+        e.created_at,
+        e.updated_at
+
+        FROM page e
+        LEFT JOIN `{table_department}` d
+        ON e.department_id = d.department_id
+        LEFT JOIN `{table_designation}` des
+        ON e.designation_id = des.designation_id
+        LEFT JOIN `{table_address}` a
+        ON e.id = a.employee_id
+        ORDER BY e.id ASC
+    """
+
+
+def get_total_pages(page_size, client=None, ttl=300):
     """
        Calculates the total number of pages available for paginated results
        based on the number of rows in the employee table.
+       The row count is kept for ttl seconds, so entering the pagination menu again runs no query.
 
        Args:
            page_size (int): Number of records per page.
+           client (google.cloud.bigquery.Client, optional): Client to use. Default is the shared client.
+           ttl (float, optional): Seconds the row count is reused. Default is 300, 0 always counts.
 
        Returns:
            int: Total number of pages.
        """
+    table_employee = table_id('employee')
 
-    # Initialize bigquery client
-    client = bigquery.Client()
+    cached = total_rows_cache.get(table_employee)
+    if cached and time.time() - cached[1] < ttl:
+        total_row = cached[0]
+    else:
+        # Shared bigquery client
+        client = get_client(client)
 
-    # Query to get total rows
-    count_query = "select count(*) as total from `bigquery-458315.practice.employee`"
+        # Query to get total rows
+        count_query = f"select count(*) as total from `{table_employee}`"
 
-    # Execute the query
-    count_job = client.query(count_query)
+        # Execute the query
+        count_job = client.query(count_query)
 
-    # Get result from query
-    result = count_job.result()
+        # Get result from query
+        result = count_job.result()
 
-    # Get total_row
-    total_row = [row.total for row in result][0]
+        # Get total_row
+        total_row = [row.total for row in result][0]
+        total_rows_cache[table_employee] = (total_row, time.time())
 
     # Calculate total pages
     total_pages = math.ceil(total_row / page_size)
     return total_pages
 
 
-def get_records_with_pagination(page_size,page_number):
+def get_records_with_pagination(page_size,page_number, client=None):
     """
     Fetches paginated employee records from BigQuery with joined address,
-    department, and designation tables.
+    department, and designation tables, by page number (LIMIT / OFFSET).
+    Used to jump to a page, next and previous pages are cheaper with get_records_keyset.
 
     Args:
         page_size (int): Number of records per page.
         page_number (int): Page number to fetch.
+        client (google.cloud.bigquery.Client, optional): Client to use. Default is the shared client.
 
     Returns:
         google.cloud.bigquery.table.RowIterator: Result set from BigQuery.
     """
 
-    # Initialize bigquery client
-    client = bigquery.Client()
-
-    # Define Table
-    project_id = "bigquery-458315"
-    dataset_id = "practice"
-
-    # Full table references
-    table_employee = f'{project_id}.{dataset_id}.employee'
-    table_address = f'{project_id}.{dataset_id}.address'
-    table_department = f'{project_id}.{dataset_id}.department'
-    table_designation = f'{project_id}.{dataset_id}.designation'
+    # Shared bigquery client
+    client = get_client(client)
 
     try:
         # Calculate offset
         offset = (page_number-1) * page_size
 
-        # Make query to get records
-        query = f"""
-            SELECT
-            e.id,
-            CONCAT(e.fname, ' ', e.lname) AS full_name,
-            e.salary,
-            e.department_id,
-            d.departmentName,
-            e.designation_id,
-            des.designationName,
-            CONCAT(a.addressline1,' , ',a.addressline2) as full_address,
-            a.city ,
-            a.state ,
-            e.created_at,
-            e.updated_at
-
-            FROM `{table_employee}` e
-            LEFT JOIN `{table_department}` d
-            ON e.department_id = d.department_id
-            LEFT JOIN `{table_designation}` des
-            ON e.designation_id = des.designation_id
-            LEFT JOIN `{table_address}` a
-            ON e.id = a.employee_id
-            ORDER BY e.id ASC
-            LIMIT {page_size}
-            OFFSET {offset}
-        """
+        # Make query to get records of the employees of the page
+        query = records_query(f"""
+            SELECT * FROM `{table_id("employee")}`
+            ORDER BY id ASC
+            LIMIT @page_size
+            OFFSET @offset
+        """)
+
+        # Make query Parameters
+        job_config = bigquery.QueryJobConfig(query_parameters=[
+            bigquery.ScalarQueryParameter("page_size", "INT64", page_size),
+            bigquery.ScalarQueryParameter("offset", "INT64", offset),
+        ])
 
         # Execute the query
-        query_job = client.query(query)
+        query_job = client.query(query, job_config=job_config)
 
         # Get result from query
         result = query_job.result()
@@ -109,17 +149,192 @@ def get_records_with_pagination(page_size,page_number):
     except Exception as e:
         print(f"Unexpected Error: {e}")
 
-def get_records_pagination(page_size,page_number):
+
+def get_records_keyset(page_size, after_id=None, before_id=None, client=None):
     """
-        Displays the paginated records from BigQuery in a formatted table.
+    Fetches the page of employee records right after or right before an employee id (keyset / cursor pagination).
+    The employee table is read from the cursor with WHERE id > @after_id, no rows are skipped with OFFSET,
+    so the next and previous pages cost the same on every page.
+
+    Args:
+        page_size (int): Number of employees per page.
+        after_id (int, optional): Last employee id of the previous page. Default is None (first page).
+        before_id (int, optional): First employee id of the next page, to go backwards. Default is None.
+        client (google.cloud.bigquery.Client, optional): Client to use. Default is the shared client.
+
+    Returns:
+        list: Rows of the page ordered by employee id, None if the query failed.
+    """
+
+    # Shared bigquery client
+    client = get_client(client)
+
+    try:
+        query_parameters = [bigquery.ScalarQueryParameter("page_size", "INT64", page_size)]
+        if before_id is not None:
+            # The page_size employees just before the cursor, put back in ascending order by records_query
+            employee_page = f"""
+                SELECT * FROM `{table_id("employee")}`
+                WHERE id < @before_id
+                ORDER BY id DESC
+                LIMIT @page_size
+            """
+            query_parameters.append(bigquery.ScalarQueryParameter("before_id", "INT64", before_id))
+        elif after_id is not None:
+            employee_page = f"""
+                SELECT * FROM `{table_id("employee")}`
+                WHERE id > @after_id
+                ORDER BY id ASC
+                LIMIT @page_size
+            """
+            query_parameters.append(bigquery.ScalarQueryParameter("after_id", "INT64", after_id))
+        else:
+            employee_page = f"""
+                SELECT * FROM `{table_id("employee")}`
+                ORDER BY id ASC
+                LIMIT @page_size
+            """
+
+        # Execute the query
+        job_config = bigquery.QueryJobConfig(query_parameters=query_parameters)
+        query_job = client.query(records_query(employee_page), job_config=job_config)
+
+        return list(query_job.result())
+
+    # Error related to GoogleAPI
+    except (GoogleAPICallError, RetryError) as e:
+        print(f"BigQuery API Error: {e}")
+
+    # If any unexpected error occured
+    except Exception as e:
+        print(f"Unexpected Error: {e}")
+
+
+class KeysetPager:
+    """
+    Pages of employee records by page number, fetched with keyset queries where a neighbouring page is known.
+    The first and last employee id of every page already shown are kept, so next, previous and revisited pages
+    start from a cursor. Only a jump to a page far from the known ones falls back to OFFSET.
 
+    Args:
+        page_size (int): Number of employees per page.
+        client (google.cloud.bigquery.Client, optional): Client to use. Default is the shared client.
+    """
+
+    def __init__(self, page_size, client=None):
+        self.page_size = page_size
+        self.client = client
+        # page number -> (first employee id, last employee id)
+        self.bounds = {}
+        self.total_pages = get_total_pages(page_size, client)
+
+    def version(self):
+        """
+        Returns:
+            str: Latest modification time of the joined tables, read from their metadata (not a query).
+        """
+        client = get_client(self.client)
+        return max(client.get_table(table_id(table)).modified for table in RECORD_TABLES).isoformat()
+
+    def page(self, page_number):
+        """
         Args:
-            page_size (int): Number of records per page.
-            page_number (int): Page number to display.
+            page_number (int): Page number, from 1.
+
+        Returns:
+            list: Rows of the page, None if the query failed.
         """
-    # Get records
-    records  = get_records_with_pagination(page_size , page_number)
+        if page_number == 1:
+            rows = get_records_keyset(self.page_size, client=self.client)
+        elif page_number - 1 in self.bounds:
+            rows = get_records_keyset(self.page_size, after_id=self.bounds[page_number - 1][1], client=self.client)
+        elif page_number + 1 in self.bounds:
+            rows = get_records_keyset(self.page_size, before_id=self.bounds[page_number + 1][0], client=self.client)
+        else:
+            result = get_records_with_pagination(self.page_size, page_number, self.client)
+            rows = list(result) if result is not None else None
 
+        if rows:
+            self.bounds[page_number] = (rows[0].id, rows[-1].id)
+        return rows
+
+
+class TablePager:
+    """
+    Runs the join once into a table and pages through the table with list_rows.
+    Reading rows of a table is not a query, so page turns are not billed and take the same time on every page.
+    Next pages use the page token of the previous read, other pages start at their row index.
+
+    Args:
+        page_size (int): Number of rows per page.
+        client (google.cloud.bigquery.Client, optional): Client to use. Default is the shared client.
+        destination (str, optional): Table to write the result to, replaced if it exists.
+            Default is None (the temporary table of the query, kept about a day).
+    """
+
+    def __init__(self, page_size, client=None, destination=None):
+        self.page_size = page_size
+        self.client = get_client(client)
+
+        # Every employee with its joined records, in one query
+        query = records_query(f"SELECT * FROM `{table_id('employee')}`")
+        job_config = bigquery.QueryJobConfig()
+        if destination:
+            job_config.destination = destination
+            job_config.write_disposition = bigquery.WriteDisposition.WRITE_TRUNCATE
+        query_job = self.client.query(query, job_config=job_config)
+        query_job.result()
+
+        self.table = self.client.get_table(query_job.destination)
+        self.total_rows = self.table.num_rows
+        self.total_pages = max(1, math.ceil(self.total_rows / page_size))
+        # page number -> page token to read it
+        self.tokens = {}
+
+    def version(self):
+        """
+        Returns:
+            str: Id of the result table, its content never changes.
+        """
+        return self.table.full_table_id
+
+    def page(self, page_number):
+        """
+        Args:
+            page_number (int): Page number, from 1.
+
+        Returns:
+            list: Rows of the page, None if the read failed.
+        """
+        try:
+            if page_number in self.tokens:
+                rows = self.client.list_rows(self.table, max_results=self.page_size, page_size=self.page_size,
+                                             page_token=self.tokens[page_number])
+            else:
+                rows = self.client.list_rows(self.table, max_results=self.page_size, page_size=self.page_size,
+                                             start_index=(page_number - 1) * self.page_size)
+            # Read one page and keep the token of the next one
+            result = next(rows.pages, None)
+            if rows.next_page_token:
+                self.tokens[page_number + 1] = rows.next_page_token
+            return list(result) if result is not None else []
+
+        # Error related to GoogleAPI
+        except (GoogleAPICallError, RetryError) as e:
+            print(f"BigQuery API Error: {e}")
+
+        # If any unexpected error occured
+        except Exception as e:
+            print(f"Unexpected Error: {e}")
+
+
+def print_records(records):
+    """
+        Displays records from BigQuery in a formatted table.
+
+        Args:
+            records (iterable): Rows to display.
+        """
     # If records exist
     if records:
         print("EmployeeId | FullName  | Salary | DepartmentName | DesignationName | FullAddress | City | State | CreatedAt | UpdatedAt")
@@ -130,4 +345,18 @@ def get_records_pagination(page_size,page_number):
                   f"{row.full_address} | {row.city} | {row.state} | {row.created_at} | {row.updated_at}")
     else:
         # If not records found
-        print("No records found on this page.")
\ No newline at end of file
+        print("No records found on this page.")
+
+
+def get_records_pagination(page_size,page_number, client=None):
+    """
+        Displays the paginated records from BigQuery in a formatted table.
+
+        Args:
+            page_size (int): Number of records per page.
+            page_number (int): Page number to display.
+            client (google.cloud.bigquery.Client, optional): Client to use. Default is the shared client.
+        """
+    # Get records
+    records  = get_records_with_pagination(page_size , page_number, client)
+    print_records(records)
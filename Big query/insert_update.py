@@ -1,19 +1,178 @@
+import csv
+import uuid
+import argparse
+from argparse import Namespace
 from google.cloud import bigquery
-from datetime import datetime
+from datetime import datetime, timezone
 from google.api_core.exceptions import GoogleAPICallError, RetryError
 
+from bigquery_client import get_client, table_id
 
-def insert_or_update_address(address_data):
+
+# Columns of an address record, in the staging table
+ADDRESS_SCHEMA = [
+    bigquery.SchemaField("employee_id", "INT64", mode="REQUIRED"),
+    bigquery.SchemaField("addressline1", "STRING"),
+    bigquery.SchemaField("addressline2", "STRING"),
+    bigquery.SchemaField("city", "STRING"),
+    bigquery.SchemaField("state", "STRING"),
+]
+
+
+def merge_query(source):
+    """
+    Builds the MERGE applying addresses to the address table: the address of an employee is updated if it
+    exists, inserted otherwise. New addresses get the id @id_base + their row number in the source.
+
+    Args:
+        source (str): Query selecting employee_id, addressline1, addressline2, city and state, one row per employee.
+
+    Returns:
+        str: The MERGE statement.
+    """
+    return f"""
+        MERGE `{table_id("address")}` a
+        USING (
+            SELECT s.*, @id_base + ROW_NUMBER() OVER (ORDER BY s.employee_id) AS new_id
+            FROM ({source}) s
+        ) s
+        ON a.employee_id = s.employee_id
+        WHEN MATCHED THEN UPDATE SET
+            addressline1 = s.addressline1,
+            addressline2 = s.addressline2,
+            city = s.city,
+            state = s.state
+        WHEN NOT MATCHED THEN
+            INSERT (id, employee_id, addressline1, addressline2, city, state)
+            VALUES (s.new_id, s.employee_id, s.addressline1, s.addressline2, s.city, s.state)
+    """
+
+
+def touch_employees_query(source):
+    """
+    Builds the UPDATE setting updated_at of every employee of the source in one statement.
+
+    Args:
+        source (str): Query selecting the employee_id of the changed addresses.
+
+    Returns:
+        str: The UPDATE statement, the time is the @updated_at parameter.
+    """
+    return f"""
+        UPDATE `{table_id("employee")}` SET updated_at = @updated_at
+        WHERE id IN (SELECT employee_id FROM ({source}))
+    """
+
+
+def apply_addresses(source, query_parameters, client):
+    """
+    Runs the MERGE of the addresses and the updated_at update of their employees.
+
+    Args:
+        source (str): Query selecting the addresses, see merge_query.
+        query_parameters (list): Parameters used by the source.
+        client (google.cloud.bigquery.Client): Client to use.
+
+    Returns:
+        dict: Number of address rows merged and of employees updated.
+    """
+    # Ids of new addresses keep the timestamp format, followed by a row number
+    id_base = int(datetime.now().strftime("%Y%m%d%H%M%S")) * 100000
+    merge_config = bigquery.QueryJobConfig(query_parameters=query_parameters + [
+        bigquery.ScalarQueryParameter("id_base", "INT64", id_base),
+    ])
+    merged = client.query(merge_query(source), job_config=merge_config).result()
+
+    update_config = bigquery.QueryJobConfig(query_parameters=query_parameters + [
+        bigquery.ScalarQueryParameter("updated_at", "TIMESTAMP", datetime.now(timezone.utc)),
+    ])
+    updated = client.query(touch_employees_query(source), job_config=update_config).result()
+
+    return {"merged": merged.num_dml_affected_rows or 0, "employees_updated": updated.num_dml_affected_rows or 0}
+
+
+def address_rows(addresses):
+    """
+    Converts address records to rows of the staging table. When an employee has several records the last one is kept,
+    a MERGE fails if two source rows match the same address.
+
+    Args:
+        addresses (iterable): Dictionaries with the keys of insert_or_update_address.
+
+    Returns:
+        list: One row per employee.
+
+    Raises:
+        ValueError: If a record has no emp_id.
+    """
+    rows = {}
+    for address_data in addresses:
+        if address_data.get("emp_id") in (None, ""):
+            raise ValueError(f"Address without emp_id: {address_data}")
+        rows[int(address_data["emp_id"])] = {
+            "employee_id": int(address_data["emp_id"]),
+            "addressline1": address_data.get("addressline1"),
+            "addressline2": address_data.get("addressline2"),
+            "city": address_data.get("city"),
+            "state": address_data.get("state"),
+        }
+    return list(rows.values())
+
+
+def upsert_addresses(addresses, client=None):
+    """
+    Inserts or updates the addresses of many employees at once.
+    The records are loaded into a staging table in one load job (no streaming buffer, no per-row DML),
+    applied with one MERGE, then updated_at of their employees is set with one UPDATE.
+    Four jobs in total whatever the number of records, the staging table is deleted afterwards.
+
+    Args:
+        addresses (iterable): Dictionaries with the keys emp_id, addressline1, addressline2, city and state.
+        client (google.cloud.bigquery.Client, optional): Client to use. Default is the shared client.
+
+    Returns:
+        dict: Number of addresses sent, address rows merged and employees updated, None if BigQuery failed.
+
+    Raises:
+        ValueError: If a record has no emp_id.
+    """
+    rows = address_rows(addresses)
+    if not rows:
+        return {"addresses": 0, "merged": 0, "employees_updated": 0}
+
+    # Shared bigquery client
+    client = get_client(client)
+
+    # One staging table per call, so concurrent syncs do not overwrite each other
+    staging = table_id(f"address_staging_{uuid.uuid4().hex}")
+    try:
+        # Load every record in one job
+        load_config = bigquery.LoadJobConfig(schema=ADDRESS_SCHEMA,
+                                             write_disposition=bigquery.WriteDisposition.WRITE_TRUNCATE)
+        client.load_table_from_json(rows, staging, job_config=load_config).result()
+
+        result = apply_addresses(f"SELECT * FROM `{staging}`", [], client)
+        print(f'{result["merged"]} addresses merged, {result["employees_updated"]} employees updated_at timestamp updated.')
+        return {"addresses": len(rows), **result}
+
+    # If there is error related to big query
+    except (GoogleAPICallError, RetryError) as e:
+        print(f"BigQuery API Error: {e}")
+
+    # If any unexpected error occurred
+    except Exception as e:
+        print(f"Unexpected Error: {e}")
+
+    finally:
+        client.delete_table(staging, not_found_ok=True)
+
+
+def insert_or_update_address(address_data, client=None):
     """
     Inserts or updates an employee's address in the BigQuery `address` table and updates the `updated_at` timestamp in the `employee` table.
 
-    This function performs the following steps:
-    1. Checks if an address already exists for the given employee ID in the `address` table.
-    2. If the address exists:
-        - Updates the existing address with the new details provided in `address_data`.
-    3. If the address does not exist:
-        - Inserts a new address into the `address` table.
-    4. Updates the `updated_at` field in the `employee` table to the current timestamp.
+    The address is applied with one parameterized MERGE (updated if the employee has one, inserted otherwise),
+    then `updated_at` of the employee is set. For many addresses use upsert_addresses.
 
     Args:
         address_data (dict): A dictionary containing the following keys:
@@ -22,6 +181,7 @@ def insert_or_update_address(address_data):
             - addressline2 (str): The second line of the address.
             - city (str): The city of the address.
             - state (str): The state of the address.
+        client (google.cloud.bigquery.Client, optional): Client to use. Default is the shared client.
 
     Returns:
         None
@@ -32,85 +192,29 @@ def insert_or_update_address(address_data):
         Exception: For any other unexpected errors.
     """
     try:
-        # Initialize bigquery client
-        client = bigquery.Client()
-
-        # Define Table
-        project_id = "bigquery-458315"
-        dataset_id = "practice"
-        table_id = "address"
-        employeetable_id = "employee"
-        table_ref = f'{project_id}.{dataset_id}.{table_id}'
-        table_employee = f'{project_id}.{dataset_id}.{employeetable_id}'
-
-        # Check if address already exist
-        check_query = f"""
-                SELECT COUNT(*) as count FROM {table_ref} where employee_id = @emp_id
-                """
+        # Shared bigquery client
+        client = get_client(client)
+
+        # The address as a one row source, every value is a query parameter
+        source = """
+            SELECT @emp_id AS employee_id, @addressline1 AS addressline1, @addressline2 AS addressline2,
+            @city AS city, @state AS state
+        """
+
         # Make query Parameters
-        query_parameters =[
-            bigquery.ScalarQueryParameter("emp_id","INT64",address_data["emp_id"])
-            ]
-
-        # Query Job Config
-        job_config = bigquery.QueryJobConfig(query_parameters=query_parameters)
-
-        # Run the query
-        check_job = client.query(check_query,job_config=job_config)
-
-        # query result
-        query_result = check_job.result()
-        # Check if address exists
-        address_exists = [row.count for row in query_result][0] > 0
-
-        if address_exists:
-            # update existing address
-            update_query =f"""
-            UPDATE {table_ref} SET
-                    addressline1 = {address_data["addressline1"]},
-                    addressline2 ={address_data["addressline2"]},
-                    city = {address_data["city"]},
-                    state = {address_data["state"]}
-                    WHERE emp_id = {address_data["emp_id"]}
-            """
-        else:
-            # Insert new address
-            rows_to_insert =[
-                {
-                    "id" : int(datetime.now().strftime("%Y%m%d%H%M%S")),
-                    "employee_id" : address_data["emp_id"],
-                    "addressline1" : address_data["addressline1"],
-                    "addressline2" : address_data["addressline2"],
-                    "city" : address_data["city"],
-                    "state" :  address_data["state"]
-                }
-                ]
-            # Run the query
-            errors = client.insert_rows_json(table_ref,rows_to_insert)
-
-            # Check if there is any error returned by above query
-            if not errors:
-                print("New address inserted.")
-            else:
-                print("Error inserting address",errors)
-                return
-
-        # Update updated_at in employee table
-        update_employee_query = f"""
-            UPDATE {table_employee} SET updated_at = CURRENT_TIMESTAMP() WHERE id = {address_data["emp_id"]}
-            """
-
-        # Run the query
-        query_result = client.query(update_employee_query)
-
-        # Get query result
-        result = query_result.result()
-
-        # Get number of rows that were updated
-        affected_rows = result.num_dml_affected_rows
+        query_parameters = [
+            bigquery.ScalarQueryParameter("emp_id", "INT64", address_data["emp_id"]),
+            bigquery.ScalarQueryParameter("addressline1", "STRING", address_data["addressline1"]),
+            bigquery.ScalarQueryParameter("addressline2", "STRING", address_data["addressline2"]),
+            bigquery.ScalarQueryParameter("city", "STRING", address_data["city"]),
+            bigquery.ScalarQueryParameter("state", "STRING", address_data["state"]),
+        ]
+
+        # Run the MERGE and the update of the employee
+        result = apply_addresses(source, query_parameters, client)
 
         # Check if update happened
-        if affected_rows:
+        if result["employees_updated"]:
             print(f'Employee {address_data["emp_id"]} updated_at timestamp updated.')
         else:
             print("Employee not updated...")
@@ -121,4 +225,17 @@ def insert_or_update_address(address_data):
 
     # If any unexpected error occurred
     except Exception as e:
-        print(f"Unexpected Error: {e}")
\ No newline at end of file
+        print(f"Unexpected Error: {e}")
+
+
+if __name__ == '__main__':
+    # Set up command line argument parsing
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-f',type=str,required=True,help="CSV file of addresses with columns emp_id,addressline1,addressline2,city,state")
+
+    # Parse the command-line arguments
+    args:Namespace = parser.parse_args()
+
+    with open(args.f, newline="") as file:
+        data = upsert_addresses(csv.DictReader(file))
+    print(data)
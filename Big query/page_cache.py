@@ -0,0 +1,142 @@
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class PageCache:
+    """
+    Least recently used cache of pages shared by the pagers of a session.
+    Keys are (pager kind, page size, page number, data version), so a change of the tables never serves stale pages.
+
+    Args:
+        capacity (int, optional): Maximum number of pages kept. Default is 64.
+    """
+
+    def __init__(self, capacity=64):
+        self.capacity = capacity
+        self.pages = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self.pages
+
+    def get(self, key):
+        """
+        Args:
+            key (tuple): Key of the page.
+
+        Returns:
+            list: Rows of the page, None if it is not cached.
+        """
+        with self._lock:
+            if key not in self.pages:
+                self.misses += 1
+                return None
+            # Mark as recently used
+            self.pages.move_to_end(key)
+            self.hits += 1
+            return self.pages[key]
+
+    def put(self, key, rows):
+        """
+        Store a page, dropping the least recently used pages above the capacity.
+
+        Args:
+            key (tuple): Key of the page.
+            rows (list): Rows of the page.
+        """
+        with self._lock:
+            self.pages[key] = rows
+            self.pages.move_to_end(key)
+            while len(self.pages) > self.capacity:
+                self.pages.popitem(last=False)
+
+
+class CachedPager:
+    """
+    Wraps a KeysetPager or TablePager: pages already shown come from the cache, and the next pages are fetched
+    on a background thread while the user reads the current one, so next, prev and revisits need no query.
+    The data version of the pager is checked at most every version_ttl seconds.
+
+    Args:
+        pager (KeysetPager or TablePager): Pager fetching the pages from BigQuery.
+        cache (PageCache, optional): Cache shared with other pagers. Default is a new cache.
+        prefetch (int, optional): Number of pages fetched ahead. Default is 1.
+        version_ttl (float, optional): Seconds a data version is trusted before it is checked again. Default is 60.
+    """
+
+    def __init__(self, pager, cache=None, prefetch=1, version_ttl=60):
+        self.pager = pager
+        self.cache = cache if cache is not None else PageCache()
+        self.prefetch = prefetch
+        self.version_ttl = version_ttl
+        self.kind = type(pager).__name__
+        self._version = None
+        self._version_time = 0
+        # Pages being fetched in the background, key -> future
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max(1, prefetch), thread_name_prefix="prefetch")
+
+    @property
+    def total_pages(self):
+        return self.pager.total_pages
+
+    def version(self):
+        """
+        Returns:
+            str: Version of the data of the pager, refreshed after version_ttl seconds.
+        """
+        if self._version is None or time.time() - self._version_time > self.version_ttl:
+            self._version = str(self.pager.version())
+            self._version_time = time.time()
+        return self._version
+
+    def _key(self, page_number):
+        return (self.kind, self.pager.page_size, page_number, self.version())
+
+    def _fetch(self, key, page_number):
+        rows = self.pager.page(page_number)
+        # Failed reads are not cached, the next visit tries again
+        if rows is not None:
+            self.cache.put(key, rows)
+        return rows
+
+    def page(self, page_number):
+        """
+        Args:
+            page_number (int): Page number, from 1.
+
+        Returns:
+            list: Rows of the page, None if the query failed.
+        """
+        key = self._key(page_number)
+        rows = self.cache.get(key)
+        if rows is None:
+            # Wait for a prefetch of this page if there is one
+            with self._lock:
+                future = self._inflight.get(key)
+            rows = future.result() if future else self._fetch(key, page_number)
+
+        self._prefetch_after(page_number)
+        return rows
+
+    def _prefetch_after(self, page_number):
+        for next_page in range(page_number + 1, min(page_number + self.prefetch, self.total_pages) + 1):
+            key = self._key(next_page)
+            with self._lock:
+                if key in self._inflight or key in self.cache:
+                    continue
+                future = self.executor.submit(self._fetch, key, next_page)
+                self._inflight[key] = future
+            future.add_done_callback(lambda _, key=key: self._inflight.pop(key, None))
+
+    def close(self):
+        """
+        Stop the prefetches that did not start yet.
+        """
+        self.executor.shutdown(wait=False, cancel_futures=True)
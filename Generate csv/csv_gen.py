@@ -1,35 +1,180 @@
-import csv
-import random
-import argparse
 import os
+import shutil
+import argparse
+import functools
 import datetime
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 from argparse import Namespace
 
 
-def generate_random_row(column):
+# Range of the random values
+LOW = 1
+HIGH = 1000
+
+# Same row ending as csv.writer
+LINE_TERMINATOR = b'\r\n'
+
+# Fixed size of a shard, by rows or by megabytes
+SHARD_ROWS = 250_000
+SHARD_SIZE_MB = 64
+
+
+@functools.lru_cache(maxsize=None)
+def record_table(low, high):
     """
-       Generate a list of random integers between 1 and 1000.
+       Build the formatted record of every value between low and high: right aligned ASCII digits
+       followed by room for the separator, and the mask of the bytes to keep.
+       Formatting a block then only needs one lookup per value.
 
        Args:
-           column (int): Number of columns in the row.
+           low (int): Smallest value.
+           high (int): Largest value.
 
        Returns:
-           list: A list containing `column` number of random integers.
+           tuple: Records and masks, each as a 1D array of fixed size void items, and the digit width.
        """
-    row = [random.randint(1,1000) for i in range(column)]
-    return row
+    width = len(str(high))
+    record_size = width + len(LINE_TERMINATOR)
+    values = np.arange(low, high + 1, dtype=np.int64)[:, None]
+    powers = 10 ** np.arange(width - 1, -1, -1, dtype=np.int64)
+
+    records = np.full((len(values), record_size), ord(','), dtype=np.uint8)
+    records[:, :width] = (values // powers) % 10 + ord('0')
+
+    # Leading zeros are dropped, a single 0 is kept, followed by one comma
+    keep = np.zeros((len(values), record_size), dtype=bool)
+    keep[:, :width] = (values >= powers) | (powers == 1)
+    keep[:, width] = True
+
+    # View every row as one item so a block is formatted with a single gather
+    item = np.dtype(('V', record_size))
+    return records.view(item).ravel(), keep.view(item).ravel(), width
+
+
+def generate_block(rng, rows, columns, low=LOW, high=HIGH):
+    """
+       Generate a block of CSV rows of random integers at once and format them as bytes.
+       Every value is looked up as a fixed width record, then the leading zeros are masked out,
+       so no python object is created per value.
+
+       Args:
+           rng (np.random.Generator): Random generator to draw the values from.
+           rows (int): Number of rows in the block.
+           columns (int): Number of columns in each row.
+           low (int, optional): Smallest value. Default is 1.
+           high (int, optional): Largest value. Default is 1000.
+
+       Returns:
+           bytes: The formatted rows.
+       """
+    records, keep, width = record_table(low, high)
+    index = rng.integers(0, high - low, size=(rows, columns), endpoint=True, dtype=np.int32)
+
+    chars = np.take(records, index).view(np.uint8).reshape(rows, columns, -1)
+    mask = np.take(keep, index).view(bool).reshape(rows, columns, -1)
+
+    # Line terminator instead of the comma after the last value of a row
+    chars[:, -1, width:] = np.frombuffer(LINE_TERMINATOR, dtype=np.uint8)
+    mask[:, -1, width:] = True
+
+    return chars[mask].tobytes()
+
 
+def write_rows(csvfile, rng, columns, rows=None, target_size=None, block_rows=10_000):
+    """
+        Write random rows into an open file, block by block, either a number of rows or until a size in bytes.
 
-def generate_csv(size=None,rows=None,columns=100):
+        Args:
+            csvfile (file): File opened in binary mode.
+            rng (np.random.Generator): Random generator to draw the values from.
+            columns (int): Number of columns in each row.
+            rows (int, optional): Number of rows to write. Default is None.
+            target_size (int, optional): Number of bytes to write, the last row may go past it. Default is None.
+            block_rows (int, optional): Number of rows generated and written at once. Default is 10,000.
+        """
+    if rows:
+        # Generate a fixed number of rows, block by block
+        remaining = rows
+        while remaining > 0:
+            block = generate_block(rng, min(block_rows, remaining), columns)
+            csvfile.write(block)
+            remaining -= block_rows
+
+    elif target_size:
+        # Generate rows until the target size is reached, counted from the bytes written
+        written = 0
+        while written < target_size:
+            block = generate_block(rng, block_rows, columns)
+
+            # Last block, write only the rows needed to reach the size
+            if written + len(block) > target_size:
+                row_size = len(block) / block_rows
+                needed_rows = min(block_rows, int((target_size - written) / row_size) + 1)
+                block = generate_block(rng, needed_rows, columns)
+
+            csvfile.write(block)
+            written += len(block)
+
+
+def plan_shards(size=None, rows=None):
+    """
+        Split the work into shards of a fixed size. The split only depends on the requested size or rows,
+        never on the number of workers, so a seed always gives the same bytes.
+
+        Args:
+            size (int, optional): Target size of the CSV file in megabytes. Default is None.
+            rows (int, optional): Number of rows to generate. Default is None.
+
+        Returns:
+            list: (rows, target_size) of every shard, one of them is None.
+        """
+    if rows:
+        return [(min(SHARD_ROWS, rows - start), None) for start in range(0, rows, SHARD_ROWS)]
+
+    target_size = size * 1024 * 1024
+    shard_size = SHARD_SIZE_MB * 1024 * 1024
+    return [(None, min(shard_size, target_size - start)) for start in range(0, target_size, shard_size)]
+
+
+def write_shard(path, seed_sequence, columns, rows, target_size, block_rows):
+    """
+        Write one shard to its own file with its own random stream. Runs in a worker process.
+
+        Args:
+            path (str): Path of the shard file.
+            seed_sequence (np.random.SeedSequence): Independent seed of the shard.
+            columns (int): Number of columns in each row.
+            rows (int): Number of rows of the shard, or None.
+            target_size (int): Size of the shard in bytes, or None.
+            block_rows (int): Number of rows generated and written at once.
+
+        Returns:
+            str: Path of the shard file.
+        """
+    with open(path, 'wb', buffering=16 * 1024 * 1024) as shard_file:
+        write_rows(shard_file, np.random.default_rng(seed_sequence), columns, rows, target_size, block_rows)
+    return path
+
+
+def generate_csv(size=None,rows=None,columns=100,block_rows=10_000,seed=None,workers=1,concat=True,name=None):
     """
         Generate a CSV file with random integer data.
 
         The file can be generated based on the number of rows or the total file size in MB.
+        The work is split into fixed size shards, each with an independent random stream spawned from the seed,
+        so the same seed gives byte identical output whatever the number of workers.
+        With more than one worker the shards are written in parallel by a process pool.
 
         Args:
             size (int) -s: Target size of the CSV file in megabytes. Default is None.
             rows (int) -r : Number of rows to generate. Default is None.
-            columns (int, optional): Number of columns in each row. Default is 100.
+            columns (int, optional) -c : Number of columns in each row. Default is 100.
+            block_rows (int, optional): Number of rows generated and written at once. Default is 10,000.
+            seed (int, optional) --seed : Seed for reproducible output. Default is None (random).
+            workers (int, optional) -w : Number of worker processes. Default is 1.
+            concat (bool, optional) --no-concat : Join the shards into one file, else keep one file per shard. Default is True.
+            name (str, optional) -o : Name of the file without extension. Default is the current timestamp.
 
         Returns:
             None
@@ -41,26 +186,36 @@ def generate_csv(size=None,rows=None,columns=100):
         return
 
     # Generate a unique filename using the current timestamp : YYYYMMDD_HHMMSS e.g. 20250421_212115.csv
-    name = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    if name is None:
+        name = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
     filename = f'{name}.csv'
+
+    # Independent random stream for every shard
+    shards = plan_shards(size, rows)
+    seed_sequences = np.random.SeedSequence(seed).spawn(len(shards))
     try:
-    # Open the CSV file for writing
-        with open(filename,'w',newline="") as csvfile:
-            writer = csv.writer(csvfile)
-
-            if rows:
-                # Generate a fixed number of rows
-                for _ in range(rows):
-                    row = generate_random_row(columns)
-                    writer.writerow(row)
-
-            elif size:
-                # Generate rows until the file reaches the desired size in MB
-                target_size = size * 1024 * 1024
-                while os.path.getsize(filename) < target_size:
-                    row = generate_random_row(columns)
-                    writer.writerow(row)
-            print(f'Generated {name} successfully')
+        if workers <= 1:
+            # Open the CSV file for writing with a large buffer, shards are written one after the other
+            with open(filename,'wb',buffering=16 * 1024 * 1024) as csvfile:
+                for (shard_rows, shard_size), seed_sequence in zip(shards, seed_sequences):
+                    write_rows(csvfile, np.random.default_rng(seed_sequence), columns, shard_rows, shard_size, block_rows)
+        else:
+            # Write every shard to its own file in parallel
+            shard_paths = [f'{name}.part-{i:05d}.csv' for i in range(len(shards))]
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(write_shard, path, seed_sequence, columns, shard_rows, shard_size, block_rows)
+                           for path, (shard_rows, shard_size), seed_sequence in zip(shard_paths, shards, seed_sequences)]
+                for f in futures:
+                    f.result()
+
+            if concat:
+                # Join the shards in order and remove them
+                with open(filename, 'wb') as csvfile:
+                    for path in shard_paths:
+                        with open(path, 'rb') as shard_file:
+                            shutil.copyfileobj(shard_file, csvfile, 16 * 1024 * 1024)
+                        os.remove(path)
+        print(f'Generated {name} successfully')
 
     except PermissionError:
         # Handle cases where there are permission issues
@@ -78,11 +233,16 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Generate csv file")
     parser.add_argument('-s',type=int,help='Size of csv file')
     parser.add_argument('-r',type=int,help='rows in csv file')
+    parser.add_argument('-c',type=int,default=100,help='columns in csv file')
+    parser.add_argument('-w',type=int,default=1,help='number of worker processes')
+    parser.add_argument('-o',type=str,default=None,help='name of the csv file without extension')
+    parser.add_argument('--seed',type=int,default=None,help='seed for reproducible output')
+    parser.add_argument('--no-concat',action='store_true',help='keep one file per shard')
 
     # Parse the command-line arguments
     args:Namespace = parser.parse_args()
 
     # Call the CSV generation function with parsed arguments
-    generate_csv(args.s,args.r)
+    generate_csv(args.s,args.r,args.c,seed=args.seed,workers=args.w,concat=not args.no_concat,name=args.o)
 
 
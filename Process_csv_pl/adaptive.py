@@ -0,0 +1,146 @@
+import io
+import os
+import time
+import polars as pl
+import psutil
+
+
+class AdaptiveChunkSizer:
+    """
+    Feedback controller for the size of the next batch.
+    After every batch it is told how long the parse took, how much memory the process uses and how many
+    batches are waiting, and it resizes the next batch to keep memory under the ceiling while going for
+    the most rows per second.
+
+    Args:
+        memory_limit (int, optional): Memory ceiling in bytes for the whole process. Default is 60% of available memory.
+        memory_budget (int, optional): Memory in bytes this reader may add on top of the memory of the process
+            when it starts, e.g. the share of one request in a long-running server. Replaces memory_limit.
+        initial_size (int, optional): Size of the first batch in bytes. Default is 8 MB.
+        min_size (int, optional): Smallest batch in bytes. Default is 256 KB.
+        max_size (int, optional): Largest batch in bytes. Default is 512 MB.
+        max_queue_depth (int, optional): Batches allowed to wait before the size is reduced. Default is 4.
+    """
+
+    # How much the size changes in one step
+    STEP = 1.5
+
+    # Share of the memory per byte estimate kept from one batch to the next, so an old spike is forgotten
+    DECAY = 0.8
+
+    def __init__(self, memory_limit=None, initial_size=8 * 1024 * 1024, min_size=256 * 1024,
+                 max_size=512 * 1024 * 1024, max_queue_depth=4, memory_budget=None):
+        self.process = psutil.Process(os.getpid())
+        self.baseline_rss = self.process.memory_info().rss
+
+        # A budget is relative to what the process already holds, a limit is absolute
+        if memory_budget is not None:
+            memory_limit = self.baseline_rss + memory_budget
+        # Use 60% of available memory when no ceiling is given
+        elif memory_limit is None:
+            memory_limit = self.baseline_rss + int(psutil.virtual_memory().available * 0.6)
+        self.memory_limit = memory_limit
+
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_queue_depth = max_queue_depth
+        self.size = max(min_size, min(initial_size, max_size))
+
+        # Grow until throughput stops improving, then turn around
+        self.direction = self.STEP
+        self.last_throughput = 0.0
+
+        # Memory that one byte of CSV takes once parsed, learned from the batches
+        self.memory_per_byte = None
+
+    def current_rss(self):
+        """
+        Returns:
+            int: Memory in bytes the process holds now.
+        """
+        return self.process.memory_info().rss
+
+    def next_size(self):
+        """
+        Returns:
+            int: Size in bytes of the next batch to read.
+        """
+        return int(self.size)
+
+    def record(self, num_bytes, rows, latency, queue_depth=0, start_rss=None):
+        """
+        Feed back the measurements of one batch and compute the size of the next one.
+
+        Args:
+            num_bytes (int): Bytes of CSV parsed in the batch.
+            rows (int): Rows in the batch.
+            latency (float): Seconds spent parsing the batch.
+            queue_depth (int, optional): Batches waiting to be processed. Default is 0.
+            start_rss (int, optional): Memory of the process before the batch was read. Default is the memory at start.
+        """
+        rss = self.current_rss()
+
+        # Learn memory per byte from what this batch added, memory kept from earlier batches is not charged to it.
+        # A larger batch counts at once, the estimate then decays so one spike does not hold the size down
+        if num_bytes:
+            observed = max(rss - (self.baseline_rss if start_rss is None else start_rss), 0) / num_bytes
+            self.memory_per_byte = max(observed, (self.memory_per_byte or 0.0) * self.DECAY)
+
+        # Hill climb on rows per second
+        throughput = rows / latency if latency > 0 else 0.0
+        if throughput < self.last_throughput:
+            self.direction = 1 / self.direction
+        self.last_throughput = throughput
+        size = self.size * self.direction
+
+        # Workers are falling behind, don't read more
+        if queue_depth > self.max_queue_depth:
+            size = min(size, self.size / self.STEP)
+
+        # Stay under the memory ceiling
+        if self.memory_per_byte:
+            headroom = self.memory_limit - rss
+            depth = max(queue_depth, 1)
+            size = min(size, max(headroom, 0) / (self.memory_per_byte * depth))
+
+        self.size = max(self.min_size, min(size, self.max_size))
+
+
+def adaptive_batches(filename, sizer, has_header=False, queue_depth=None, schema=None):
+    """
+    Read the CSV file in batches whose size is decided by the sizer before each read.
+    Each batch ends on a newline, so it can be parsed on its own.
+
+    Args:
+        filename (str): The path to the CSV file.
+        sizer (AdaptiveChunkSizer): Controller deciding the size of each batch.
+        has_header (bool, optional): Whether the first line is a header. Default is False.
+        queue_depth (callable, optional): Returns the number of batches waiting to be processed. Default is None.
+        schema (list, optional): dtype of every column. Default is None (Polars defaults).
+
+    Yields:
+        pl.DataFrame: The next parsed batch.
+    """
+    with open(filename, 'rb') as f:
+        columns = None
+        if has_header:
+            columns = f.readline().decode().strip().split(',')
+
+        while True:
+            start_rss = sizer.current_rss()
+
+            # Read the requested bytes and finish the last row
+            data = f.read(sizer.next_size())
+            if not data:
+                break
+            if not data.endswith(b'\n'):
+                data += f.readline()
+
+            batch_start = time.perf_counter()
+            df = pl.read_csv(io.BytesIO(data), has_header=False, new_columns=columns, schema_overrides=schema)
+            latency = time.perf_counter() - batch_start
+
+            yield df
+
+            # Measured after the consumer used the batch, so its memory is counted
+            sizer.record(len(data), df.height, latency, queue_depth() if queue_depth else 0, start_rss)
@@ -0,0 +1,256 @@
+import math
+import numpy as np
+import polars as pl
+
+
+# Quantiles reported by default
+DEFAULT_QUANTILES = (0.5, 0.9, 0.99)
+
+# Equal width bins of the histogram reported by default, between the min and max of the column
+DEFAULT_HISTOGRAM_BINS = 10
+
+
+class TDigest:
+    """
+    Mergeable sketch of a distribution for approximate quantiles (t-digest).
+    Values are kept as centroids (mean, weight), small near the tails and large in the middle,
+    so extreme quantiles stay accurate with a few hundred centroids whatever the number of values.
+
+    Args:
+        compression (int, optional): Controls the number of centroids and the accuracy. Default is 200.
+    """
+
+    def __init__(self, compression=200):
+        self.compression = compression
+        self.means = np.empty(0, dtype=np.float64)
+        self.weights = np.empty(0, dtype=np.float64)
+
+    @classmethod
+    def from_values(cls, values, compression=200):
+        """
+        Build a digest from raw values.
+
+        Args:
+            values (np.ndarray): Values to summarize, NaN are ignored.
+            compression (int, optional): Compression of the digest. Default is 200.
+
+        Returns:
+            TDigest: The digest of the values.
+        """
+        digest = cls(compression)
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        digest._compress(values, np.ones(len(values)))
+        return digest
+
+    def _compress(self, means, weights):
+        """
+        Group sorted centroids into buckets of the k1 scale function, the vectorized form of the t-digest merge.
+        """
+        if len(means) == 0:
+            return
+        order = np.argsort(means, kind="stable")
+        means, weights = means[order], weights[order]
+
+        # Position of every centroid in the distribution, 0 to 1
+        cumulative = np.cumsum(weights)
+        total = cumulative[-1]
+        q = (cumulative - weights / 2) / total
+
+        # k1 scale, buckets are narrow near q=0 and q=1
+        k = self.compression / (2 * math.pi) * np.arcsin(2 * q - 1)
+        bucket = np.floor(k - k[0]).astype(np.int64)
+
+        bucket_weights = np.bincount(bucket, weights=weights)
+        bucket_sums = np.bincount(bucket, weights=means * weights)
+        used = bucket_weights > 0
+        self.weights = bucket_weights[used]
+        self.means = bucket_sums[used] / self.weights
+
+    def merge(self, other):
+        """
+        Merge another digest into this one.
+
+        Args:
+            other (TDigest): Digest to merge.
+
+        Returns:
+            TDigest: This digest.
+        """
+        self._compress(np.concatenate([self.means, other.means]), np.concatenate([self.weights, other.weights]))
+        return self
+
+    def quantile(self, q):
+        """
+        Args:
+            q (float): Quantile between 0 and 1.
+
+        Returns:
+            float: Approximate value at the quantile, None if the digest is empty.
+        """
+        if len(self.means) == 0:
+            return None
+        cumulative = np.cumsum(self.weights) - self.weights / 2
+        return float(np.interp(q * self.weights.sum(), cumulative, self.means))
+
+    def cdf(self, x):
+        """
+        Args:
+            x (float or np.ndarray): Value(s).
+
+        Returns:
+            float or np.ndarray: Approximate fraction of values less or equal to x.
+        """
+        if len(self.means) == 0:
+            return np.zeros_like(np.asarray(x, dtype=np.float64))
+        cumulative = (np.cumsum(self.weights) - self.weights / 2) / self.weights.sum()
+        return np.interp(x, self.means, cumulative, left=0.0, right=1.0)
+
+    def histogram(self, edges):
+        """
+        Approximate number of values between consecutive edges.
+        The first and last bins also hold the values below and above the edges, so with edges going
+        from the min to the max of the column the counts add up to the number of values.
+
+        Args:
+            edges (list): Sorted bin edges, at least two.
+
+        Returns:
+            list: Approximate count of every bin.
+        """
+        cumulative = self.cdf(np.asarray(edges, dtype=np.float64))
+        cumulative[0], cumulative[-1] = 0.0, 1.0
+        counts = np.diff(cumulative) * self.weights.sum()
+        return counts.tolist()
+
+
+class ColumnState:
+    """
+    Partial statistics of one column, mergeable across batches and workers:
+    count, sum, min, max, mean and M2 for the variance (Welford / Chan), and an optional t-digest for quantiles.
+    """
+
+    def __init__(self, count=0, total=0, minimum=None, maximum=None, mean=0.0, m2=0.0, digest=None):
+        self.count = count
+        self.sum = total
+        self.min = minimum
+        self.max = maximum
+        self.mean = mean
+        self.m2 = m2
+        self.digest = digest
+
+    def merge(self, other):
+        """
+        Merge the state of another batch into this one.
+
+        Args:
+            other (ColumnState): State to merge.
+
+        Returns:
+            ColumnState: This state.
+        """
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.__dict__.update(other.__dict__)
+            return self
+
+        # Parallel variance update (Chan et al.)
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        if self.digest is not None and other.digest is not None:
+            self.digest.merge(other.digest)
+        return self
+
+    def result(self, quantiles=DEFAULT_QUANTILES, histogram_bins=DEFAULT_HISTOGRAM_BINS):
+        """
+        Args:
+            quantiles (tuple, optional): Quantiles to report. Default is (0.5, 0.9, 0.99).
+            histogram_bins (int, optional): Bins of the histogram between min and max. Default is 10.
+
+        Returns:
+            dict: count, sum, min, max, mean, variance (population), and quantiles and histogram
+                (edges and approximate counts) if a digest is kept.
+        """
+        result = {
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min,
+            "max": self.max,
+            "mean": self.mean if self.count else None,
+            "variance": self.m2 / self.count if self.count else None,
+        }
+        if self.digest is not None:
+            result["quantiles"] = {q: self.digest.quantile(q) for q in quantiles}
+            if self.count and histogram_bins:
+                # A constant column is one bin holding every value
+                bins = histogram_bins if self.max > self.min else 1
+                edges = np.linspace(self.min, self.max, bins + 1)
+                counts = self.digest.histogram(edges)
+                result["histogram"] = {"edges": edges.tolist(), "counts": counts}
+        return result
+
+
+def frame_states(df, quantiles=True):
+    """
+    Compute the partial state of every column of one batch. The scalar statistics are computed
+    by Polars in a single select, the digest is built from the column values.
+
+    Args:
+        df (pl.DataFrame): A batch of data read from the CSV file.
+        quantiles (bool, optional): Build a t-digest per column for quantiles. Default is True.
+
+    Returns:
+        list: ColumnState of every column.
+    """
+    row = df.select(
+        pl.all().count().name.suffix("_count"),
+        # Int32 columns of compact reads are widened so the sum cannot overflow
+        *[(pl.col(col).cast(pl.Int64) if dtype == pl.Int32 else pl.col(col)).sum().name.suffix("_sum")
+          for col, dtype in df.schema.items()],
+        pl.all().min().name.suffix("_min"),
+        pl.all().max().name.suffix("_max"),
+        pl.all().mean().name.suffix("_mean"),
+        pl.all().var(ddof=0).name.suffix("_var"),
+    ).row(0, named=True)
+
+    states = []
+    for col in df.columns:
+        count = row[f"{col}_count"]
+        digest = TDigest.from_values(df[col].drop_nulls().to_numpy()) if quantiles else None
+        states.append(ColumnState(
+            count=count,
+            total=row[f"{col}_sum"],
+            minimum=row[f"{col}_min"],
+            maximum=row[f"{col}_max"],
+            mean=row[f"{col}_mean"] or 0.0,
+            m2=(row[f"{col}_var"] or 0.0) * count,
+            digest=digest,
+        ))
+    return states
+
+
+def merge_states(total, partial):
+    """
+    Merge the column states of one batch into the running column states.
+
+    Args:
+        total (list): Running ColumnState of each column.
+        partial (list): ColumnState of each column of one batch.
+
+    Returns:
+        list: Updated running column states.
+    """
+    for i, state in enumerate(partial):
+        if i < len(total):
+            total[i].merge(state)
+        else:
+            total.append(state)
+    return total
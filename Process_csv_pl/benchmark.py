@@ -0,0 +1,363 @@
+import os
+import sys
+import json
+import time
+import platform
+import statistics
+import subprocess
+import argparse
+from argparse import Namespace
+
+import psutil
+
+# csv_gen lives in the sibling "Generate csv" folder
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Generate csv"))
+from csv_gen import generate_csv
+from profiling import PeakMemorySampler
+
+
+# File shapes to benchmark: (rows, columns)
+DEFAULT_SHAPES = [
+    (1_000_000, 10),
+    (250_000, 100),
+    (10_000, 1000),
+]
+
+
+def run_process_csv(filename):
+    from process_csv import process_csv
+    return process_csv(filename)
+
+
+def run_process_csv_mmap(filename):
+    from process_csv import process_csv
+    return process_csv(filename, use_mmap=True)
+
+
+def run_chunks(filename):
+    from process_chunks import chunk_csv_polar
+    return chunk_csv_polar(filename)
+
+
+def run_chunks_adaptive(filename):
+    from process_chunks import chunk_csv_polar
+    return chunk_csv_polar(filename, adaptive=True)
+
+
+def run_multithread(filename):
+    from process_chunks_multithread import multithreaded_csv_polar
+    return multithreaded_csv_polar(filename)
+
+
+def run_multiprocess(filename):
+    from process_chunks_multiprocess import multiprocess_csv_polar
+    return multiprocess_csv_polar(filename)
+
+
+def run_lazy(filename):
+    from process_lazy import lazy_csv_polar
+    return lazy_csv_polar(filename)
+
+
+# Strategies compared by the benchmark, imported lazily so the child only loads what it runs
+STRATEGIES = {
+    "process_csv": run_process_csv,
+    "process_csv_mmap": run_process_csv_mmap,
+    "chunks": run_chunks,
+    "chunks_adaptive": run_chunks_adaptive,
+    "multithread": run_multithread,
+    "multiprocess": run_multiprocess,
+    "lazy": run_lazy,
+}
+
+
+def drop_file_cache(filename):
+    """
+    Ask the kernel to drop the cached pages of the file, so the next read comes from disk.
+    Only affects this file and needs no special permission, does nothing where it is not supported.
+
+    Args:
+        filename (str): Path to the file.
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return
+    fd = os.open(filename, os.O_RDONLY)
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+
+
+def count_rows(filename):
+    """
+    Count the rows of the file by counting newlines in large blocks.
+
+    Args:
+        filename (str): Path to the file.
+
+    Returns:
+        int: Number of rows.
+    """
+    rows = 0
+    with open(filename, 'rb') as f:
+        while block := f.read(16 * 1024 * 1024):
+            rows += block.count(b'\n')
+    return rows
+
+
+def measure(strategy, filename, iterations, cold):
+    """
+    Run one strategy several times in the current process and measure every run.
+    Peak RSS is sampled during each run and adds up this process and its worker processes, so a run
+    does not inherit the peak of the previous one.
+
+    Args:
+        strategy (str): Name of the strategy in STRATEGIES.
+        filename (str): Path to the CSV file.
+        iterations (int): Number of runs.
+        cold (bool): Drop the file from the page cache before every run.
+
+    Returns:
+        list: One dictionary of metrics per run.
+    """
+    runner = STRATEGIES[strategy]
+    runs = []
+    for _ in range(iterations):
+        if cold:
+            drop_file_cache(filename)
+
+        sampler = PeakMemorySampler(include_children=True)
+        sampler.start()
+        cpu_before = os.times()
+        wall_before = time.perf_counter()
+        try:
+            result = runner(filename)
+        finally:
+            wall = time.perf_counter() - wall_before
+            cpu_after = os.times()
+            sampler.stop()
+
+        # CPU time of this process and of the finished worker processes
+        cpu = sum(after - before for after, before in zip(cpu_after[:4], cpu_before[:4]))
+
+        runs.append({
+            "wall_time": wall,
+            "cpu_time": cpu,
+            "peak_rss_mb": sampler.peak_rss / (1024 * 1024),
+            "total_sum": result["total_sum"],
+        })
+    return runs
+
+
+def run_strategy(strategy, filename, iterations, cold):
+    """
+    Run the measurements of one strategy in a fresh interpreter, so imports, caches and
+    peak memory of one strategy don't leak into the next one.
+
+    Args:
+        strategy (str): Name of the strategy in STRATEGIES.
+        filename (str): Path to the CSV file.
+        iterations (int): Number of runs.
+        cold (bool): Drop the file from the page cache before every run.
+
+    Returns:
+        list: One dictionary of metrics per run.
+    """
+    command = [sys.executable, os.path.abspath(__file__), "child", "-f", filename,
+               "--strategy", strategy, "-n", str(iterations)]
+    if cold:
+        command.append("--cold")
+    output = subprocess.run(command, check=True, capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+    # Strategies may print, the measurements are on the last line
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def summarize(fixture, strategy, mode, runs):
+    """
+    Reduce the runs of one strategy on one fixture to a result row.
+
+    Args:
+        fixture (dict): Path, rows, columns and size of the fixture.
+        strategy (str): Name of the strategy.
+        mode (str): cold or warm.
+        runs (list): Metrics of every run.
+
+    Returns:
+        dict: Median wall time, peak RSS, CPU utilization and rows per second.
+    """
+    wall_times = [run["wall_time"] for run in runs]
+    median_wall = statistics.median(wall_times)
+    cpu_util = statistics.median(run["cpu_time"] / run["wall_time"] for run in runs if run["wall_time"] > 0)
+    return {
+        "fixture": os.path.basename(fixture["path"]),
+        "rows": fixture["rows"],
+        "columns": fixture["columns"],
+        "size_mb": fixture["size_mb"],
+        "strategy": strategy,
+        "mode": mode,
+        "wall_times": wall_times,
+        "median_wall": median_wall,
+        "peak_rss_mb": max(run["peak_rss_mb"] for run in runs),
+        "cpu_util": cpu_util,
+        "rows_per_sec": fixture["rows"] / median_wall if median_wall else None,
+        "total_sum": runs[0]["total_sum"],
+    }
+
+
+def make_fixtures(shapes, fixtures_dir, seed):
+    """
+    Generate the benchmark fixtures with csv_gen, files already present are reused.
+
+    Args:
+        shapes (list): (rows, columns) of every fixture.
+        fixtures_dir (str): Directory of the fixtures.
+        seed (int): Seed so fixtures are the same on every machine.
+
+    Returns:
+        list: Path, rows, columns and size of every fixture.
+    """
+    fixtures_dir = os.path.abspath(fixtures_dir)
+    os.makedirs(fixtures_dir, exist_ok=True)
+    fixtures = []
+    for rows, columns in shapes:
+        name = os.path.join(fixtures_dir, f"r{rows}_c{columns}_s{seed}")
+        path = f"{name}.csv"
+        if not os.path.exists(path):
+            generate_csv(rows=rows, columns=columns, seed=seed, workers=psutil.cpu_count(logical=False) or 1, name=name)
+        fixtures.append({
+            "path": path,
+            "rows": count_rows(path),
+            "columns": columns,
+            "size_mb": os.path.getsize(path) / (1024 * 1024),
+        })
+    return fixtures
+
+
+def compare_with_baseline(results, baseline, threshold):
+    """
+    Compare median wall times with a stored baseline.
+
+    Args:
+        results (list): Result rows of this run.
+        baseline (list): Result rows of the baseline.
+        threshold (float): Allowed slowdown, 0.1 means 10% slower.
+
+    Returns:
+        list: Result rows slower than the baseline by more than the threshold, with the baseline time and ratio.
+    """
+    key = lambda row: (row["fixture"], row["strategy"], row["mode"])
+    baseline_by_key = {key(row): row for row in baseline}
+
+    regressions = []
+    for row in results:
+        base = baseline_by_key.get(key(row))
+        if not base or not base["median_wall"]:
+            continue
+        ratio = row["median_wall"] / base["median_wall"]
+        if ratio > 1 + threshold:
+            regressions.append({**row, "baseline_wall": base["median_wall"], "ratio": ratio})
+    return regressions
+
+
+def run_benchmark(shapes=None, strategies=None, iterations=3, fixtures_dir="bench_fixtures", seed=0):
+    """
+    Run every strategy on every fixture, cold and warm.
+    Cold runs drop the file from the page cache before each run, warm runs read it once first.
+
+    Args:
+        shapes (list, optional): (rows, columns) of every fixture. Default is DEFAULT_SHAPES.
+        strategies (list, optional): Names of the strategies to run. Default is all of them.
+        iterations (int, optional): Runs per strategy, fixture and mode. Default is 3.
+        fixtures_dir (str, optional): Directory of the fixtures. Default is bench_fixtures.
+        seed (int, optional): Seed of the fixtures. Default is 0.
+
+    Returns:
+        dict: Machine information and one result row per fixture, strategy and mode.
+    """
+    fixtures = make_fixtures(shapes or DEFAULT_SHAPES, fixtures_dir, seed)
+    results = []
+    for fixture in fixtures:
+        for strategy in strategies or STRATEGIES:
+            # Cold: every run reads from disk
+            runs = run_strategy(strategy, fixture["path"], iterations, cold=True)
+            results.append(summarize(fixture, strategy, "cold", runs))
+
+            # Warm: first run fills the page cache and is thrown away
+            runs = run_strategy(strategy, fixture["path"], iterations + 1, cold=False)[1:]
+            results.append(summarize(fixture, strategy, "warm", runs))
+
+            print(f'{os.path.basename(fixture["path"]):<28} {strategy:<18} '
+                  f'cold {results[-2]["median_wall"]:.2f}s  warm {results[-1]["median_wall"]:.2f}s  '
+                  f'peak {results[-1]["peak_rss_mb"]:.0f} MB', file=sys.stderr)
+
+    return {
+        "machine": {
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "physical_cores": psutil.cpu_count(logical=False),
+            "logical_cores": psutil.cpu_count(logical=True),
+            "memory_gb": psutil.virtual_memory().total / (1024 ** 3),
+        },
+        "created": time.ctime(),
+        "results": results,
+    }
+
+
+def parse_shape(text):
+    """
+    Args:
+        text (str): Shape in the form ROWSxCOLUMNS, e.g. 100000x100.
+
+    Returns:
+        tuple: (rows, columns)
+    """
+    rows, columns = text.lower().split("x")
+    return int(rows), int(columns)
+
+
+if __name__ == '__main__':
+    # Set up command line argument parsing
+    parser = argparse.ArgumentParser(description="Benchmark the CSV processing strategies")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run the benchmark")
+    run_parser.add_argument('--shape',type=parse_shape,action='append',default=None,help="ROWSxCOLUMNS, can be repeated")
+    run_parser.add_argument('--strategy',type=str,action='append',default=None,choices=list(STRATEGIES),help="Strategy to run, can be repeated")
+    run_parser.add_argument('-n',type=int,default=3,help="Runs per strategy, fixture and mode")
+    run_parser.add_argument('--fixtures',type=str,default="bench_fixtures",help="Directory of the fixtures")
+    run_parser.add_argument('--seed',type=int,default=0,help="Seed of the fixtures")
+    run_parser.add_argument('-o',type=str,default="bench_results.json",help="Results file")
+    run_parser.add_argument('--baseline',type=str,default=None,help="Baseline results file to compare with")
+    run_parser.add_argument('--threshold',type=float,default=0.1,help="Allowed slowdown before a regression, 0.1 = 10%%")
+
+    # Internal: measurements of one strategy in a fresh interpreter
+    child_parser = subparsers.add_parser("child")
+    child_parser.add_argument('-f',type=str)
+    child_parser.add_argument('--strategy',type=str,choices=list(STRATEGIES))
+    child_parser.add_argument('-n',type=int,default=1)
+    child_parser.add_argument('--cold',action='store_true')
+
+    # Parse the command-line arguments
+    args:Namespace = parser.parse_args()
+
+    if args.command == "child":
+        print(json.dumps(measure(args.strategy, args.f, args.n, args.cold)))
+        sys.exit(0)
+
+    report = run_benchmark(args.shape, args.strategy, args.n, args.fixtures, args.seed)
+
+    with open(args.o, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'Results written to {args.o}')
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare_with_baseline(report["results"], baseline, args.threshold)
+        for row in regressions:
+            print(f'Regression: {row["fixture"]} {row["strategy"]} {row["mode"]} '
+                  f'{row["median_wall"]:.2f}s vs {row["baseline_wall"]:.2f}s ({row["ratio"]:.2f}x)')
+        if regressions:
+            sys.exit(1)
+        print("No regressions against the baseline")
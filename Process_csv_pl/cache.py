@@ -0,0 +1,125 @@
+import os
+import json
+import hashlib
+
+
+# Default location of the cache on disk
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "process_csv_pl")
+
+
+def file_fingerprint(filepath, samples=16, sample_size=64 * 1024):
+    """
+    Build a fingerprint of a file from its path, size, modification time and a hash of sampled blocks.
+    Only a few blocks spread over the file are read, so it takes milliseconds even for very large files.
+
+    Args:
+        filepath (str): Path to the file.
+        samples (int, optional): Number of blocks hashed. Default is 16.
+        sample_size (int, optional): Size of each block in bytes. Default is 64 KB.
+
+    Returns:
+        str: Hex digest identifying the file content.
+    """
+    stat = os.stat(filepath)
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(f"{os.path.abspath(filepath)}|{stat.st_size}|{stat.st_mtime_ns}".encode())
+
+    with open(filepath, 'rb') as f:
+        # Evenly spaced blocks, always including the start and the end of the file
+        step = max(stat.st_size - sample_size, 0) / max(samples - 1, 1)
+        for i in range(samples):
+            f.seek(int(i * step))
+            digest.update(f.read(sample_size))
+
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Disk backed cache of aggregation results, one JSON file per entry.
+    Entries are keyed by the file fingerprint and the name of the aggregation, the least recently
+    used entries are removed once the cache holds more than max_entries or max_bytes.
+
+    Args:
+        cache_dir (str, optional): Directory of the cache. Default is ~/.cache/process_csv_pl.
+        max_entries (int, optional): Maximum number of entries kept. Default is 1000.
+        max_bytes (int, optional): Maximum total size of the entries in bytes. Default is 100 MB.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_entries=1000, max_bytes=100 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _entry_path(self, filepath, aggregation):
+        key = f"{file_fingerprint(filepath)}-{aggregation}"
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, filepath, aggregation="sum"):
+        """
+        Get the stored result for the file.
+
+        Args:
+            filepath (str): Path to the CSV file.
+            aggregation (str, optional): Name of the aggregation. Default is sum.
+
+        Returns:
+            dict: The stored result, or None if the file is not in the cache.
+        """
+        entry_path = self._entry_path(filepath, aggregation)
+        try:
+            with open(entry_path) as f:
+                result = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        # Mark as recently used
+        os.utime(entry_path)
+        return result
+
+    def put(self, filepath, result, aggregation="sum"):
+        """
+        Store the result for the file and evict old entries if the cache is too big.
+
+        Args:
+            filepath (str): Path to the CSV file.
+            result (dict): JSON serializable result to store.
+            aggregation (str, optional): Name of the aggregation. Default is sum.
+        """
+        entry_path = self._entry_path(filepath, aggregation)
+
+        # Write to a temporary file first so readers never see half an entry
+        tmp_path = f"{entry_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(result, f)
+        os.replace(tmp_path, entry_path)
+
+        self.evict()
+
+    def evict(self):
+        """
+        Remove the least recently used entries until the cache fits its limits.
+        """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        # Oldest first
+        entries.sort()
+        total_bytes = sum(size for _, size, _ in entries)
+
+        while entries and (len(entries) > self.max_entries or total_bytes > self.max_bytes):
+            _, size, path = entries.pop(0)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_bytes -= size
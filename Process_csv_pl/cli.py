@@ -0,0 +1,187 @@
+import sys
+import signal
+import argparse
+from contextlib import redirect_stdout
+from argparse import Namespace
+
+from report import print_result, print_json
+
+
+# Every runner imports its strategy when it is called, so polars and psutil are only loaded
+# once the arguments are parsed, and --help or a wrong argument return at once.
+
+def run_sum(args):
+    from process_csv import process_csv
+    return process_csv(args.f, args.mmap, args.cache, args.trace, args.compact)
+
+
+def run_chunks(args):
+    from process_chunks import chunk_csv_polar
+    return chunk_csv_polar(args.f, args.adaptive, args.max_mem, args.cache, args.trace, args.stats, args.compact)
+
+
+def run_multithread(args):
+    from process_chunks_multithread import multithreaded_csv_polar
+    if args.checkpoint is not None:
+        # A termination signal (spot preemption) unwinds normally so the checkpoint is saved
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
+    return multithreaded_csv_polar(args.f, args.q, args.trace, args.stats, args.compact,
+                                   args.checkpoint, args.checkpoint_every, args.adaptive, args.max_mem)
+
+
+def run_multiprocess(args):
+    from process_chunks_multiprocess import multiprocess_csv_polar
+    return multiprocess_csv_polar(args.f, args.w, args.r, args.trace)
+
+
+def run_files(args):
+    from process_files import multi_file_csv_polar
+    return multi_file_csv_polar(args.f, args.w, args.r, args.trace)
+
+
+def run_lazy(args):
+    from process_lazy import lazy_csv_polar
+    columns = args.c.split(',') if args.c else None
+    group_by = args.g.split(',') if args.g else None
+    return lazy_csv_polar(args.f, columns, args.filter, group_by, args.a)
+
+
+def run_approx(args):
+    from process_approx import approximate_csv_polar
+    return approximate_csv_polar(args.f, args.e, args.c, args.b, seed=args.seed)
+
+
+def run_incremental(args):
+    from incremental import incremental_csv_polar
+    return incremental_csv_polar(args.f, args.c)
+
+
+def run_columnar(args):
+    from columnar import convert_csv, columnar_csv_polar
+    if args.convert:
+        # Write the columnar copy again, e.g. with another row group size
+        convert_csv(args.f, args.o, args.format, args.row_group_size)
+    return columnar_csv_polar(args.f, args.format, args.o)
+
+
+def build_parser():
+    """
+    Returns:
+        argparse.ArgumentParser: Parser of the process-csv command with one subcommand per strategy.
+    """
+    # Options shared by every subcommand
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--json',action='store_true',help="Print the result as JSON")
+
+    parser = argparse.ArgumentParser(prog="process-csv", description="Sum and aggregate large CSV files")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    sum_parser = subparsers.add_parser("sum", parents=[common], help="Read the whole file at once")
+    sum_parser.add_argument('-f',type=str,required=True,help="Give path of the file")
+    sum_parser.add_argument('--mmap',action='store_true',help="Stream the memory mapped file instead of reading it at once")
+    sum_parser.add_argument('--cache',action='store_true',help="Reuse the stored result if the file did not change")
+    sum_parser.add_argument('--trace',type=str,default=None,help="Write a Chrome trace of the stages to this file")
+    sum_parser.add_argument('--compact',action='store_true',help="Read with the narrowest safe dtypes")
+    sum_parser.set_defaults(run=run_sum)
+
+    chunks_parser = subparsers.add_parser("chunks", parents=[common], help="Read the file in batches")
+    chunks_parser.add_argument('-f',type=str,required=True,help="Give path of the file")
+    chunks_parser.add_argument('--adaptive',action='store_true',help="Resize batches from measured parse time and memory")
+    chunks_parser.add_argument('--max-mem',type=int,default=None,help="Memory ceiling in MB for adaptive mode")
+    chunks_parser.add_argument('--cache',action='store_true',help="Reuse the stored result if the file did not change")
+    chunks_parser.add_argument('--trace',type=str,default=None,help="Write a Chrome trace of the stages to this file")
+    chunks_parser.add_argument('--stats',action='store_true',help="Compute count, min, max, mean, variance and quantiles of every column")
+    chunks_parser.add_argument('--compact',action='store_true',help="Read with the narrowest safe dtypes")
+    chunks_parser.set_defaults(run=run_chunks)
+
+    thread_parser = subparsers.add_parser("multithread", parents=[common], help="Reader, worker threads and reducer pipeline")
+    thread_parser.add_argument('-f',type=str,required=True,help="Give path of the file")
+    thread_parser.add_argument('-q',type=int,default=None,help="Maximum number of batches in flight")
+    thread_parser.add_argument('--trace',type=str,default=None,help="Write a Chrome trace of the stages to this file")
+    thread_parser.add_argument('--stats',action='store_true',help="Compute count, min, max, mean, variance and quantiles of every column")
+    thread_parser.add_argument('--compact',action='store_true',help="Read with the narrowest safe dtypes")
+    thread_parser.add_argument('--checkpoint',type=str,nargs='?',const='',default=None,help="Save progress to this checkpoint file (default path if empty) and resume from it")
+    thread_parser.add_argument('--checkpoint-every',type=float,default=30,help="Seconds between two checkpoint saves")
+    thread_parser.add_argument('--adaptive',action='store_true',help="Resize batches from measured parse time, memory and queue depth")
+    thread_parser.add_argument('--max-mem',type=int,default=None,help="Memory ceiling in MB for adaptive mode")
+    thread_parser.set_defaults(run=run_multithread)
+
+    process_parser = subparsers.add_parser("multiprocess", parents=[common], help="Byte ranges parsed by worker processes")
+    process_parser.add_argument('-f',type=str,required=True,help="Give path of the file")
+    process_parser.add_argument('-w',type=int,default=None,help="Number of worker processes")
+    process_parser.add_argument('-r',type=int,default=64,help="Maximum size of a byte range in MB")
+    process_parser.add_argument('--trace',type=str,default=None,help="Write a Chrome trace of the stages to this file")
+    process_parser.set_defaults(run=run_multiprocess)
+
+    files_parser = subparsers.add_parser("files", parents=[common], help="Many files on one pool of worker processes")
+    files_parser.add_argument('-f',type=str,nargs='+',required=True,help="Give paths, directories or glob patterns of the files")
+    files_parser.add_argument('-w',type=int,default=None,help="Number of worker processes")
+    files_parser.add_argument('-r',type=int,default=64,help="Maximum size of a byte range in MB")
+    files_parser.add_argument('--trace',type=str,default=None,help="Write a Chrome trace of the stages to this file")
+    files_parser.set_defaults(run=run_files)
+
+    lazy_parser = subparsers.add_parser("lazy", parents=[common], help="Lazy query with projection and filter pushdown")
+    lazy_parser.add_argument('-f',type=str,required=True,help="Give path of the file")
+    lazy_parser.add_argument('-c',type=str,default=None,help="Comma separated columns to aggregate e.g. column_1,column_5")
+    lazy_parser.add_argument('--filter',action='append',default=None,help="Filter like column_1>=500, can be repeated")
+    lazy_parser.add_argument('-g',type=str,default=None,help="Comma separated columns to group by")
+    lazy_parser.add_argument('-a',type=str,default="sum",help="Aggregation to run: sum, min, max, mean or count")
+    lazy_parser.set_defaults(run=run_lazy)
+
+    approx_parser = subparsers.add_parser("approx", parents=[common], help="Estimate from a sample of blocks")
+    approx_parser.add_argument('-f',type=str,required=True,help="Give path of the file")
+    approx_parser.add_argument('-e',type=float,default=0.01,help="Target relative error, 0.01 = 1%%")
+    approx_parser.add_argument('-c',type=float,default=0.95,help="Confidence level")
+    approx_parser.add_argument('-b',type=float,default=1,help="Size of a sampled block in MB")
+    approx_parser.add_argument('--seed',type=int,default=None,help="Seed of the block sampling")
+    approx_parser.set_defaults(run=run_approx)
+
+    incremental_parser = subparsers.add_parser("incremental", parents=[common], help="Only parse what was appended since the last run")
+    incremental_parser.add_argument('-f',type=str,required=True,help="Give path of the file")
+    incremental_parser.add_argument('-c',type=str,default=None,help="Path of the checkpoint file")
+    incremental_parser.set_defaults(run=run_incremental)
+
+    columnar_parser = subparsers.add_parser("columnar", parents=[common], help="Sum from a Parquet or Arrow copy of the file, written on first use")
+    columnar_parser.add_argument('-f',type=str,required=True,help="Give path of the file")
+    columnar_parser.add_argument('-o',type=str,default=None,help="Directory of the columnar copy, default is the cache directory")
+    columnar_parser.add_argument('--format',type=str,default="parquet",choices=["parquet", "ipc"],help="Columnar format")
+    columnar_parser.add_argument('--convert',action='store_true',help="Convert the file again before the sum")
+    columnar_parser.add_argument('--row-group-size',type=int,default=None,help="Rows per row group when converting")
+    columnar_parser.set_defaults(run=run_columnar)
+
+    return parser
+
+
+def main(argv=None):
+    """
+    Entry point of the process-csv command.
+
+    Args:
+        argv (list, optional): Command line arguments. Default is sys.argv[1:].
+
+    Returns:
+        int: Exit status.
+    """
+    args:Namespace = build_parser().parse_args(argv)
+    try:
+        # Keep stdout for the JSON document only, progress and error messages go to stderr
+        if args.json:
+            with redirect_stdout(sys.stderr):
+                data = args.run(args)
+        else:
+            data = args.run(args)
+    except Exception as e:
+        # The strategy already printed what went wrong
+        if args.json:
+            print_json({"error": str(e), "type": type(e).__name__})
+        return 1
+
+    if args.json:
+        print_json(data)
+    else:
+        print_result(data)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
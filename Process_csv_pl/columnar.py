@@ -0,0 +1,323 @@
+import polars as pl
+import time
+import os
+import json
+import re
+import shutil
+import argparse
+from argparse import Namespace
+
+from profiling import Profiler
+from report import print_result
+from utils import get_chunk_size
+from cache import DEFAULT_CACHE_DIR, file_fingerprint
+
+
+# File name of the manifest holding the row group statistics
+MANIFEST_NAME = "_stats.json"
+
+# Supported columnar formats and the extension of their part files
+FORMATS = {
+    "parquet": "parquet",
+    "ipc": "arrow",
+}
+
+# Name of the part files written by convert_csv
+PART_PATTERN = re.compile(r"part-\d{5}\.(parquet|arrow)")
+
+
+def columnar_dir(filename, fmt="parquet"):
+    """
+    Directory of the columnar copy of a CSV file inside the cache directory.
+    The directory is named after the file fingerprint, so a changed CSV gets a new copy.
+
+    Args:
+        filename (str): Path to the CSV file.
+        fmt (str, optional): parquet or ipc. Default is parquet.
+
+    Returns:
+        str: Path of the columnar directory.
+    """
+    return os.path.join(DEFAULT_CACHE_DIR, "columnar", f"{file_fingerprint(filename)}-{fmt}")
+
+
+def remove_old_copies(filename, fmt, keep_dir):
+    """
+    Delete the columnar copies of earlier versions of a CSV file from the cache directory,
+    a changed CSV gets a new directory and the old one would never be read again.
+
+    Args:
+        filename (str): Path to the CSV file.
+        fmt (str): parquet or ipc.
+        keep_dir (str): Directory of the current copy.
+    """
+    root = os.path.join(DEFAULT_CACHE_DIR, "columnar")
+    source = os.path.abspath(filename)
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if path == keep_dir or not name.endswith(f"-{fmt}"):
+            continue
+        manifest = load_manifest(path)
+        # Directories without manifest may be a conversion still running
+        if manifest and manifest["source"] == source:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def load_manifest(output_dir):
+    """
+    Args:
+        output_dir (str): Columnar directory.
+
+    Returns:
+        dict: The manifest, or None if the conversion never finished.
+    """
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def convert_csv(filename, output_dir=None, fmt="parquet", row_group_size=None):
+    """
+    Convert a CSV file once into compressed columnar part files, one per row group.
+    Row count, min, max and sum of every column of every row group are stored in a manifest,
+    so sums over the whole file can be answered without decoding any data.
+
+    Args:
+        filename (str): The path to the CSV file.
+        output_dir (str, optional): Directory of the columnar copy. Default is inside the cache directory,
+            where the copies of earlier versions of the file are deleted. Other files of the directory are kept.
+        fmt (str, optional): parquet (zstd) or ipc (lz4, memory mappable). Default is parquet.
+        row_group_size (int, optional): Rows per row group. Default is computed with get_chunk_size.
+
+    Returns:
+        dict: The manifest of the columnar copy.
+
+    Raises:
+        ValueError: If the format is not supported, or output_dir is not empty and holds no columnar copy.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Invalid format '{fmt}', choose from {', '.join(FORMATS)}")
+
+    in_cache = output_dir is None
+    if in_cache:
+        output_dir = columnar_dir(filename, fmt)
+    if row_group_size is None:
+        row_group_size = get_chunk_size(filename)
+
+    # Only the part files and manifest of an earlier conversion are removed, nothing else in the directory
+    if os.path.isdir(output_dir):
+        if not in_cache and load_manifest(output_dir) is None and os.listdir(output_dir):
+            raise ValueError(f"'{output_dir}' is not empty and holds no columnar copy, choose another directory")
+        for name in os.listdir(output_dir):
+            if PART_PATTERN.fullmatch(name) or name == MANIFEST_NAME:
+                os.remove(os.path.join(output_dir, name))
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Fingerprint of the CSV before reading it, a copy of a file changed since is converted again
+    fingerprint = file_fingerprint(filename)
+
+    row_groups = []
+    columns = None
+    reader = pl.read_csv_batched(filename, batch_size=row_group_size, has_header=False)
+
+    while True:
+        batch = reader.next_batches(1)
+        if not batch:
+            break
+        df = batch[0]
+        columns = df.columns
+
+        part = f"part-{len(row_groups):05d}.{FORMATS[fmt]}"
+        part_path = os.path.join(output_dir, part)
+        if fmt == "parquet":
+            df.write_parquet(part_path, compression="zstd", statistics=True)
+        else:
+            df.write_ipc(part_path, compression="lz4")
+
+        # Statistics of the row group, computed while the batch is still in memory
+        stats = df.select(
+            [pl.all().min().name.suffix("_min"), pl.all().max().name.suffix("_max"), pl.all().sum().name.suffix("_sum")]
+        ).row(0, named=True)
+        row_groups.append({
+            "file": part,
+            "rows": df.height,
+            "min": [stats[f"{col}_min"] for col in columns],
+            "max": [stats[f"{col}_max"] for col in columns],
+            "sum": [stats[f"{col}_sum"] for col in columns],
+        })
+
+    manifest = {
+        "source": os.path.abspath(filename),
+        "fingerprint": fingerprint,
+        "format": fmt,
+        "columns": columns or [],
+        "row_groups": row_groups,
+    }
+
+    # Written last, a directory without manifest is an unfinished conversion
+    with open(os.path.join(output_dir, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f)
+
+    if in_cache:
+        remove_old_copies(filename, fmt, output_dir)
+
+    return manifest
+
+
+def ensure_columnar(filename, fmt="parquet", output_dir=None):
+    """
+    Get the columnar copy of a CSV file, converting it the first time or when the CSV changed.
+
+    Args:
+        filename (str): Path to the CSV file.
+        fmt (str, optional): parquet or ipc. Default is parquet.
+        output_dir (str, optional): Directory of the copy, as given to convert_csv. Default is inside the cache directory.
+
+    Returns:
+        tuple: Columnar directory and its manifest.
+    """
+    if output_dir is None:
+        # The cache directory is named after the fingerprint, its copy is always current
+        cache_dir = columnar_dir(filename, fmt)
+        manifest = load_manifest(cache_dir)
+        if manifest is None:
+            manifest = convert_csv(filename, None, fmt)
+        return cache_dir, manifest
+
+    manifest = load_manifest(output_dir)
+    if manifest is None or manifest.get("fingerprint") != file_fingerprint(filename) or manifest["format"] != fmt:
+        manifest = convert_csv(filename, output_dir, fmt)
+    return output_dir, manifest
+
+
+def scan_columnar(filename, fmt="parquet", output_dir=None):
+    """
+    Lazy frame over the columnar copy of a CSV file, for aggregations the statistics cannot answer.
+    IPC files are memory mapped.
+
+    Args:
+        filename (str): Path to the CSV file.
+        fmt (str, optional): parquet or ipc. Default is parquet.
+        output_dir (str, optional): Directory of the copy. Default is inside the cache directory.
+
+    Returns:
+        pl.LazyFrame: Lazy frame over all the row groups.
+    """
+    output_dir, _ = ensure_columnar(filename, fmt, output_dir)
+    pattern = os.path.join(output_dir, f"part-*.{FORMATS[fmt]}")
+    if fmt == "parquet":
+        return pl.scan_parquet(pattern)
+    return pl.scan_ipc(pattern, memory_map=True)
+
+
+def columnar_csv_polar(filename, fmt="parquet", output_dir=None):
+    """
+    Computes the sum of all numeric columns from the row group statistics of the columnar copy.
+    The CSV is converted on the first run only, later runs don't parse or decode any data.
+
+    Args:
+        filename (str) -f : The path to the CSV file to process.
+        fmt (str, optional) --format : parquet or ipc. Default is parquet.
+        output_dir (str, optional) -o : Directory of the copy, as given to convert. Default is inside the cache directory.
+
+    Raises:
+        FileNotFoundError: If the CSV file is not found.
+        pl.exceptions.PolarsError: If there's an issue with reading the CSV using Polars.
+    Returns:
+        Result : A dictionary containing the total sum of all numeric columns , sum of each column , start time , end time, time spent , file size and memory used.
+    """
+    # track peak memory and time of each stage
+    profiler = Profiler()
+    try:
+        # Track start time and memory
+        start_time = time.time()
+        profiler.start()
+
+        # Converted on the first run only
+        with profiler.stage("open"):
+            _, manifest = ensure_columnar(filename, fmt, output_dir)
+
+        # Add up the row group sums of each column
+        column_sums = [0] * len(manifest["columns"])
+        for row_group in manifest["row_groups"]:
+            for i, value in enumerate(row_group["sum"]):
+                column_sums[i] += value or 0
+
+        total_sum = sum(column_sums)
+
+        # Track End time and Memory
+        end_time = time.time()
+        profiler.stop()
+        metrics = profiler.metrics()
+
+        # Time spent by the process
+        time_spent = end_time - start_time
+
+        # file size
+        file_size = os.path.getsize(filename) / (1024 * 1024)
+
+        # memory used, peak during the run over the memory at start
+        mem_used = metrics["mem_used"]
+
+        # Store all the info in result
+        result = {
+            "start_time":time.ctime(start_time) ,
+            "end_time" :time.ctime(end_time) ,
+            "time_spent" : time_spent ,
+            "file_size" : file_size ,
+            "mem_used" :mem_used ,
+            "peak_mem" : metrics["peak_rss"] ,
+            "stages" : metrics["stages"] ,
+            "total_sum" : total_sum ,
+            "column_sums" : column_sums
+
+        }
+
+        return result
+
+    except FileNotFoundError:
+        # Handle case when the file is not found
+        print(f"Error: File '{filename}' not found.")
+        raise
+    except pl.exceptions.PolarsError as e:
+        # Handle errors raised by Polars when reading the CSV
+        print(f"Error reading CSV with Polars: {e}")
+        raise
+    except Exception as e:
+        # Catch any unexpected exceptions
+        print(f"An unexpected error occurred: {e}")
+        raise
+    finally:
+        profiler.stop()
+
+
+if __name__ == '__main__':
+    # Set up command line argument parsing
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    convert_parser = subparsers.add_parser("convert", help="Convert a CSV file to columnar format")
+    convert_parser.add_argument('-f',type=str,help="Give path of the file")
+    convert_parser.add_argument('-o',type=str,default=None,help="Output directory, default is the cache directory")
+    convert_parser.add_argument('--format',type=str,default="parquet",choices=list(FORMATS),help="Columnar format")
+    convert_parser.add_argument('--row-group-size',type=int,default=None,help="Rows per row group")
+
+    sum_parser = subparsers.add_parser("sum", help="Sum of all columns from the columnar copy")
+    sum_parser.add_argument('-f',type=str,help="Give path of the file")
+    sum_parser.add_argument('-o',type=str,default=None,help="Directory of the columnar copy, default is the cache directory")
+    sum_parser.add_argument('--format',type=str,default="parquet",choices=list(FORMATS),help="Columnar format")
+
+    # Parse the command-line arguments
+    args:Namespace = parser.parse_args()
+
+    if args.command == "convert":
+        manifest = convert_csv(args.f, args.o, args.format, args.row_group_size)
+        print(f'Converted {args.f} into {len(manifest["row_groups"])} row groups')
+    else:
+        # Call the CSV process function with parsed arguments
+        data = columnar_csv_polar(args.f, args.format, args.o)
+
+        # Print Result
+        print_result(data)
@@ -0,0 +1,446 @@
+"""
+Reading of compressed CSV files (.gz, .bz2, .zst) without writing the decompressed content to disk.
+
+gzip and bzip2 use the standard library. .zst files need the optional zstandard package:
+
+    pip install zstandard
+
+It is imported only if installed, every other format works without it and opening a .zst file without it
+raises an ImportError saying what to install.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+import bz2
+import gzip
+import io
+import mmap
+import os
+import re
+import time
+import zlib
+
+import polars as pl
+import psutil
+
+from utils import merge_column_sums
+
+# zstandard is only needed for .zst files
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# Compression of a file from its extension
+COMPRESSED_EXTENSIONS = {
+    ".gz": "gzip",
+    ".gzip": "gzip",
+    ".bz2": "bz2",
+    ".zst": "zstd",
+    ".zstd": "zstd",
+}
+
+# Start of a bzip2 stream with at least one block, 10 bytes so a match inside compressed data is very unlikely
+BZ2_MAGIC = re.compile(rb"BZh[1-9]1AY&SY")
+
+# Header of a BGZF block: gzip member with the extra field set, the BC subfield holds the block size
+BGZF_HEADER = b"\x1f\x8b\x08\x04"
+
+# zstd frame and skippable frame magic numbers
+ZSTD_MAGIC = 0xFD2FB528
+ZSTD_SKIPPABLE_MASK = 0xFFFFFFF0
+ZSTD_SKIPPABLE_MAGIC = 0x184D2A50
+
+# Size of the pieces fed to and returned by a decompressor
+PIECE_SIZE = 1024 * 1024
+
+# Compressed bytes decompressed by one task of the thread pool, small members are grouped up to this size
+TASK_SIZE = 4 * 1024 * 1024
+
+# Members larger than this are streamed, a task holds the whole decompressed member in memory
+MAX_MEMBER_SIZE = 32 * 1024 * 1024
+
+# Errors of a decompressor started on bytes that are not a member
+DECOMPRESS_ERRORS = (zlib.error, OSError, EOFError, ValueError) + ((zstandard.ZstdError,) if zstandard else ())
+
+
+def compression_of(filename):
+    """
+    Args:
+        filename (str): Path of the file.
+
+    Returns:
+        str: gzip, bz2 or zstd, None if the file is not compressed.
+    """
+    return COMPRESSED_EXTENSIONS.get(os.path.splitext(filename)[1].lower())
+
+
+def require_zstandard():
+    if zstandard is None:
+        raise ImportError("Reading .zst files needs the zstandard package: pip install zstandard")
+
+
+def new_decompressor(compression):
+    """
+    Decompressor of one member/stream/frame, all of them expose eof and unused_data.
+    """
+    if compression == "gzip":
+        return zlib.decompressobj(wbits=31)
+    if compression == "bz2":
+        return bz2.BZ2Decompressor()
+    require_zstandard()
+    return zstandard.ZstdDecompressor().decompressobj()
+
+
+def open_compressed(f, compression):
+    """
+    Open a compressed file as a stream of decompressed bytes, following every member or frame.
+
+    Args:
+        f (file): Compressed file opened in binary mode, read from its current position. It is not closed.
+        compression (str): gzip, bz2 or zstd.
+
+    Returns:
+        file: Binary file object of the decompressed content.
+    """
+    if compression == "gzip":
+        return gzip.GzipFile(fileobj=f, mode='rb')
+    if compression == "bz2":
+        return bz2.BZ2File(f, mode='rb')
+    require_zstandard()
+    return zstandard.ZstdDecompressor().stream_reader(f, read_across_frames=True, closefd=False)
+
+
+def zstd_frames(data):
+    """
+    Exact start and end of every zstd frame, found from the frame and block headers without decompressing.
+    Skippable frames, e.g. the seek table of the seekable format, are left out.
+
+    Args:
+        data (mmap.mmap): Content of the compressed file.
+
+    Returns:
+        list: (start, end) byte offsets of every frame holding data.
+    """
+    frames = []
+    offset = 0
+    size = len(data)
+    while offset + 4 <= size:
+        magic = int.from_bytes(data[offset:offset + 4], "little")
+        if magic & ZSTD_SKIPPABLE_MASK == ZSTD_SKIPPABLE_MAGIC:
+            offset += 8 + int.from_bytes(data[offset + 4:offset + 8], "little")
+            continue
+        if magic != ZSTD_MAGIC:
+            raise ValueError(f"Not a zstd frame at byte {offset}")
+
+        # Frame header: descriptor, optional window, dictionary id and content size
+        start = offset
+        descriptor = data[offset + 4]
+        single_segment = descriptor >> 5 & 1
+        content_size_flag = descriptor >> 6
+        header_size = 1 + (0 if single_segment else 1) + (0, 1, 2, 4)[descriptor & 3] \
+            + ((1 if single_segment else 0), 2, 4, 8)[content_size_flag]
+        offset += 4 + header_size
+
+        # Blocks, 3 byte header: last block bit, type and size
+        while True:
+            if offset + 3 > size:
+                raise ValueError(f"Truncated zstd frame at byte {start}")
+            block_header = int.from_bytes(data[offset:offset + 3], "little")
+            block_type = block_header >> 1 & 3
+            block_size = block_header >> 3
+            # RLE blocks store a single byte
+            offset += 3 + (1 if block_type == 1 else block_size)
+            if block_header & 1:
+                break
+
+        # Optional content checksum
+        if descriptor >> 2 & 1:
+            offset += 4
+        frames.append((start, offset))
+    return frames
+
+
+def bgzf_members(data):
+    """
+    Exact start and end of every block of a BGZF file (blocked gzip, e.g. written by bgzip),
+    read from the BC subfield of the gzip headers without decompressing.
+
+    Args:
+        data (mmap.mmap): Content of the compressed file.
+
+    Returns:
+        list: (start, end) byte offsets of every block, None if the file is not BGZF.
+    """
+    members = []
+    offset = 0
+    size = len(data)
+    while offset < size:
+        if data[offset:offset + 4] != BGZF_HEADER:
+            return None
+        # Extra field: subfields of 2 id bytes, 2 length bytes and the data
+        extra_size = int.from_bytes(data[offset + 10:offset + 12], "little")
+        extra = data[offset + 12:offset + 12 + extra_size]
+        block_size = None
+        position = 0
+        while position + 4 <= len(extra):
+            subfield_size = int.from_bytes(extra[position + 2:position + 4], "little")
+            if extra[position:position + 2] == b"BC" and subfield_size == 2:
+                block_size = int.from_bytes(extra[position + 4:position + 6], "little") + 1
+            position += 4 + subfield_size
+        if block_size is None:
+            return None
+        if offset + block_size > size:
+            raise ValueError(f"Truncated BGZF block at byte {offset}")
+        members.append((offset, offset + block_size))
+        offset += block_size
+    return members
+
+
+def bz2_members(data):
+    """
+    Start and end of every stream of a multi-stream bzip2 file (e.g. written by pbzip2), from their magic bytes.
+    A stream ends where the next one starts, a wrong split is caught when the stream is decompressed.
+
+    Args:
+        data (mmap.mmap): Content of the compressed file.
+
+    Returns:
+        list: (start, end) byte offsets of every stream.
+    """
+    starts = [match.start() for match in BZ2_MAGIC.finditer(data)]
+    if not starts or starts[0] != 0:
+        return [(0, len(data))]
+    return list(zip(starts, starts[1:] + [len(data)]))
+
+
+def file_members(data, compression):
+    """
+    Members of a compressed file whose start and end are known before decompressing:
+    zstd frames, BGZF blocks and bzip2 streams. Plain gzip members can only be found by decompressing,
+    a search for the magic bytes also matches inside deflate data, so they are not split.
+
+    Args:
+        data (mmap.mmap): Content of the compressed file.
+        compression (str): gzip, bz2 or zstd.
+
+    Returns:
+        list: (start, end) byte offsets of every member, None if the file cannot be split.
+    """
+    if compression == "zstd":
+        return zstd_frames(data)
+    if compression == "bz2":
+        return bz2_members(data)
+    return bgzf_members(data)
+
+
+def decompress_members(data, members, compression):
+    """
+    Decompress consecutive members of a compressed file. Runs in a worker thread,
+    zlib, bz2 and zstandard release the GIL while decompressing.
+    Every member must end exactly at its end offset (zero padding aside), the gzip CRC and size are checked by zlib.
+
+    Args:
+        data (mmap.mmap): Content of the compressed file.
+        members (list): (start, end) byte offsets of the members.
+        compression (str): gzip, bz2 or zstd.
+
+    Returns:
+        bytes: Decompressed content of the members, None if a member does not end at its end offset.
+    """
+    pieces = []
+    for start, end in members:
+        decompressor = new_decompressor(compression)
+        offset = start
+        try:
+            while offset < end and not decompressor.eof:
+                piece = data[offset:min(offset + PIECE_SIZE, end)]
+                pieces.append(decompressor.decompress(piece))
+                offset += len(piece)
+        except DECOMPRESS_ERRORS:
+            return None
+        # Bytes of the member after the end of the compressed data
+        if not decompressor.eof or decompressor.unused_data.strip(b"\0") or data[offset:end].strip(b"\0"):
+            return None
+    return b"".join(pieces)
+
+
+def member_tasks(members):
+    """
+    Group consecutive members into tasks of about TASK_SIZE compressed bytes.
+
+    Args:
+        members (list): (start, end) byte offsets of the members.
+
+    Returns:
+        list: Lists of members.
+    """
+    tasks = []
+    task = []
+    task_size = 0
+    for member in members:
+        task.append(member)
+        task_size += member[1] - member[0]
+        if task_size >= TASK_SIZE:
+            tasks.append(task)
+            task, task_size = [], 0
+    if task:
+        tasks.append(task)
+    return tasks
+
+
+def iter_stream(filename, offset=0):
+    """
+    Decompressed content of a compressed file read sequentially, one piece at a time.
+
+    Args:
+        filename (str): Path of the compressed file.
+        offset (int, optional): Byte offset of the member or frame to start from. Default is 0.
+
+    Yields:
+        bytes: Decompressed pieces in file order.
+    """
+    with open(filename, 'rb') as f:
+        f.seek(offset)
+        with open_compressed(f, compression_of(filename)) as stream:
+            while True:
+                piece = stream.read(PIECE_SIZE)
+                if not piece:
+                    break
+                yield piece
+
+
+def iter_decompressed(filename, num_workers=None, window_size=None):
+    """
+    Decompressed content of a compressed file as a sequence of byte pieces, in file order.
+    Files whose members are known from their headers (zstd frames, BGZF blocks, multi-stream bzip2)
+    are decompressed on a pool of threads, at most window_size compressed bytes ahead of the consumer.
+    Other files, and files with a member larger than MAX_MEMBER_SIZE, are streamed.
+    If a member turns out not to end where expected, the rest of the file is streamed from that member.
+
+    Args:
+        filename (str): Path of the compressed file.
+        num_workers (int, optional): Number of decompression threads. Default is the number of physical CPU cores.
+        window_size (int, optional): Compressed bytes decompressed ahead. Default is 2 tasks per worker.
+
+    Yields:
+        bytes: Decompressed pieces in file order.
+    """
+    compression = compression_of(filename)
+    if not num_workers:
+        num_workers = psutil.cpu_count(logical=False) or 1
+    if not window_size:
+        window_size = 2 * num_workers * TASK_SIZE
+    if compression == "zstd":
+        require_zstandard()
+
+    with open(filename, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            members = file_members(data, compression) if num_workers > 1 else None
+            if not members or len(members) < 2 or max(end - start for start, end in members) > MAX_MEMBER_SIZE:
+                data.close()
+                data = None
+                yield from iter_stream(filename)
+                return
+
+            with ThreadPoolExecutor(max_workers=num_workers) as executor:
+                pending = deque()
+                pending_size = 0
+                tasks = iter(member_tasks(members))
+                end = 0
+                while True:
+                    # Keep the pool busy, a bounded number of compressed bytes ahead
+                    for task in tasks:
+                        task_size = task[-1][1] - task[0][0]
+                        pending.append((task, task_size, executor.submit(decompress_members, data, task, compression)))
+                        pending_size += task_size
+                        if pending_size >= window_size:
+                            break
+                    if not pending:
+                        break
+                    task, task_size, future = pending.popleft()
+                    pending_size -= task_size
+                    content = future.result()
+                    if content is None:
+                        # Wrong split, e.g. bzip2 magic bytes inside a stream: stream the rest
+                        for _, _, future in pending:
+                            future.cancel()
+                        pending.clear()
+                        yield from iter_stream(filename, task[0][0])
+                        return
+                    end = task[-1][1]
+                    yield content
+
+                # Anything after the last member other than zero padding is not part of the content
+                if data[end:].strip(b"\0"):
+                    raise ValueError(f"Trailing data after byte {end} of '{filename}'")
+        finally:
+            if data is not None:
+                data.close()
+
+
+def compressed_batches(filename, block_size=64 * 1024 * 1024, schema=None, num_workers=None):
+    """
+    Parse a compressed CSV file into DataFrames while it is decompressed, without writing the content to disk.
+    Decompressed pieces are gathered into blocks of about block_size bytes cut after the last complete line.
+
+    Args:
+        filename (str): Path of the compressed CSV file, without header.
+        block_size (int, optional): Decompressed bytes parsed at once. Default is 64 MB.
+        schema (list, optional): dtype of every column. Default is None (Polars defaults).
+        num_workers (int, optional): Number of decompression threads. Default is the number of physical CPU cores.
+
+    Yields:
+        pl.DataFrame: Parsed batch.
+    """
+    columns = None
+    pieces = []
+    buffered = 0
+
+    def parse(block):
+        nonlocal columns
+        df = pl.read_csv(io.BytesIO(block), has_header=False, new_columns=columns, schema_overrides=schema)
+        # Same column names in every batch
+        columns = df.columns
+        return df
+
+    for piece in iter_decompressed(filename, num_workers):
+        pieces.append(piece)
+        buffered += len(piece)
+        if buffered < block_size:
+            continue
+
+        block = b"".join(pieces)
+        cut = block.rfind(b"\n") + 1
+        if cut == 0:
+            # No complete line yet, keep reading
+            pieces = [block]
+            continue
+        rest = block[cut:]
+        pieces, buffered = [rest], len(rest)
+        yield parse(block[:cut])
+
+    block = b"".join(pieces)
+    if block.strip():
+        yield parse(block)
+
+
+def compressed_column_sums(filename):
+    """
+    Sum of every column of a compressed CSV file, for a worker process of a pool.
+    Same result shape as process_byte_range.
+
+    Args:
+        filename (str): Path of the compressed CSV file.
+
+    Returns:
+        dict: Sum of each column, pid of the worker and (wall clock start, duration) of each stage.
+    """
+    stage_start = time.time()
+    column_sums = []
+    for batch in compressed_batches(filename, num_workers=1):
+        merge_column_sums(column_sums, batch.select(pl.all().sum()).row(0))
+    return {"column_sums": column_sums, "pid": os.getpid(), "stages": {"parse": (stage_start, time.time() - stage_start)}}
@@ -0,0 +1,250 @@
+import polars as pl
+import time
+import io
+import os
+import json
+import hashlib
+import argparse
+from argparse import Namespace
+
+from profiling import Profiler
+from report import print_result
+from utils import merge_column_sums
+from cache import DEFAULT_CACHE_DIR
+
+
+# Bytes hashed at the start of the file and just before the checkpoint offset
+GUARD_SIZE = 64 * 1024
+
+
+def default_checkpoint_path(filename, suffix=""):
+    """
+    Path of the checkpoint of a CSV file inside the cache directory.
+
+    Args:
+        filename (str): Path to the CSV file.
+        suffix (str, optional): Added to the name so different modes keep separate checkpoints. Default is "".
+
+    Returns:
+        str: Path of the checkpoint file.
+    """
+    key = hashlib.blake2b(os.path.abspath(filename).encode(), digest_size=16).hexdigest()
+    return os.path.join(DEFAULT_CACHE_DIR, "checkpoints", f"{key}{suffix}.json")
+
+
+def guard_hash(f, offset):
+    """
+    Hash the start of the file and the bytes just before the offset.
+    If either changed, the file was rewritten and not only appended to.
+
+    Args:
+        f (file): CSV file opened in binary mode.
+        offset (int): Offset of the checkpoint.
+
+    Returns:
+        str: Hex digest of the guarded bytes.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    f.seek(0)
+    digest.update(f.read(min(GUARD_SIZE, offset)))
+    f.seek(max(offset - GUARD_SIZE, 0))
+    digest.update(f.read(min(GUARD_SIZE, offset)))
+    return digest.hexdigest()
+
+
+def load_checkpoint(checkpoint_path):
+    """
+    Args:
+        checkpoint_path (str): Path of the checkpoint file.
+
+    Returns:
+        dict: The checkpoint, or None if there is no valid checkpoint.
+    """
+    try:
+        with open(checkpoint_path) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def save_checkpoint(checkpoint_path, checkpoint):
+    """
+    Write the checkpoint atomically, an interrupted write leaves the previous one in place.
+
+    Args:
+        checkpoint_path (str): Path of the checkpoint file.
+        checkpoint (dict): Offset, guard hash and column sums to store.
+    """
+    os.makedirs(os.path.dirname(checkpoint_path), exist_ok=True)
+    tmp_path = f"{checkpoint_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, checkpoint_path)
+
+
+def last_row_end(f, start, end):
+    """
+    Find the offset right after the last newline between start and end, searching backwards from the end.
+
+    Args:
+        f (file): CSV file opened in binary mode.
+        start (int): Offset where the search stops.
+        end (int): Offset where the search starts.
+
+    Returns:
+        int: Offset after the last complete row, start if there is none.
+    """
+    position = end
+    while position > start:
+        block_start = max(position - GUARD_SIZE, start)
+        f.seek(block_start)
+        newline = f.read(position - block_start).rfind(b'\n')
+        if newline != -1:
+            return block_start + newline + 1
+        position = block_start
+    return start
+
+
+def sum_range(f, start, end, column_sums, block_size):
+    """
+    Parse the bytes between start and end block by block and add their column sums.
+
+    Args:
+        f (file): CSV file opened in binary mode.
+        start (int): Offset of the first byte, at the start of a row.
+        end (int): Offset after the last complete row.
+        column_sums (list): Running sum of each column, updated in place.
+        block_size (int): Approximate size of each parsed block in bytes.
+    """
+    f.seek(start)
+    position = start
+    while position < end:
+        data = f.read(min(block_size, end - position))
+        # Finish the last row of the block
+        if not data.endswith(b'\n') and position + len(data) < end:
+            data += f.readline()
+        position += len(data)
+
+        if data.strip():
+            df = pl.read_csv(io.BytesIO(data), has_header=False)
+            merge_column_sums(column_sums, df.select(pl.all().sum()).row(0))
+
+
+def incremental_csv_polar(filename, checkpoint_path=None, block_size=64 * 1024 * 1024):
+    """
+    Computes the sum of all numeric columns of an append only CSV file, parsing only what was appended since the last run.
+    The last processed offset and the running column sums are kept in a checkpoint. If the file got shorter
+    or the bytes before the offset changed, the file was truncated or rewritten and it is scanned again from the start.
+    A row that is still being written (no newline yet) is left for the next run.
+
+    Args:
+        filename (str) -f : The path to the CSV file to process.
+        checkpoint_path (str, optional) -c : Path of the checkpoint file. Default is inside the cache directory.
+        block_size (int, optional): Approximate size of each parsed block in bytes. Default is 64 MB.
+
+    Raises:
+        FileNotFoundError: If the CSV file is not found.
+        pl.exceptions.PolarsError: If there's an issue with reading the CSV using Polars.
+    Returns:
+        Result : A dictionary containing the total sum of all numeric columns , sum of each column , start time , end time, time spent , file size , memory used , scan mode and bytes parsed.
+    """
+    # track peak memory and time of each stage
+    profiler = Profiler()
+    try:
+        # Track start time and memory
+        start_time = time.time()
+        profiler.start()
+
+        if checkpoint_path is None:
+            checkpoint_path = default_checkpoint_path(filename)
+
+        file_size_bytes = os.path.getsize(filename)
+        checkpoint = load_checkpoint(checkpoint_path)
+
+        with open(filename, 'rb') as f:
+            # Resume only if the file still starts with the bytes already processed
+            offset = 0
+            column_sums = []
+            mode = "full"
+            if checkpoint and checkpoint["offset"] <= file_size_bytes \
+                    and guard_hash(f, checkpoint["offset"]) == checkpoint["guard_hash"]:
+                offset = checkpoint["offset"]
+                column_sums = checkpoint["column_sums"]
+                mode = "incremental"
+
+            # Stop after the last complete row
+            end = last_row_end(f, offset, file_size_bytes)
+
+            with profiler.stage("parse"):
+                sum_range(f, offset, end, column_sums, block_size)
+
+            save_checkpoint(checkpoint_path, {
+                "offset": end,
+                "guard_hash": guard_hash(f, end),
+                "column_sums": column_sums,
+            })
+
+        total_sum = sum(column_sums)
+
+        # Track End time and Memory
+        end_time = time.time()
+        profiler.stop()
+        metrics = profiler.metrics()
+
+        # Time spent by the process
+        time_spent = end_time - start_time
+
+        # file size
+        file_size = file_size_bytes / (1024 * 1024)
+
+        # memory used, peak during the run over the memory at start
+        mem_used = metrics["mem_used"]
+
+        # Store all the info in result
+        result = {
+            "start_time":time.ctime(start_time) ,
+            "end_time" :time.ctime(end_time) ,
+            "time_spent" : time_spent ,
+            "file_size" : file_size ,
+            "mem_used" :mem_used ,
+            "peak_mem" : metrics["peak_rss"] ,
+            "stages" : metrics["stages"] ,
+            "total_sum" : total_sum ,
+            "column_sums" : column_sums ,
+            "mode" : mode ,
+            "bytes_parsed" : end - offset
+
+        }
+
+        return result
+
+    except FileNotFoundError:
+        # Handle case when the file is not found
+        print(f"Error: File '{filename}' not found.")
+        raise
+    except pl.exceptions.PolarsError as e:
+        # Handle errors raised by Polars when reading the CSV
+        print(f"Error reading CSV with Polars: {e}")
+        raise
+    except Exception as e:
+        # Catch any unexpected exceptions
+        print(f"An unexpected error occurred: {e}")
+        raise
+    finally:
+        profiler.stop()
+
+
+if __name__ == '__main__':
+    # Set up command line argument parsing
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-f',type=str,help="Give path of the file")
+    parser.add_argument('-c',type=str,default=None,help="Path of the checkpoint file")
+
+    # Parse the command-line arguments
+    args:Namespace = parser.parse_args()
+
+    # Call the CSV process function with parsed arguments
+    data = incremental_csv_polar(args.f, args.c)
+
+    # Print Result
+    print_result(data)
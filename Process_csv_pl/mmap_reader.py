@@ -0,0 +1,23 @@
+import os
+import polars as pl
+
+
+def mmap_column_sums(filename):
+    """
+    Compute the sum of every column of a headerless CSV without loading the whole file.
+    The Polars streaming engine memory maps the file and parses it in morsels on all cores, dropping each one
+    once it is summed, so memory use stays the same whatever the size of the file. LF and CRLF line ends
+    are both read. Values are the ones pl.read_csv gives, or its error is raised.
+
+    Args:
+        filename (str): The path to the CSV file.
+
+    Returns:
+        list: Sum of each column.
+    """
+    # An empty file has no columns
+    if os.path.getsize(filename) == 0:
+        return []
+
+    query = pl.scan_csv(filename, has_header=False).select(pl.all().sum())
+    return list(query.collect(engine="streaming").row(0))
@@ -0,0 +1,254 @@
+import polars as pl
+import numpy as np
+import time
+import io
+import os
+import argparse
+from argparse import Namespace
+from statistics import NormalDist
+
+from profiling import Profiler
+from report import print_result
+
+
+def read_block(f, index, block_size, file_size):
+    """
+    Read block number index of the file, moved to line boundaries: a block starts after the first
+    newline at or after index * block_size and ends after the first newline at or after the next block start.
+    Blocks computed this way never overlap and together cover the whole file.
+
+    Args:
+        f (file): CSV file opened in binary mode.
+        index (int): Number of the block.
+        block_size (int): Size of a block in bytes before alignment.
+        file_size (int): Size of the file in bytes.
+
+    Returns:
+        bytes: Complete rows of the block, may be empty.
+    """
+    def aligned(offset):
+        if offset <= 0:
+            return 0
+        if offset >= file_size:
+            return file_size
+        f.seek(offset - 1)
+        f.readline()
+        return f.tell()
+
+    start = aligned(index * block_size)
+    end = aligned((index + 1) * block_size)
+    f.seek(start)
+    return f.read(end - start)
+
+
+class RatioSums:
+    """
+    Running sums of the sampled blocks needed by the ratio estimator: n, sum of x, x squared, y, x times y and
+    y squared. Adding a block costs the same whatever the number of blocks already read.
+    y can get longer from one block to the next (columns appearing), earlier blocks count as 0 for the new entries.
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.sum_x = 0.0
+        self.sum_xx = 0.0
+        self.sum_y = np.zeros(0)
+        self.sum_xy = np.zeros(0)
+        self.sum_yy = np.zeros(0)
+
+    def add(self, y, x):
+        """
+        Args:
+            y (list): Values of the block, one per estimated quantity.
+            x (float): Auxiliary value of the block.
+        """
+        y = np.asarray(y, dtype=np.float64)
+        if len(y) > len(self.sum_y):
+            grow = len(y) - len(self.sum_y)
+            self.sum_y, self.sum_xy, self.sum_yy = (np.pad(total, (0, grow))
+                                                    for total in (self.sum_y, self.sum_xy, self.sum_yy))
+        elif len(y) < len(self.sum_y):
+            y = np.pad(y, (0, len(self.sum_y) - len(y)))
+        self.n += 1
+        self.sum_x += x
+        self.sum_xx += x * x
+        self.sum_y += y
+        self.sum_xy += x * y
+        self.sum_yy += y * y
+
+
+def ratio_estimate(sums, total_x, num_blocks, z):
+    """
+    Ratio estimator of a population total from sampled blocks, with its confidence interval half width.
+    Each block gives y (e.g. sum of a column) and x (e.g. number of bytes), the total of x over the file is known.
+    The residual variance sum((y - ratio * x)^2) is expanded over the running sums, so no block is read again.
+
+    Args:
+        sums (RatioSums): Running sums of the sampled blocks.
+        total_x (float): Total of the auxiliary value over the whole file.
+        num_blocks (int): Number of blocks in the file, for the finite population correction.
+        z (float): Normal quantile of the confidence level.
+
+    Returns:
+        tuple: Estimated totals and half widths of their confidence intervals.
+    """
+    n = sums.n
+    ratio = sums.sum_y / sums.sum_x
+    estimate = ratio * total_x
+    if n < 2:
+        return estimate, np.full_like(estimate, np.inf, dtype=np.float64)
+
+    residual_sq = sums.sum_yy - 2 * ratio * sums.sum_xy + ratio ** 2 * sums.sum_xx
+    # Rounding can leave a tiny negative value when the residuals are all close to 0
+    residual_var = np.maximum(residual_sq, 0) / (n - 1)
+    fpc = 1 - n / num_blocks
+    standard_error = total_x / (sums.sum_x / n) * np.sqrt(fpc * residual_var / n)
+    return estimate, z * standard_error
+
+
+def approximate_csv_polar(filename, error=0.01, confidence=0.95, block_size_mb=1, min_blocks=10, seed=None):
+    """
+    Estimates the sum and mean of all numeric values of a CSV file from a random sample of its blocks.
+    Blocks are read in random order and the estimate is refined after each one, it stops as soon as
+    the confidence interval of the total sum is within the requested relative error, or when the whole file was read.
+
+    Args:
+        filename (str) -f : The path to the CSV file to process.
+        error (float, optional) -e : Target relative error of the total sum, 0.01 = 1%. Default is 0.01.
+        confidence (float, optional) -c : Confidence level of the intervals. Default is 0.95.
+        block_size_mb (float, optional) -b : Size of a sampled block in MB. Default is 1.
+        min_blocks (int, optional): Blocks read before stopping is allowed. Default is 10.
+        seed (int, optional) --seed : Seed of the block sampling. Default is None.
+
+    Raises:
+        FileNotFoundError: If the CSV file is not found.
+        pl.exceptions.PolarsError: If there's an issue with reading the CSV using Polars.
+    Returns:
+        Result : A dictionary containing the estimated total sum and mean with their confidence intervals , estimated sum of each column , fraction of the file read , start time , end time, time spent , file size and memory used.
+    """
+    profiler = Profiler()
+    try:
+        # Track start time and memory
+        start_time = time.time()
+        profiler.start()
+
+        file_size_bytes = os.path.getsize(filename)
+        block_size = max(1, int(block_size_mb * 1024 * 1024))
+        num_blocks = max(1, -(-file_size_bytes // block_size))
+        z = NormalDist().inv_cdf(0.5 + confidence / 2)
+
+        # Random order of the blocks, sampling without replacement
+        order = np.random.default_rng(seed).permutation(num_blocks)
+
+        # Running sums of the sampled blocks: totals against bytes, and sums against number of values for the mean
+        total_sums = RatioSums()
+        mean_sums = RatioSums()
+        bytes_read = 0
+
+        total_sum = mean = 0.0
+        sum_half_width = mean_half_width = np.inf
+        column_estimates = np.zeros(0)
+
+        with open(filename, 'rb') as f:
+            for sampled, index in enumerate(order, start=1):
+                with profiler.stage("parse", int(index)):
+                    data = read_block(f, int(index), block_size, file_size_bytes)
+                    df = pl.read_csv(io.BytesIO(data), has_header=False) if data.strip() else None
+
+                with profiler.stage("aggregate", int(index)):
+                    bytes_read += len(data)
+                    if df is None:
+                        values = 0
+                        column_sums = []
+                    else:
+                        values = df.height * df.width - df.null_count().sum_horizontal().item()
+                        column_sums = [value or 0 for value in df.select(pl.all().sum()).row(0)]
+                    block_sum = float(sum(column_sums))
+
+                with profiler.stage("reduce", int(index)):
+                    # Totals estimated with the bytes of the file as auxiliary value
+                    total_sums.add([block_sum] + column_sums, len(data))
+                    estimates, half_widths = ratio_estimate(total_sums, file_size_bytes, num_blocks, z)
+                    total_sum = estimates[0]
+                    sum_half_width = half_widths[0]
+                    column_estimates = estimates[1:]
+
+                    # Mean of all values, ratio of the sampled sums to the sampled counts
+                    mean_sums.add([block_sum], values)
+                    mean_estimate, mean_half = ratio_estimate(mean_sums, 1.0, num_blocks, z) \
+                        if mean_sums.sum_x else (np.zeros(1), np.full(1, np.inf))
+                    mean, mean_half_width = mean_estimate[0], mean_half[0]
+
+                # Whole file read, the answer is exact
+                if sampled == num_blocks:
+                    sum_half_width = mean_half_width = 0.0
+                    break
+
+                # Stop once the interval is narrow enough
+                if sampled >= min_blocks and total_sum and sum_half_width <= error * abs(total_sum):
+                    break
+
+        # Track End time and Memory
+        end_time = time.time()
+        profiler.stop()
+        metrics = profiler.metrics()
+
+        # Time spent by the process
+        time_spent = end_time - start_time
+
+        # file size
+        file_size = file_size_bytes / (1024 * 1024)
+
+        # Store all the info in result
+        result = {
+            "start_time":time.ctime(start_time) ,
+            "end_time" :time.ctime(end_time) ,
+            "time_spent" : time_spent ,
+            "file_size" : file_size ,
+            "mem_used" : metrics["mem_used"] ,
+            "peak_mem" : metrics["peak_rss"] ,
+            "total_sum" : float(total_sum) ,
+            "total_sum_ci" : (float(total_sum - sum_half_width), float(total_sum + sum_half_width)) ,
+            "mean" : float(mean) ,
+            "mean_ci" : (float(mean - mean_half_width), float(mean + mean_half_width)) ,
+            "column_sums" : column_estimates.tolist() ,
+            "fraction_read" : bytes_read / file_size_bytes if file_size_bytes else 1.0 ,
+            "confidence" : confidence
+
+        }
+
+        return result
+
+    except FileNotFoundError:
+        # Handle case when the file is not found
+        print(f"Error: File '{filename}' not found.")
+        raise
+    except pl.exceptions.PolarsError as e:
+        # Handle errors raised by Polars when reading the CSV
+        print(f"Error reading CSV with Polars: {e}")
+        raise
+    except Exception as e:
+        # Catch any unexpected exceptions
+        print(f"An unexpected error occurred: {e}")
+        raise
+    finally:
+        profiler.stop()
+
+
+if __name__ == '__main__':
+    # Set up command line argument parsing
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-f',type=str,help="Give path of the file")
+    parser.add_argument('-e',type=float,default=0.01,help="Target relative error, 0.01 = 1%%")
+    parser.add_argument('-c',type=float,default=0.95,help="Confidence level")
+    parser.add_argument('-b',type=float,default=1,help="Size of a sampled block in MB")
+    parser.add_argument('--seed',type=int,default=None,help="Seed of the block sampling")
+
+    # Parse the command-line arguments
+    args:Namespace = parser.parse_args()
+
+    # Call the CSV process function with parsed arguments
+    data = approximate_csv_polar(args.f, args.e, args.c, args.b, seed=args.seed)
+
+    # Print Result
+    print_result(data)
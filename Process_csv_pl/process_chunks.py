@@ -1,60 +1,128 @@
 import polars as pl
 import time
 import os
-import psutil
 import argparse
 from argparse import Namespace
 
-from utils import get_chunk_size
+from utils import get_chunk_size, merge_column_sums, iter_batches, infer_schema, sum_exprs
+from aggregates import frame_states, merge_states
+from adaptive import AdaptiveChunkSizer, adaptive_batches
+from compressed import compression_of, compressed_batches
+from cache import ResultCache
+from profiling import Profiler
+from report import print_result
 
 
-def chunk_csv_polar(filename):
+def chunk_csv_polar(filename, adaptive=False, memory_limit_mb=None, use_cache=False, trace_path=None, stats=False,
+                    compact=False, memory_budget_mb=None):
     """
     Reads a large CSV file in chunks and computes the total sum of all numeric columns.
     It tracks execution time, memory usage, and handles errors like missing files and reading issues.
 
+    In adaptive mode the size of every batch is decided from the parse time and memory of the previous ones.
+    With stats, count, min, max, mean, variance and approximate quantiles of every column are computed in the same pass.
+    In compact mode the file is read with the narrowest safe dtypes inferred from samples, so batches take less memory
+    and hold more rows. If a value does not fit, the file is read again with the default dtypes.
+    .gz, .bz2 and .zst files are decompressed straight into the batches, members or frames in parallel.
+
     Args:
         filename (str): The path to the CSV file to process.
+        adaptive (bool, optional) --adaptive : Resize batches while reading. Default is False.
+        memory_limit_mb (int, optional) --max-mem : Memory ceiling in MB for adaptive mode. Default is 60% of available memory.
+        use_cache (bool, optional) --cache : Return the stored result if the file was processed before. Default is False.
+        trace_path (str, optional) --trace : Write the timed stages as a Chrome trace to this file. Default is None.
+        stats (bool, optional) --stats : Compute the statistics of every column. Default is False.
+        compact (bool, optional) --compact : Read with the narrowest safe dtypes. Default is False.
+        memory_budget_mb (int, optional): Memory in MB adaptive mode may add to what the process holds when it starts,
+            instead of the memory_limit_mb ceiling. Default is None.
 
     Raises:
         FileNotFoundError: If the CSV file is not found.
         pl.exceptions.PolarsError: If there's an issue with reading the CSV using Polars.
 
     Returns:
-        Result : A dictionary containing the total sum of all numeric columns , start time , end time, time spent , file size and memory used.
+        Result : A dictionary containing the total sum of all numeric columns , sum of each column , start time , end time, time spent , file size , memory used , peak memory , time of each stage , cache status and statistics of each column.
     """
+    # Track peak memory and time of each stage
+    profiler = Profiler()
     try:
         # start time
         start_time = time.time()
-
-        # Track initial memory usage
-        process = psutil.Process(os.getpid())
-        mem_before = process.memory_info().rss
-
-        # To calculate chunk size based on  memory available
-        chunk_size = get_chunk_size(filename)
-
-        total_sum = 0
-
-        # Read Csv in batches
-        reader = pl.read_csv_batched(filename, batch_size=chunk_size,has_header=False)
-
-        while True:
-            batch = reader.next_batches(1)
-            if not batch:
-                break  # If no more batches, break the loop
-
-            # column wise sum of batch
-            df_batch = batch[0].select(pl.all().sum())
-            # get first row
-            batch_row = df_batch.row(0)
-
-            total_sum += sum(batch_row)
+        profiler.start()
+
+        # Look for a stored result of the same file content
+        cache = ResultCache() if use_cache else None
+        # Only the sums are cached, statistics always read the file
+        cached = cache.get(filename) if cache and not stats else None
+        cache_status = None
+
+        column_sums = []
+
+        column_states = []
+
+        if cached:
+            column_sums = cached["column_sums"]
+            cache_status = "hit"
+        else:
+            with profiler.stage("open"):
+                # Compressed files are sampled and split after decompression
+                compressed = compression_of(filename)
+
+                # Narrowest dtype of every column, sums are widened to Int64
+                schema = infer_schema(filename) if compact and not compressed else None
+
+                if compressed:
+                    # Decompressed blocks parsed as they come, nothing written to disk
+                    batches = compressed_batches(filename, schema=schema)
+                elif adaptive:
+                    # Batch size follows measured parse time and memory
+                    memory_limit = memory_limit_mb * 1024 * 1024 if memory_limit_mb else None
+                    memory_budget = memory_budget_mb * 1024 * 1024 if memory_budget_mb else None
+                    sizer = AdaptiveChunkSizer(memory_limit=memory_limit, memory_budget=memory_budget)
+                    batches = adaptive_batches(filename, sizer, schema=schema)
+                else:
+                    # To calculate chunk size based on  memory available
+                    chunk_size = get_chunk_size(filename, schema=schema)
+
+                    # Read Csv in batches
+                    reader = pl.read_csv_batched(filename, batch_size=chunk_size,has_header=False,schema_overrides=schema)
+                    batches = iter_batches(reader)
+
+            batch_index = 0
+            while True:
+                with profiler.stage("parse", batch_index):
+                    batch = next(batches, None)
+                if batch is None:
+                    break  # If no more batches, break the loop
+
+                with profiler.stage("aggregate", batch_index):
+                    if stats:
+                        # All statistics of every column in one pass, the sums come with them
+                        batch_states = frame_states(batch)
+                        batch_row = [state.sum for state in batch_states]
+                    else:
+                        # column wise sum of batch
+                        batch_row = batch.select(sum_exprs(schema)).row(0)
+
+                with profiler.stage("reduce", batch_index):
+                    merge_column_sums(column_sums, batch_row)
+                    if stats:
+                        merge_states(column_states, batch_states)
+                batch_index += 1
+
+        total_sum = sum(column_sums)
+
+        # Store the result for the next run
+        if cache and not cached:
+            cache.put(filename, {"column_sums": column_sums, "total_sum": total_sum})
+            cache_status = "miss"
 
         # End time
         end_time = time.time()
-        # Track final memory usage
-        mem_after = process.memory_info().rss
+        profiler.stop()
+        metrics = profiler.metrics()
+        if trace_path:
+            profiler.write_chrome_trace(trace_path)
 
         # Time spent by the process
         time_spent = end_time - start_time
@@ -62,8 +130,8 @@ def chunk_csv_polar(filename):
         # file size
         file_size = os.path.getsize(filename) / (1024 * 1024)
 
-        # memory used
-        mem_used=(mem_after - mem_before) / (1024 * 1024)
+        # memory used, peak during the run over the memory at start
+        mem_used = metrics["mem_used"]
 
         # Store all the info in result
         result = {
@@ -72,7 +140,12 @@ def chunk_csv_polar(filename):
             "time_spent" : time_spent ,
             "file_size" : file_size ,
             "mem_used" :mem_used ,
-            "total_sum" : total_sum
+            "peak_mem" : metrics["peak_rss"] ,
+            "stages" : metrics["stages"] ,
+            "total_sum" : total_sum ,
+            "column_sums" : column_sums ,
+            "cache" : cache_status ,
+            "column_stats" : [state.result() for state in column_states] if stats else None
 
         }
 
@@ -82,6 +155,14 @@ def chunk_csv_polar(filename):
         # Handle case when the file is not found
         print(f"Error: File '{filename}' not found.")
         raise
+    except pl.exceptions.ComputeError as e:
+        if compact:
+            # A value did not fit the inferred dtype
+            print(f"Compact dtypes too narrow ({e}), reading again with default dtypes")
+            return chunk_csv_polar(filename, adaptive, memory_limit_mb, use_cache, trace_path, stats, compact=False,
+                                   memory_budget_mb=memory_budget_mb)
+        print(f"Error reading CSV with Polars: {e}")
+        raise
     except pl.exceptions.PolarsError as e:
         # Handle errors raised by Polars when reading the CSV
         print(f"Error reading CSV with Polars: {e}")
@@ -90,6 +171,8 @@ def chunk_csv_polar(filename):
         # Catch any unexpected exceptions
         print(f"An unexpected error occurred: {e}")
         raise
+    finally:
+        profiler.stop()
 
 
 
@@ -97,20 +180,21 @@ if __name__ == '__main__':
     # Set up command line argument parsing
     parser = argparse.ArgumentParser()
     parser.add_argument('-f',type=str,help="Give path of the file")
+    parser.add_argument('--adaptive',action='store_true',help="Resize batches from measured parse time and memory")
+    parser.add_argument('--max-mem',type=int,default=None,help="Memory ceiling in MB for adaptive mode")
+    parser.add_argument('--cache',action='store_true',help="Reuse the stored result if the file did not change")
+    parser.add_argument('--trace',type=str,default=None,help="Write a Chrome trace of the stages to this file")
+    parser.add_argument('--stats',action='store_true',help="Compute count, min, max, mean, variance and quantiles of every column")
+    parser.add_argument('--compact',action='store_true',help="Read with the narrowest safe dtypes")
 
     # Parse the command-line arguments
     args:Namespace = parser.parse_args()
 
     # Call the CSV process function with parsed arguments
-    data = chunk_csv_polar(args.f)
+    data = chunk_csv_polar(args.f, args.adaptive, args.max_mem, args.cache, args.trace, args.stats, args.compact)
 
     # Print Data
-    print(f'Start Time        : {data["start_time"]}')
-    print(f'End Time          : {data["end_time"]}')
-    print(f'Time Spent        : {data["time_spent"]:.2f} seconds')
-    print(f'File Size         : {data["file_size"]:.2f} MB')
-    print(f'Memory Used       : {data["mem_used"]:.2f} MB')
-    print(f'Total Sum of CSV  : {data["total_sum"]}')
+    print_result(data)
 
 # OUTPUT
 # Start Time        : Mon Apr 28 21:25:33 2025
@@ -0,0 +1,176 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
+import polars as pl
+import time
+import io
+import os
+import psutil
+import argparse
+from argparse import Namespace
+
+from utils import get_byte_ranges, merge_column_sums
+from profiling import Profiler
+
+
+def process_byte_range(filename, start, end):
+    """
+    Reads one newline aligned byte range of the CSV file, parses it and computes the sum of every column.
+    Runs inside a worker process, so parsing happens in parallel and not on the main thread.
+
+    Args:
+        filename (str): The path to the CSV file.
+        start (int): Byte offset where the range starts.
+        end (int): Byte offset where the range ends.
+
+    Returns:
+        dict: Sum of each column in this range, pid of the worker and (wall clock start, duration) of each stage.
+    """
+    stages = {}
+
+    # Read only the bytes of this range
+    stage_start = time.time()
+    with open(filename, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    stages["open"] = (stage_start, time.time() - stage_start)
+
+    column_sums = []
+    if data.strip():
+        # Parse the range
+        stage_start = time.time()
+        df = pl.read_csv(io.BytesIO(data), has_header=False)
+        stages["parse"] = (stage_start, time.time() - stage_start)
+
+        # column wise sum of range
+        stage_start = time.time()
+        column_sums = list(df.select(pl.all().sum()).row(0))
+        stages["aggregate"] = (stage_start, time.time() - stage_start)
+
+    return {"column_sums": column_sums, "pid": os.getpid(), "stages": stages}
+
+
+def multiprocess_csv_polar(filename, num_workers=None, range_size_mb=64, trace_path=None):
+    """
+    Processes a large CSV file using multiple processes to compute the sum of all numeric values.
+    The file is split into newline aligned byte ranges and every worker process parses and sums its own ranges,
+    so the parsing is not limited by the GIL or a single reader. Partial sums are merged at the end.
+
+    Args:
+        filename (str) -f : The path to the CSV file to process.
+        num_workers (int, optional) -w : Number of worker processes. Default is the number of physical CPU cores.
+        range_size_mb (int, optional) -r : Maximum size of a byte range in MB, keeps memory per worker bounded. Default is 64.
+        trace_path (str, optional) --trace : Write the timed stages as a Chrome trace to this file. Default is None.
+
+    Raises:
+        FileNotFoundError: If the CSV file is not found.
+        pl.exceptions.PolarsError: If there's an issue with reading the CSV using Polars.
+    Returns:
+        Result : A dictionary containing the total sum of all numeric columns , start time , end time, time spent , file size , memory used , peak memory and time of each stage.
+    """
+    # Track peak memory of this process and its workers, and time of each stage
+    # Worker processes hold most of the memory
+    profiler = Profiler(include_children=True)
+    try:
+        # Track start time and memory
+        start_time = time.time()
+        profiler.start()
+
+        # Workers report wall clock times, the profiler uses perf_counter
+        clock_offset = time.perf_counter() - time.time()
+
+        # Use all physical cores by default
+        if not num_workers:
+            num_workers = psutil.cpu_count(logical=False) or 1
+
+        # At least one range per worker, and no range bigger than range_size_mb
+        file_size_bytes = os.path.getsize(filename)
+        range_size = range_size_mb * 1024 * 1024
+        num_ranges = max(num_workers, -(-file_size_bytes // range_size))
+        ranges = get_byte_ranges(filename, num_ranges)
+
+        column_sums = []
+
+        # Spawn fresh processes, forking a process that already loaded polars is not safe
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=num_workers, mp_context=context) as executor:
+            futures = {executor.submit(process_byte_range, filename, start, end): index
+                       for index, (start, end) in enumerate(ranges)}
+            # Merge partial results as they finish
+            for f in as_completed(futures):
+                partial = f.result()
+                for name, (stage_start, duration) in partial["stages"].items():
+                    profiler.record(name, stage_start + clock_offset, duration, futures[f], partial["pid"])
+                with profiler.stage("reduce", futures[f]):
+                    merge_column_sums(column_sums, partial["column_sums"])
+
+        total_sum = sum(column_sums)
+
+        # Track End time and Memory
+        end_time = time.time()
+        profiler.stop()
+        metrics = profiler.metrics()
+        if trace_path:
+            profiler.write_chrome_trace(trace_path)
+
+        # Time spent by the process
+        time_spent = end_time - start_time
+
+        # file size
+        file_size = file_size_bytes / (1024 * 1024)
+
+        # memory used, peak of this process and its workers over the memory at start
+        mem_used = metrics["mem_used"]
+
+        # Store all the info in result
+        result = {
+            "start_time":time.ctime(start_time) ,
+            "end_time" :time.ctime(end_time) ,
+            "time_spent" : time_spent ,
+            "file_size" : file_size ,
+            "mem_used" :mem_used ,
+            "peak_mem" : metrics["peak_rss"] ,
+            "stages" : metrics["stages"] ,
+            "total_sum" : total_sum
+
+        }
+
+        return result
+
+    except FileNotFoundError:
+        # Handle case when the file is not found
+        print(f"Error: File '{filename}' not found.")
+        raise
+    except pl.exceptions.PolarsError as e:
+        # Handle errors raised by Polars when reading the CSV
+        print(f"Error reading CSV with Polars: {e}")
+        raise
+    except Exception as e:
+        # Catch any unexpected exceptions
+        print(f"An unexpected error occurred: {e}")
+        raise
+    finally:
+        profiler.stop()
+
+
+if __name__ == '__main__':
+    # Set up command line argument parsing
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-f',type=str,help="Give path of the file")
+    parser.add_argument('-w',type=int,default=None,help="Number of worker processes")
+    parser.add_argument('-r',type=int,default=64,help="Maximum size of a byte range in MB")
+    parser.add_argument('--trace',type=str,default=None,help="Write a Chrome trace of the stages to this file")
+
+    # Parse the command-line arguments
+    args:Namespace = parser.parse_args()
+
+    # Call the CSV process function with parsed arguments
+    data = multiprocess_csv_polar(args.f, args.w, args.r, args.trace)
+
+    # Print Result
+    print(f'Start Time        : {data["start_time"]}')
+    print(f'End Time          : {data["end_time"]}')
+    print(f'Time Spent        : {data["time_spent"]:.2f} seconds')
+    print(f'File Size         : {data["file_size"]:.2f} MB')
+    print(f'Memory Used       : {data["mem_used"]:.2f} MB')
+    print(f'Peak Memory       : {data["peak_mem"]:.2f} MB')
+    print(f'Total Sum of CSV  : {data["total_sum"]}')
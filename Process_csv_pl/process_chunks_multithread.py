@@ -1,27 +1,38 @@
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
+import queue
 import polars as pl
 import time
+import io
 import os
 import psutil
+import signal
+import sys
 import  argparse
 from argparse import Namespace
 
-from utils import get_chunk_size
+from utils import get_chunk_size, infer_schema, sum_exprs, iter_batches, get_byte_ranges, estimate_row_size
+from aggregates import frame_states, merge_states
+from profiling import Profiler
+from report import print_result
+from cache import file_fingerprint
+from incremental import default_checkpoint_path, load_checkpoint, save_checkpoint
+from adaptive import AdaptiveChunkSizer, adaptive_batches
 
 
 
-def process_batch(batch_list):
+def process_batch(batch_list, schema=None):
     """
        Processes a batch of data and computes the total sum of all columns.
 
        Args:
            batch_list (pl.DataFrame): A batch of data read from the CSV file.
+           schema (list, optional): dtype of every column, narrow integer sums are widened. Default is None.
 
        Returns:
            int: The total sum of all numeric columns in the batch.
        """
     # sum of all columns in batch
-    batch_col_sum = batch_list.select(pl.all().sum())
+    batch_col_sum = batch_list.select(sum_exprs(schema))
     # Get First row containing individually sum of columns
     sum_col = batch_col_sum.row(0)
     # Total sum
@@ -29,55 +40,249 @@ def process_batch(batch_list):
     return batch_sum
 
 
-def multithreaded_csv_polar(filename):
+def range_batches(filename, ranges, indices, schema=None):
+    """
+    Parse the given byte ranges of the CSV file, used when batches must be identified by their place in the file.
+
+    Args:
+        filename (str): The path to the CSV file.
+        ranges (list): Newline aligned (start, end) byte ranges of the whole file.
+        indices (list): Indices of the ranges to parse, in order.
+        schema (list, optional): dtype of every column. Default is None (Polars defaults).
+
+    Yields:
+        tuple: Index of the range and its parsed batch.
+    """
+    with open(filename, 'rb') as f:
+        for index in indices:
+            start, end = ranges[index]
+            f.seek(start)
+            data = f.read(end - start)
+            if data.strip():
+                yield index, pl.read_csv(io.BytesIO(data), has_header=False, schema_overrides=schema)
+
+
+def read_stage(batches, batch_queue, num_workers, errors, profiler):
+    """
+    Reader stage of the pipeline, reads batches from the CSV and puts them on the bounded batch queue.
+    Blocks when the queue is full, so no more than the queue size of batches are waiting in memory.
+
+    Args:
+        batches (iterator): (batch index, batch) of the CSV file, parsed when asked for.
+        batch_queue (queue.Queue): Bounded queue of batches for the workers.
+        num_workers (int): Number of workers, one stop signal is sent to each of them.
+        errors (list): Exceptions raised in any stage.
+        profiler (Profiler): Records the time spent parsing each batch.
+    """
+    try:
+        position = 0
+        while not errors:
+            with profiler.stage("parse", position):
+                item = next(batches, None)
+            if item is None:
+                break  # Exit if no more batches
+            batch_queue.put(item)
+            position += 1
+    except Exception as e:
+        errors.append(e)
+    finally:
+        # Tell every worker there is nothing more to read
+        for _ in range(num_workers):
+            batch_queue.put(None)
+
+
+def aggregate_stage(batch_queue, result_queue, errors, profiler, stats=False, schema=None):
+    """
+    Worker stage of the pipeline, sums the batches taken from the batch queue and puts the sums on the result queue
+    with the index of their batch.
+
+    Args:
+        batch_queue (queue.Queue): Bounded queue of batches to process.
+        result_queue (queue.Queue): Queue of batch sums for the reducer.
+        errors (list): Exceptions raised in any stage.
+        profiler (Profiler): Records the time spent summing each batch.
+        stats (bool, optional): Put the column states of the batch on the result queue instead of its sum. Default is False.
+        schema (list, optional): dtype of every column the batches were read with. Default is None.
+    """
+    while True:
+        item = batch_queue.get()
+        if item is None:
+            break
+        # After a failure keep draining the queue so the reader is never blocked
+        if errors:
+            continue
+        batch_index, batch = item
+        try:
+            with profiler.stage("aggregate", batch_index):
+                result_queue.put((batch_index, frame_states(batch) if stats else process_batch(batch, schema)))
+        except Exception as e:
+            errors.append(e)
+        # Drop the batch before waiting for the next one
+        del item, batch
+    result_queue.put(None)
+
+
+def multithreaded_csv_polar(filename, max_in_flight=None, trace_path=None, stats=False, compact=False,
+                            checkpoint_path=None, checkpoint_interval=30, adaptive=False, memory_limit_mb=None):
     """
     Processes a large CSV file using multiple threads to compute the sum of all numeric values.
+    Runs as a pipeline: one reader thread, N aggregation workers and the reducer on the main thread,
+    joined by a bounded queue so at most max_in_flight batches are held in memory at any time.
+    With stats, workers compute count, min, max, mean, variance and quantile states of every column and the reducer merges them.
+    In compact mode the file is read with the narrowest safe dtypes, so more rows fit in every batch in flight.
+    With a checkpoint path the file is split into fixed byte ranges and the finished ranges and their running sum
+    are saved every checkpoint_interval seconds and when the run fails. A new run on the same unchanged file
+    only processes the ranges missing from the checkpoint, which is removed once the whole file is done.
+    In adaptive mode the reader sizes every batch from the parse time and memory of the previous ones and from the
+    number of batches waiting in the queue, reading less when the workers fall behind.
     Tracks memory usage, execution time, and handles errors like missing files or reading issues.
 
     Args:
         filename (str) -f : The path to the CSV file to process.
+        max_in_flight (int, optional) -q : Maximum number of batches waiting for a worker. Default is twice the number of threads.
+        trace_path (str, optional) --trace : Write the timed stages as a Chrome trace to this file. Default is None.
+        stats (bool, optional) --stats : Compute the statistics of every column. Default is False.
+        compact (bool, optional) --compact : Read with the narrowest safe dtypes. Default is False.
+        checkpoint_path (str, optional) --checkpoint : Checkpoint file, "" for the default path in the cache directory. Default is None (no checkpoint).
+        checkpoint_interval (float, optional) --checkpoint-every : Seconds between two checkpoint saves. Default is 30.
+        adaptive (bool, optional) --adaptive : Resize batches while reading. Default is False.
+        memory_limit_mb (int, optional) --max-mem : Memory ceiling in MB for adaptive mode. Default is 60% of available memory.
 
     Raises:
         FileNotFoundError: If the CSV file is not found.
         pl.exceptions.PolarsError: If there's an issue with reading the CSV using Polars.
     Returns:
-        Result : A dictionary containing the total sum of all numeric columns , start time , end time, time spent , file size and memory used.
+        Result : A dictionary containing the total sum of all numeric columns , start time , end time, time spent , file size , memory used , peak memory , time of each stage , statistics of each column and number of batches resumed from the checkpoint.
     """
+    # Track peak memory and time of each stage
+    profiler = Profiler()
     try:
         # Track start time and memory
         start_time = time.time()
-        process = psutil.Process(os.getpid())
-        mem_before = process.memory_info().rss
+        profiler.start()
 
         # get threads as per system resources
         total_num_threads =  psutil.cpu_count(logical=False) # logically false = CPU cores
 
-        # Use 60% of total threads available
-        num_threads = int(total_num_threads * 0.6)
+        # Use 60% of total threads available, at least one
+        num_threads = max(1, int(total_num_threads * 0.6))
+
+        # Bound on batches held in memory
+        if not max_in_flight:
+            max_in_flight = 2 * num_threads
+
+        checkpointing = checkpoint_path is not None
+        if checkpointing and stats:
+            raise ValueError("Checkpoints store the running sum only, they cannot be used with stats")
+        if checkpointing and adaptive:
+            raise ValueError("Checkpoints need fixed byte ranges, they cannot be used with adaptive batches")
+        if checkpointing and not checkpoint_path:
+            checkpoint_path = default_checkpoint_path(filename, suffix="-batches")
 
-        # Get batch size based on system memory
-        batch_size = get_chunk_size(filename, num_threads)
-        # read csv file
-        reader = pl.read_csv_batched(filename, batch_size=batch_size,has_header=False)
-        futures = []
         total_sum = 0
+        column_states = []
+        resumed = 0
+
+        # Queues joining the stages, the batch queue is bounded to give backpressure to the reader
+        batch_queue = queue.Queue(maxsize=max_in_flight)
+        result_queue = queue.Queue()
+        errors = []
+
+        with profiler.stage("open"):
+            # Narrowest dtype of every column, sums are widened to Int64
+            schema = infer_schema(filename) if compact else None
+            if checkpointing:
+                fingerprint = file_fingerprint(filename)
+                checkpoint = load_checkpoint(checkpoint_path)
+                if checkpoint and checkpoint.get("fingerprint") == fingerprint:
+                    # Same file, keep its ranges and skip the finished ones
+                    ranges = [tuple(byte_range) for byte_range in checkpoint["ranges"]]
+                    done = set(checkpoint["done"])
+                    total_sum = checkpoint["total_sum"]
+                    resumed = len(done)
+                    print(f"Resuming from checkpoint, {len(done)} of {len(ranges)} batches already done")
+                else:
+                    # Ranges of about one batch, fixed for every run on this file
+                    batch_size = get_chunk_size(filename, max_in_flight, schema=schema)
+                    range_bytes = max(1, int(batch_size * estimate_row_size(filename, schema=schema)))
+                    ranges = get_byte_ranges(filename, -(-os.path.getsize(filename) // range_bytes))
+                    done = set()
+                batches = range_batches(filename, ranges, [i for i in range(len(ranges)) if i not in done], schema)
+            elif adaptive:
+                # Batch size follows measured parse time, memory and the batches waiting for a worker
+                memory_limit = memory_limit_mb * 1024 * 1024 if memory_limit_mb else None
+                sizer = AdaptiveChunkSizer(memory_limit=memory_limit, max_queue_depth=num_threads)
+                batches = enumerate(adaptive_batches(filename, sizer, queue_depth=batch_queue.qsize, schema=schema))
+            else:
+                # Get batch size based on system memory, split between the batches in flight
+                batch_size = get_chunk_size(filename, max_in_flight, schema=schema)
+                # read csv file
+                reader = pl.read_csv_batched(filename, batch_size=batch_size,has_header=False,schema_overrides=schema)
+                batches = enumerate(iter_batches(reader))
+
+        def write_checkpoint():
+            save_checkpoint(checkpoint_path, {
+                "fingerprint": fingerprint,
+                "ranges": ranges,
+                "done": sorted(done),
+                "total_sum": total_sum,
+            })
 
-        # Thread pool executor for parallel processing
-        with ThreadPoolExecutor(max_workers=num_threads) as executor:
-            while True:
-                batch_list = reader.next_batches(num_threads)
-                if not batch_list:
-                    break  # Exit if no more batches
-                # Submit each batch to the thread pool for processing
-                for batch in batch_list:
-                    futures.append(executor.submit(process_batch, batch))
-                # Process completed batches as they finish
-            for f in as_completed(futures):
-                total_sum += f.result()
+        # Start reader and worker threads
+        threads = [threading.Thread(target=read_stage, args=(batches, batch_queue, num_threads, errors, profiler))]
+        threads += [threading.Thread(target=aggregate_stage, args=(batch_queue, result_queue, errors, profiler, stats, schema))
+                    for _ in range(num_threads)]
+        for thread in threads:
+            thread.start()
+
+        # Reducer, runs until every worker has finished
+        finished_workers = 0
+        last_checkpoint = time.time()
+        try:
+            while finished_workers < num_threads:
+                batch_result = result_queue.get()
+                if batch_result is None:
+                    finished_workers += 1
+                    continue
+                batch_index, batch_result = batch_result
+                with profiler.stage("reduce", batch_index):
+                    if stats:
+                        merge_states(column_states, batch_result)
+                    else:
+                        total_sum += batch_result
+                if checkpointing:
+                    done.add(batch_index)
+                    if time.time() - last_checkpoint >= checkpoint_interval:
+                        write_checkpoint()
+                        last_checkpoint = time.time()
+        except BaseException as e:
+            # Stop the reader and let the workers drain, then keep what is done
+            errors.append(e)
+            raise
+        finally:
+            if checkpointing and errors:
+                write_checkpoint()
+
+        if stats:
+            total_sum = sum(state.sum for state in column_states)
+
+        for thread in threads:
+            thread.join()
+
+        # Raise the first error of any stage
+        if errors:
+            raise errors[0]
+
+        # Whole file done, the checkpoint is not needed any more
+        if checkpointing and os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
 
         # Track End time and Memory
         end_time = time.time()
-        mem_after = process.memory_info().rss
+        profiler.stop()
+        metrics = profiler.metrics()
+        if trace_path:
+            profiler.write_chrome_trace(trace_path)
 
         # Time spent by the process
         time_spent = end_time - start_time
@@ -85,8 +290,8 @@ def multithreaded_csv_polar(filename):
         # file size
         file_size = os.path.getsize(filename) / (1024 * 1024)
 
-        # memory used
-        mem_used=(mem_after - mem_before) / (1024 * 1024)
+        # memory used, peak during the run over the memory at start
+        mem_used = metrics["mem_used"]
 
         # Store all the info in result
         result = {
@@ -95,7 +300,11 @@ def multithreaded_csv_polar(filename):
             "time_spent" : time_spent ,
             "file_size" : file_size ,
             "mem_used" :mem_used ,
-            "total_sum" : total_sum
+            "peak_mem" : metrics["peak_rss"] ,
+            "stages" : metrics["stages"] ,
+            "total_sum" : total_sum ,
+            "column_stats" : [state.result() for state in column_states] if stats else None ,
+            "resumed_batches" : resumed
 
         }
 
@@ -105,6 +314,15 @@ def multithreaded_csv_polar(filename):
         # Handle case when the file is not found
         print(f"Error: File '{filename}' not found.")
         raise
+    except pl.exceptions.ComputeError as e:
+        if compact:
+            # A value did not fit the inferred dtype
+            print(f"Compact dtypes too narrow ({e}), reading again with default dtypes")
+            return multithreaded_csv_polar(filename, max_in_flight, trace_path, stats, compact=False,
+                                           checkpoint_path=checkpoint_path, checkpoint_interval=checkpoint_interval,
+                                           adaptive=adaptive, memory_limit_mb=memory_limit_mb)
+        print(f"Error reading CSV with Polars: {e}")
+        raise
     except pl.exceptions.PolarsError as e:
         # Handle errors raised by Polars when reading the CSV
         print(f"Error reading CSV with Polars: {e}")
@@ -113,26 +331,35 @@ def multithreaded_csv_polar(filename):
         # Catch any unexpected exceptions
         print(f"An unexpected error occurred: {e}")
         raise
+    finally:
+        profiler.stop()
 
 
 if __name__ == '__main__':
     # Set up command line argument parsing
     parser = argparse.ArgumentParser()
     parser.add_argument('-f',type=str,help="Give path of the file")
+    parser.add_argument('-q',type=int,default=None,help="Maximum number of batches in flight")
+    parser.add_argument('--trace',type=str,default=None,help="Write a Chrome trace of the stages to this file")
+    parser.add_argument('--stats',action='store_true',help="Compute count, min, max, mean, variance and quantiles of every column")
+    parser.add_argument('--compact',action='store_true',help="Read with the narrowest safe dtypes")
+    parser.add_argument('--checkpoint',type=str,nargs='?',const='',default=None,help="Save progress to this checkpoint file (default path if empty) and resume from it")
+    parser.add_argument('--checkpoint-every',type=float,default=30,help="Seconds between two checkpoint saves")
+    parser.add_argument('--adaptive',action='store_true',help="Resize batches from measured parse time, memory and queue depth")
+    parser.add_argument('--max-mem',type=int,default=None,help="Memory ceiling in MB for adaptive mode")
 
     # Parse the command-line arguments
     args:Namespace = parser.parse_args()
 
+    # A termination signal (spot preemption) unwinds normally so the checkpoint is saved
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
+
     # Call the CSV process function with parsed arguments
-    data = multithreaded_csv_polar(args.f)
+    data = multithreaded_csv_polar(args.f, args.q, args.trace, args.stats, args.compact,
+                                   args.checkpoint, args.checkpoint_every, args.adaptive, args.max_mem)
 
     # Print Result
-    print(f'Start Time        : {data["start_time"]}')
-    print(f'End Time          : {data["end_time"]}')
-    print(f'Time Spent        : {data["time_spent"]:.2f} seconds')
-    print(f'File Size         : {data["file_size"]:.2f} MB')
-    print(f'Memory Used       : {data["mem_used"]:.2f} MB')
-    print(f'Total Sum of CSV  : {data["total_sum"]}')
+    print_result(data)
 
 # OUTPUT
 # Start Time        : Mon Apr 28 21:25:40 2025
@@ -1,48 +1,109 @@
 import os
 import argparse
-import psutil
 import time
 import polars as pl
 from argparse import Namespace
 
+from mmap_reader import mmap_column_sums
+from cache import ResultCache
+from profiling import Profiler
+from report import print_result
+from utils import infer_schema, sum_exprs, merge_column_sums
+from compressed import compression_of, compressed_batches
 
-def process_csv(filename):
+
+def process_csv(filename, use_mmap=False, use_cache=False, trace_path=None, compact=False):
     """
     Processes a CSV file by reading it using Polars, calculating the sum of all columns,
        and printing relevant information about time spent, memory usage, and the total sum.
+       In mmap mode the Polars streaming engine memory maps the file and sums it morsel by morsel,
+       so memory use does not grow with the file size.
+       In compact mode the narrowest safe dtype of every column is inferred from samples of the file and the file
+       is read with it. If a value does not fit, the file is read again with the default dtypes.
+       .gz, .bz2 and .zst files are decompressed into batches parsed as they come, and never written to disk.
 
     Args:
         filename (str) -f : The path to the CSV file to process.
+        use_mmap (bool, optional) --mmap : Stream the memory mapped file instead of reading it at once. Default is False.
+        use_cache (bool, optional) --cache : Return the stored result if the file was processed before. Default is False.
+        trace_path (str, optional) --trace : Write the timed stages as a Chrome trace to this file. Default is None.
+        compact (bool, optional) --compact : Read with the narrowest safe dtypes. Default is False.
 
     Raises:
         FileNotFoundError: If the CSV file cannot be found.
         pl.exceptions.PolarsError: If there's an error reading the CSV with Polars.
     Returns:
-        Result : A dictionary containing the total sum of all numeric columns , start time , end time, time spent , file size and memory used.
+        Result : A dictionary containing the total sum of all numeric columns , sum of each column , start time , end time, time spent , file size , memory used , peak memory , time of each stage and cache status.
        """
+    # track peak memory and time of each stage
+    profiler = Profiler()
     try:
         start_time = time.time()
-
-        # track memory
-        process = psutil.Process(os.getpid())
-        mem_before = process.memory_info().rss
-
-        # Read CSV file using polars
-        df = pl.read_csv(filename,has_header=False)
-
-        # Select all columns and compute their sum individually
-        sum_df = df.select(
-            pl.all().sum()
-        )
-
-        # Get the first row
-        sum_row = sum_df.row(0)
+        profiler.start()
+
+        # Look for a stored result of the same file content
+        cache = ResultCache() if use_cache else None
+        cached = cache.get(filename) if cache else None
+        cache_status = None
+
+        # Compressed files are decompressed while reading, mmap and sampling need the raw CSV
+        compressed = compression_of(filename)
+
+        if cached:
+            sum_row = cached["column_sums"]
+            cache_status = "hit"
+        elif use_mmap and not compressed:
+            # Sum of each column, streamed from the memory mapped file
+            with profiler.stage("parse"):
+                sum_row = mmap_column_sums(filename)
+        else:
+            # Narrowest dtype of every column, sums are widened to Int64
+            schema = None
+            if compact and not compressed:
+                with profiler.stage("open"):
+                    schema = infer_schema(filename)
+
+            if compressed:
+                # Decompressed blocks parsed and summed as they come, the content is never held whole in memory
+                sum_row = []
+                batches = compressed_batches(filename)
+                batch_index = 0
+                while True:
+                    with profiler.stage("parse", batch_index):
+                        batch = next(batches, None)
+                    if batch is None:
+                        break
+                    with profiler.stage("aggregate", batch_index):
+                        merge_column_sums(sum_row, batch.select(pl.all().sum()).row(0))
+                    batch_index += 1
+            else:
+                # Read CSV file using polars
+                with profiler.stage("parse"):
+                    df = pl.read_csv(filename,has_header=False,schema_overrides=schema)
+
+                # Select all columns and compute their sum individually
+                with profiler.stage("aggregate"):
+                    sum_df = df.select(
+                        sum_exprs(schema)
+                    )
+
+                # Get the first row
+                sum_row = list(sum_df.row(0))
 
         # Sum all the rows
-        total_sum = sum(sum_row)
+        with profiler.stage("reduce"):
+            total_sum = sum(sum_row)
+
+        # Store the result for the next run
+        if cache and not cached:
+            cache.put(filename, {"column_sums": sum_row, "total_sum": total_sum})
+            cache_status = "miss"
 
         end_time = time.time()
-        mem_after = process.memory_info().rss
+        profiler.stop()
+        metrics = profiler.metrics()
+        if trace_path:
+            profiler.write_chrome_trace(trace_path)
 
         # Time spent by the process
         time_spent = end_time - start_time
@@ -50,8 +111,8 @@ def process_csv(filename):
         # file size
         file_size = os.path.getsize(filename) / (1024 * 1024)
 
-        # memory used
-        mem_used=(mem_after - mem_before) / (1024 * 1024)
+        # memory used, peak during the run over the memory at start
+        mem_used = metrics["mem_used"]
 
         # Store all the info in result
         result = {
@@ -60,7 +121,11 @@ def process_csv(filename):
             "time_spent" : time_spent ,
             "file_size" : file_size ,
             "mem_used" :mem_used ,
-            "total_sum" : total_sum
+            "peak_mem" : metrics["peak_rss"] ,
+            "stages" : metrics["stages"] ,
+            "total_sum" : total_sum ,
+            "column_sums" : sum_row ,
+            "cache" : cache_status
 
         }
 
@@ -71,6 +136,13 @@ def process_csv(filename):
         # Handle case when the file is not found
         print(f"Error: File '{filename}' not found.")
         raise
+    except pl.exceptions.ComputeError as e:
+        if compact:
+            # A value did not fit the inferred dtype
+            print(f"Compact dtypes too narrow ({e}), reading again with default dtypes")
+            return process_csv(filename, use_mmap, use_cache, trace_path, compact=False)
+        print(f"Error reading CSV with Polars: {e}")
+        raise
     except pl.exceptions.PolarsError as e:
         # Handle errors raised by Polars when reading the CSV
         print(f"Error reading CSV with Polars: {e}")
@@ -83,26 +155,27 @@ def process_csv(filename):
         # Catch any unexpected exceptions
         print(f"An unexpected error occurred: {e}")
         raise
+    finally:
+        profiler.stop()
 
 
 if __name__ == '__main__':
     # Set up command line argument parsing
     parser = argparse.ArgumentParser()
     parser.add_argument('-f',type=str,help="Give path of the file")
+    parser.add_argument('--mmap',action='store_true',help="Stream the memory mapped file instead of reading it at once")
+    parser.add_argument('--cache',action='store_true',help="Reuse the stored result if the file did not change")
+    parser.add_argument('--trace',type=str,default=None,help="Write a Chrome trace of the stages to this file")
+    parser.add_argument('--compact',action='store_true',help="Read with the narrowest safe dtypes")
 
     # Parse the command-line arguments
     args:Namespace = parser.parse_args()
 
     # Call the CSV process function with parsed arguments
-    data = process_csv(args.f)
+    data = process_csv(args.f, args.mmap, args.cache, args.trace, args.compact)
 
     # Print Data
-    print(f'Start Time        : {data["start_time"]}')
-    print(f'End Time          : {data["end_time"]}')
-    print(f'Time Spent        : {data["time_spent"]:.2f} seconds')
-    print(f'File Size         : {data["file_size"]:.2f} MB')
-    print(f'Memory Used       : {data["mem_used"]:.2f} MB')
-    print(f'Total Sum of CSV  : {data["total_sum"]}')
+    print_result(data)
 
 # OUTPUT
 # Start Time        : Mon Apr 28 21:25:48 2025
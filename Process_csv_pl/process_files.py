@@ -0,0 +1,173 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
+import polars as pl
+import time
+import os
+import psutil
+import argparse
+from argparse import Namespace
+
+from utils import get_byte_ranges, merge_column_sums, expand_paths
+from process_chunks_multiprocess import process_byte_range
+from compressed import compression_of, compressed_column_sums
+from profiling import Profiler
+from report import print_result
+
+
+def plan_tasks(files, range_size):
+    """
+    Split every file into tasks of at most range_size bytes and order them largest first.
+    Small files are one task, big files are cut into newline aligned byte ranges so they spread over the workers.
+    A compressed file is always one task, it cannot be cut without decompressing it.
+    Scheduling the largest tasks first (longest processing time first) keeps the workers busy until the end
+    instead of leaving one big file running alone after all the small ones are done.
+
+    Args:
+        files (list): Paths of the CSV files.
+        range_size (int): Maximum size of a task in bytes.
+
+    Returns:
+        list: (file index, start, end) of every task, largest first.
+    """
+    tasks = []
+    for file_index, filename in enumerate(files):
+        file_size = os.path.getsize(filename)
+        if file_size == 0:
+            continue
+        num_ranges = 1 if compression_of(filename) else max(1, -(-file_size // range_size))
+        ranges = get_byte_ranges(filename, num_ranges) if num_ranges > 1 else [(0, file_size)]
+        tasks += [(file_index, start, end) for start, end in ranges]
+    tasks.sort(key=lambda task: task[2] - task[1], reverse=True)
+    return tasks
+
+
+def multi_file_csv_polar(patterns, num_workers=None, range_size_mb=64, trace_path=None):
+    """
+    Computes the sum of all numeric values of many CSV files with one shared pool of worker processes.
+    Files are given as paths, directories or glob patterns. Polars is imported once per worker and not once per file,
+    and the byte ranges of all files are scheduled largest first on the same pool so big and small files are balanced.
+
+    Args:
+        patterns (list) -f : Paths, directories or glob patterns of the CSV files.
+        num_workers (int, optional) -w : Number of worker processes. Default is the number of physical CPU cores.
+        range_size_mb (int, optional) -r : Maximum size of a byte range in MB, keeps memory per worker bounded. Default is 64.
+        trace_path (str, optional) --trace : Write the timed stages as a Chrome trace to this file. Default is None.
+
+    Raises:
+        FileNotFoundError: If a pattern matches no file.
+        pl.exceptions.PolarsError: If there's an issue with reading the CSV using Polars.
+    Returns:
+        Result : A dictionary containing the grand total sum , result of each file (total sum , sum of each column , file size) , number of files , start time , end time, time spent , total file size , memory used , peak memory and time of each stage.
+    """
+    # Track peak memory of this process and its workers, and time of each stage
+    # Worker processes hold most of the memory
+    profiler = Profiler(include_children=True)
+    try:
+        # Track start time and memory
+        start_time = time.time()
+        profiler.start()
+
+        # Workers report wall clock times, the profiler uses perf_counter
+        clock_offset = time.perf_counter() - time.time()
+
+        # Use all physical cores by default
+        if not num_workers:
+            num_workers = psutil.cpu_count(logical=False) or 1
+
+        with profiler.stage("open"):
+            files = expand_paths(patterns)
+            tasks = plan_tasks(files, range_size_mb * 1024 * 1024)
+
+        # Partial column sums of every file
+        file_sums = [[] for _ in files]
+
+        # Spawn fresh processes, forking a process that already loaded polars is not safe
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=num_workers, mp_context=context) as executor:
+            # Submitted in order, the pool hands the largest tasks out first
+            futures = {}
+            for task_index, (file_index, start, end) in enumerate(tasks):
+                if compression_of(files[file_index]):
+                    future = executor.submit(compressed_column_sums, files[file_index])
+                else:
+                    future = executor.submit(process_byte_range, files[file_index], start, end)
+                futures[future] = (task_index, file_index)
+            # Merge partial results as they finish
+            for f in as_completed(futures):
+                task_index, file_index = futures[f]
+                partial = f.result()
+                for name, (stage_start, duration) in partial["stages"].items():
+                    profiler.record(name, stage_start + clock_offset, duration, task_index, partial["pid"])
+                with profiler.stage("reduce", task_index):
+                    merge_column_sums(file_sums[file_index], partial["column_sums"])
+
+        files_result = [
+            {
+                "filename" : filename ,
+                "total_sum" : sum(column_sums) ,
+                "column_sums" : column_sums ,
+                "file_size" : os.path.getsize(filename) / (1024 * 1024)
+            }
+            for filename, column_sums in zip(files, file_sums)
+        ]
+        total_sum = sum(file_result["total_sum"] for file_result in files_result)
+
+        # Track End time and Memory
+        end_time = time.time()
+        profiler.stop()
+        metrics = profiler.metrics()
+        if trace_path:
+            profiler.write_chrome_trace(trace_path)
+
+        # Time spent by the process
+        time_spent = end_time - start_time
+
+        # Store all the info in result
+        result = {
+            "start_time":time.ctime(start_time) ,
+            "end_time" :time.ctime(end_time) ,
+            "time_spent" : time_spent ,
+            "file_size" : sum(file_result["file_size"] for file_result in files_result) ,
+            "num_files" : len(files) ,
+            "mem_used" : metrics["mem_used"] ,
+            "peak_mem" : metrics["peak_rss"] ,
+            "stages" : metrics["stages"] ,
+            "total_sum" : total_sum ,
+            "files" : files_result
+
+        }
+
+        return result
+
+    except FileNotFoundError as e:
+        # Handle case when a pattern matches no file
+        print(f"Error: No file found for '{e}'.")
+        raise
+    except pl.exceptions.PolarsError as e:
+        # Handle errors raised by Polars when reading the CSV
+        print(f"Error reading CSV with Polars: {e}")
+        raise
+    except Exception as e:
+        # Catch any unexpected exceptions
+        print(f"An unexpected error occurred: {e}")
+        raise
+    finally:
+        profiler.stop()
+
+
+if __name__ == '__main__':
+    # Set up command line argument parsing
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-f',type=str,nargs='+',help="Give paths, directories or glob patterns of the files")
+    parser.add_argument('-w',type=int,default=None,help="Number of worker processes")
+    parser.add_argument('-r',type=int,default=64,help="Maximum size of a byte range in MB")
+    parser.add_argument('--trace',type=str,default=None,help="Write a Chrome trace of the stages to this file")
+
+    # Parse the command-line arguments
+    args:Namespace = parser.parse_args()
+
+    # Call the CSV process function with parsed arguments
+    data = multi_file_csv_polar(args.f, args.w, args.r, args.trace)
+
+    # Print Result
+    print_result(data)
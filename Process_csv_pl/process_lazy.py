@@ -0,0 +1,210 @@
+import polars as pl
+import time
+import os
+import re
+import argparse
+from argparse import Namespace
+
+from profiling import Profiler
+from report import print_result
+
+
+# Aggregations that can be asked for from the command line
+AGGREGATIONS = {
+    "sum": lambda col: col.sum(),
+    "min": lambda col: col.min(),
+    "max": lambda col: col.max(),
+    "mean": lambda col: col.mean(),
+    "count": lambda col: col.count(),
+}
+
+# Comparison operators allowed in a filter
+OPERATORS = {
+    ">=": lambda col, value: col >= value,
+    "<=": lambda col, value: col <= value,
+    "!=": lambda col, value: col != value,
+    "==": lambda col, value: col == value,
+    ">": lambda col, value: col > value,
+    "<": lambda col, value: col < value,
+}
+
+# Two character operators come first so '>=' is not read as '>'
+FILTER_PATTERN = re.compile(r"^\s*(\w+)\s*(>=|<=|!=|==|>|<)\s*(-?\d+(?:\.\d+)?)\s*$")
+
+
+def parse_filter(filter_text):
+    """
+    Convert a filter like 'column_1>=500' into a Polars expression.
+
+    Args:
+        filter_text (str): Filter in the form <column><operator><number>.
+
+    Returns:
+        pl.Expr: The filter expression.
+
+    Raises:
+        ValueError: If the filter is not in the expected form.
+    """
+    match = FILTER_PATTERN.match(filter_text)
+    if not match:
+        raise ValueError(f"Invalid filter '{filter_text}', expected e.g. column_1>=500")
+
+    column, operator, value = match.groups()
+    value = float(value) if "." in value else int(value)
+    return OPERATORS[operator](pl.col(column), value)
+
+
+def build_query(filename, columns=None, filters=None, group_by=None, aggregation="sum"):
+    """
+    Build the lazy query plan over the CSV file. Nothing is read here, Polars pushes the
+    column selection and the filters down into the scan so only the needed data is parsed.
+
+    Args:
+        filename (str): The path to the CSV file.
+        columns (list, optional): Columns to aggregate, e.g. ['column_1', 'column_5']. Default is all columns.
+        filters (list, optional): Filters like 'column_1>=500', all of them must match. Default is None.
+        group_by (list, optional): Columns to group by. Default is None.
+        aggregation (str, optional): One of sum, min, max, mean, count. Default is sum.
+
+    Returns:
+        pl.LazyFrame: The lazy query.
+
+    Raises:
+        ValueError: If the aggregation is unknown, a filter is invalid or the group by leaves no column to aggregate.
+    """
+    if aggregation not in AGGREGATIONS:
+        raise ValueError(f"Invalid aggregation '{aggregation}', choose from {', '.join(AGGREGATIONS)}")
+
+    query = pl.scan_csv(filename, has_header=False)
+
+    # Predicate pushdown
+    for filter_text in filters or []:
+        query = query.filter(parse_filter(filter_text))
+
+    group_by = group_by or []
+
+    # Group keys are not aggregated, at least one other column must be left
+    if group_by:
+        value_columns = columns or query.collect_schema().names()
+        if not [col for col in value_columns if col not in group_by]:
+            raise ValueError(f"Group by {', '.join(group_by)} covers every selected column, nothing left to aggregate")
+
+    if columns:
+        # Projection pushdown, group keys are not aggregated
+        agg_exprs = [AGGREGATIONS[aggregation](pl.col(col)) for col in columns if col not in group_by]
+    else:
+        agg_exprs = [AGGREGATIONS[aggregation](pl.all().exclude(group_by) if group_by else pl.all())]
+
+    if group_by:
+        return query.group_by(group_by).agg(agg_exprs).sort(group_by)
+    return query.select(agg_exprs)
+
+
+def lazy_csv_polar(filename, columns=None, filters=None, group_by=None, aggregation="sum"):
+    """
+    Processes a CSV file with a lazy Polars query, only the selected columns and matching rows are read.
+    The query runs on the Polars streaming engine so the file is never fully loaded in memory.
+
+    Args:
+        filename (str) -f : The path to the CSV file to process.
+        columns (list, optional) -c : Columns to aggregate. Default is all columns.
+        filters (list, optional) --filter : Filters like 'column_1>=500'. Default is None.
+        group_by (list, optional) -g : Columns to group by. Default is None.
+        aggregation (str, optional) -a : One of sum, min, max, mean, count. Default is sum.
+
+    Raises:
+        FileNotFoundError: If the CSV file is not found.
+        ValueError: If a filter or the aggregation is invalid.
+        pl.exceptions.PolarsError: If there's an issue with reading the CSV using Polars.
+    Returns:
+        Result : A dictionary containing the total of the aggregated columns , the aggregated DataFrame , start time , end time, time spent , file size and memory used.
+    """
+    # track peak memory and time of each stage
+    profiler = Profiler()
+    try:
+        # Track start time and memory
+        start_time = time.time()
+        profiler.start()
+
+        if not os.path.exists(filename):
+            raise FileNotFoundError(filename)
+
+        query = build_query(filename, columns, filters, group_by, aggregation)
+
+        # Run the optimized plan on the streaming engine
+        with profiler.stage("parse"):
+            df = query.collect(engine="streaming")
+
+        # Total of all aggregated values
+        value_columns = [col for col in df.columns if col not in (group_by or [])]
+        total_sum = df.select(pl.sum_horizontal(value_columns).sum()).item()
+
+        # Track End time and Memory
+        end_time = time.time()
+        profiler.stop()
+        metrics = profiler.metrics()
+
+        # Time spent by the process
+        time_spent = end_time - start_time
+
+        # file size
+        file_size = os.path.getsize(filename) / (1024 * 1024)
+
+        # memory used, peak during the run over the memory at start
+        mem_used = metrics["mem_used"]
+
+        # Store all the info in result
+        result = {
+            "start_time":time.ctime(start_time) ,
+            "end_time" :time.ctime(end_time) ,
+            "time_spent" : time_spent ,
+            "file_size" : file_size ,
+            "mem_used" :mem_used ,
+            "peak_mem" : metrics["peak_rss"] ,
+            "stages" : metrics["stages"] ,
+            "total_sum" : total_sum ,
+            "aggregates" : df
+
+        }
+
+        return result
+
+    except FileNotFoundError:
+        # Handle case when the file is not found
+        print(f"Error: File '{filename}' not found.")
+        raise
+    except ValueError as e:
+        # Handle invalid filters or aggregation
+        print(f"Error: {e}")
+        raise
+    except pl.exceptions.PolarsError as e:
+        # Handle errors raised by Polars when reading the CSV
+        print(f"Error reading CSV with Polars: {e}")
+        raise
+    except Exception as e:
+        # Catch any unexpected exceptions
+        print(f"An unexpected error occurred: {e}")
+        raise
+    finally:
+        profiler.stop()
+
+
+if __name__ == '__main__':
+    # Set up command line argument parsing
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-f',type=str,help="Give path of the file")
+    parser.add_argument('-c',type=str,default=None,help="Comma separated columns to aggregate e.g. column_1,column_5")
+    parser.add_argument('--filter',action='append',default=None,help="Filter like column_1>=500, can be repeated")
+    parser.add_argument('-g',type=str,default=None,help="Comma separated columns to group by")
+    parser.add_argument('-a',type=str,default="sum",choices=list(AGGREGATIONS),help="Aggregation to run")
+
+    # Parse the command-line arguments
+    args:Namespace = parser.parse_args()
+    columns = args.c.split(',') if args.c else None
+    group_by = args.g.split(',') if args.g else None
+
+    # Call the CSV process function with parsed arguments
+    data = lazy_csv_polar(args.f, columns, args.filter, group_by, args.a)
+
+    # Print Result
+    print_result(data)
@@ -0,0 +1,191 @@
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+import psutil
+
+
+class PeakMemorySampler:
+    """
+    Samples the RSS of the process on a background thread and keeps the highest value.
+    Catches the transient peak that a before/after measurement misses.
+
+    Args:
+        interval (float, optional): Seconds between two samples. Default is 0.01.
+        include_children (bool, optional): Add the RSS of child processes, for process pools. Default is False.
+        children_interval (float, optional): Seconds between two listings of the child processes,
+            listing them scans /proc. Default is 0.1.
+    """
+
+    def __init__(self, interval=0.01, include_children=False, children_interval=0.1):
+        self.interval = interval
+        self.include_children = include_children
+        self.children_interval = children_interval
+        self.process = psutil.Process(os.getpid())
+        self._children = []
+        self._children_time = 0.0
+        self.start_rss = 0
+        self.peak_rss = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def sample(self):
+        """
+        Returns:
+            int: Current RSS in bytes, with the child processes if enabled.
+        """
+        rss = self.process.memory_info().rss
+        if self.include_children:
+            now = time.monotonic()
+            if now - self._children_time >= self.children_interval:
+                self._children = self.process.children(recursive=True)
+                self._children_time = now
+            for child in self._children:
+                try:
+                    rss += child.memory_info().rss
+                except psutil.Error:
+                    # Child exited since the listing, list again at the next sample
+                    self._children_time = 0.0
+        self.peak_rss = max(self.peak_rss, rss)
+        return rss
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def start(self):
+        self._children_time = 0.0
+        self.start_rss = self.peak_rss = self.sample()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        # Last sample so a peak at the very end is not missed
+        self.sample()
+
+
+class Profiler:
+    """
+    Times the stages of a run (open, parse, aggregate, reduce) per batch and tracks the peak memory.
+    Thread safe, so workers of a pool can record their own stages.
+    The data is available as metrics and can be written as a Chrome trace (chrome://tracing or Perfetto).
+
+    Args:
+        interval (float, optional): Seconds between two memory samples. Default is 0.01.
+        include_children (bool, optional): Count the memory of child processes, for process pools. Default is False.
+    """
+
+    def __init__(self, interval=0.01, include_children=False):
+        self.sampler = PeakMemorySampler(interval, include_children)
+        self.events = []
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+
+    def start(self):
+        """
+        Start the clock of the trace and the memory sampler.
+        """
+        self._origin = time.perf_counter()
+        self.sampler.start()
+        return self
+
+    def stop(self):
+        """
+        Stop the memory sampler, safe to call more than once.
+        """
+        self.sampler.stop()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+        return False
+
+    @contextmanager
+    def stage(self, name, batch=None):
+        """
+        Time the code inside the with block as one stage.
+
+        Args:
+            name (str): Name of the stage, e.g. parse.
+            batch (int, optional): Index of the batch the stage works on. Default is None.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter() - start, batch)
+
+    def record(self, name, start, duration, batch=None, thread=None):
+        """
+        Add a stage measured elsewhere, e.g. returned by a worker process.
+
+        Args:
+            name (str): Name of the stage.
+            start (float): perf_counter value when the stage started.
+            duration (float): Seconds spent in the stage.
+            batch (int, optional): Index of the batch. Default is None.
+            thread (int, optional): Lane of the stage in the trace, e.g. a worker pid. Default is the current thread.
+        """
+        event = {
+            "name": name,
+            "start": start - self._origin,
+            "duration": duration,
+            "batch": batch,
+            "thread": thread if thread is not None else threading.get_ident(),
+        }
+        with self._lock:
+            self.events.append(event)
+
+    def metrics(self):
+        """
+        Returns:
+            dict: Peak RSS and memory used in MB, and count, total and max seconds of every stage.
+        """
+        stages = {}
+        with self._lock:
+            events = list(self.events)
+        for event in events:
+            stage = stages.setdefault(event["name"], {"count": 0, "total": 0.0, "max": 0.0})
+            stage["count"] += 1
+            stage["total"] += event["duration"]
+            stage["max"] = max(stage["max"], event["duration"])
+
+        return {
+            "peak_rss": self.sampler.peak_rss / (1024 * 1024),
+            "mem_used": (self.sampler.peak_rss - self.sampler.start_rss) / (1024 * 1024),
+            "stages": stages,
+        }
+
+    def write_chrome_trace(self, path):
+        """
+        Write the stages as complete events of the Chrome trace format.
+
+        Args:
+            path (str): Path of the trace file.
+        """
+        with self._lock:
+            events = list(self.events)
+        trace = [
+            {
+                "name": event["name"],
+                "ph": "X",
+                "ts": event["start"] * 1e6,
+                "dur": event["duration"] * 1e6,
+                "pid": os.getpid(),
+                "tid": event["thread"],
+                "args": {"batch": event["batch"]},
+            }
+            for event in events
+        ]
+        with open(path, 'w') as f:
+            json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f)
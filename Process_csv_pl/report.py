@@ -0,0 +1,95 @@
+import json
+
+
+# Lines of the report, printed when the result has the key: (key, label, format)
+REPORT_LINES = [
+    ("start_time", "Start Time", "{}"),
+    ("end_time", "End Time", "{}"),
+    ("time_spent", "Time Spent", "{:.2f} seconds"),
+    ("num_files", "Files", "{}"),
+    ("file_size", "File Size", "{:.2f} MB"),
+    ("mem_used", "Memory Used", "{:.2f} MB"),
+    ("peak_mem", "Peak Memory", "{:.2f} MB"),
+    ("total_sum", "Total Sum of CSV", "{}"),
+]
+
+# Printed only when set
+OPTIONAL_LINES = [
+    ("latency", "Latency", "{:.1f} ms"),
+    ("memory_budget", "Memory Budget", "{:.0f} MB"),
+    ("mean", "Mean of CSV", "{:.2f}"),
+    ("cache", "Cache", "{}"),
+    ("resumed_batches", "Resumed Batches", "{}"),
+    ("mode", "Scan Mode", "{}"),
+    ("bytes_parsed", "Bytes Parsed", "{}"),
+    ("fraction_read", "File Read", "{:.1%}"),
+]
+
+# Confidence intervals of an estimate, printed when the result has a confidence: (key, label)
+INTERVAL_LINES = [
+    ("total_sum_ci", "Total Sum CI"),
+    ("mean_ci", "Mean CI"),
+]
+
+
+def print_column_stats(column_stats):
+    """
+    Print the statistics of every column as a table, followed by the histogram of every column.
+
+    Args:
+        column_stats (list): Statistics of every column, as returned by ColumnState.result.
+    """
+    print("Column | Count | Min | Max | Mean | Variance | Quantiles")
+    print("-" * 80)
+    for i, stats in enumerate(column_stats, start=1):
+        # An empty digest (all null column) has no quantiles, keys are text once the result went through JSON
+        quantiles = ", ".join(f"p{float(q) * 100:g}={value:.2f}" if value is not None else f"p{float(q) * 100:g}=-"
+                              for q, value in (stats.get("quantiles") or {}).items())
+        print(f'{i} | {stats["count"]} | {stats["min"]} | {stats["max"]} | '
+              f'{stats["mean"] or 0:.2f} | {stats["variance"] or 0:.2f} | {quantiles}')
+
+    # Approximate histogram of every column, bins between min and max
+    histograms = [(i, stats["histogram"]) for i, stats in enumerate(column_stats, start=1) if stats.get("histogram")]
+    if histograms:
+        print("Column | Histogram (bin start: count)")
+        print("-" * 80)
+        for i, histogram in histograms:
+            bins = ", ".join(f"{start:g}: {count:.0f}" for start, count in zip(histogram["edges"], histogram["counts"]))
+            print(f'{i} | {bins}')
+
+
+def print_result(data):
+    """
+    Print the result of a CSV process function in the common text layout, one line per known key.
+
+    Args:
+        data (dict): Result returned by one of the process functions.
+    """
+    # One line per file of a multi file run
+    for file_result in data.get("files") or []:
+        print(f'{file_result["filename"]} : {file_result["total_sum"]} ({file_result["file_size"]:.2f} MB)')
+    for key, label, fmt in REPORT_LINES:
+        if key in data:
+            print(f'{label:<18}: {fmt.format(data[key])}')
+    for key, label, fmt in OPTIONAL_LINES:
+        if data.get(key):
+            print(f'{label:<18}: {fmt.format(data[key])}')
+    for key, label in INTERVAL_LINES:
+        if key in data and "confidence" in data:
+            low, high = data[key]
+            print(f'{label:<18}: {data["confidence"]:.0%} {low:.2f} - {high:.2f}')
+    if data.get("column_stats"):
+        print_column_stats(data["column_stats"])
+    if data.get("aggregates") is not None:
+        print(data["aggregates"])
+
+
+def print_json(data):
+    """
+    Print the result as one JSON document, for other programs to read.
+
+    Args:
+        data (dict): Result returned by one of the process functions.
+    """
+    # DataFrames become a list of rows, anything else unknown its text
+    print(json.dumps(data, default=lambda value: value.to_dicts() if hasattr(value, "to_dicts") else str(value)))
@@ -0,0 +1,303 @@
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import http.client
+import socketserver
+import threading
+import socket
+import json
+import time
+import os
+import argparse
+from argparse import Namespace
+
+import polars as pl
+import psutil
+
+from process_csv import process_csv
+from process_chunks import chunk_csv_polar
+from report import print_result
+
+
+# Memory of an eager read compared to the size of the CSV file
+EAGER_EXPANSION = 2.0
+
+
+class MemoryBudget:
+    """
+    Memory shared by the requests running at the same time. A request waits until its budget is free,
+    so concurrent requests never plan to use more than the total together.
+
+    Args:
+        total_mb (float): Memory available to all requests in MB.
+    """
+
+    def __init__(self, total_mb):
+        self.total_mb = total_mb
+        self.used_mb = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self, mb):
+        """
+        Wait until the memory is free and reserve it.
+
+        Args:
+            mb (float): Memory of the request in MB, capped to the total.
+
+        Returns:
+            float: Memory reserved in MB.
+        """
+        mb = min(mb, self.total_mb)
+        with self._condition:
+            self._condition.wait_for(lambda: self.used_mb + mb <= self.total_mb)
+            self.used_mb += mb
+        return mb
+
+    def release(self, mb):
+        with self._condition:
+            self.used_mb -= mb
+            self._condition.notify_all()
+
+
+def run_sum(filename, memory_mb, use_cache):
+    # Eager read when the file fits in the budget, adaptive batches otherwise
+    if os.path.getsize(filename) / (1024 * 1024) * EAGER_EXPANSION <= memory_mb:
+        return process_csv(filename, use_cache=use_cache)
+    return chunk_csv_polar(filename, adaptive=True, memory_budget_mb=memory_mb, use_cache=use_cache)
+
+
+def run_stats(filename, memory_mb, use_cache):
+    return chunk_csv_polar(filename, adaptive=True, memory_budget_mb=memory_mb, stats=True)
+
+
+# Aggregations served, each takes the file, the memory budget of the request in MB and the cache flag.
+# The budget is memory on top of what the server already holds (Polars, cache, other requests), not a process ceiling.
+AGGREGATIONS = {
+    "sum": run_sum,
+    "stats": run_stats,
+}
+
+
+class AggregationService:
+    """
+    Runs aggregation requests on a pool of threads that stays alive between requests.
+    Polars, its thread pool and the result cache are loaded once, so a request only pays for its own work.
+
+    Args:
+        workers (int, optional): Requests processed at the same time. Default is the number of physical CPU cores.
+        memory_mb (float, optional): Memory shared by the running requests in MB. Default is 60% of available memory.
+        default_request_mb (float, optional): Budget of a request that does not give one. Default is 512.
+    """
+
+    def __init__(self, workers=None, memory_mb=None, default_request_mb=512):
+        self.workers = workers or psutil.cpu_count(logical=False) or 1
+        if not memory_mb:
+            memory_mb = psutil.virtual_memory().available * 0.6 / (1024 * 1024)
+        self.budget = MemoryBudget(memory_mb)
+        self.default_request_mb = default_request_mb
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="aggregate")
+        self.requests = 0
+        # Requests are counted from the handler threads
+        self._requests_lock = threading.Lock()
+
+        # Warm up the Polars thread pool before the first request
+        pl.DataFrame({"a": [1, 2, 3]}).select(pl.all().sum())
+
+    def aggregate(self, request):
+        """
+        Run one request: {"path": ..., "aggregation": "sum" | "stats", "memory_mb": ..., "cache": true}.
+
+        Args:
+            request (dict): The decoded request.
+
+        Returns:
+            dict: The result of the aggregation with the time spent waiting for memory.
+
+        Raises:
+            ValueError: If the request is not valid.
+        """
+        filename = request.get("path")
+        if not filename:
+            raise ValueError("Missing path")
+        aggregation = request.get("aggregation", "sum")
+        if aggregation not in AGGREGATIONS:
+            raise ValueError(f"Unknown aggregation {aggregation}, expected one of {', '.join(AGGREGATIONS)}")
+
+        wait_start = time.time()
+        memory_mb = self.budget.acquire(float(request.get("memory_mb") or self.default_request_mb))
+        try:
+            queued = time.time() - wait_start
+            result = self.executor.submit(AGGREGATIONS[aggregation], filename, memory_mb,
+                                          request.get("cache", True)).result()
+        finally:
+            self.budget.release(memory_mb)
+        with self._requests_lock:
+            self.requests += 1
+        return dict(result, memory_budget=memory_mb, queued=queued)
+
+    def status(self):
+        return {
+            "status": "ok",
+            "workers": self.workers,
+            "requests": self.requests,
+            "memory_mb": self.budget.total_mb,
+            "memory_reserved_mb": self.budget.used_mb,
+        }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """
+    GET /health returns the status of the service, POST /aggregate runs one request given as JSON.
+    """
+
+    service = None
+
+    def address_string(self):
+        # Unix socket clients have no address
+        return self.client_address[0] if self.client_address else "unix"
+
+    def send_json(self, status, body):
+        data = json.dumps(body, default=str).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self.send_json(200, self.service.status())
+        else:
+            self.send_json(404, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/aggregate":
+            self.send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            self.send_json(200, self.service.aggregate(request))
+        except (ValueError, FileNotFoundError) as e:
+            self.send_json(400, {"error": str(e)})
+        except Exception as e:
+            self.send_json(500, {"error": str(e)})
+
+    def log_message(self, format, *args):
+        # One line per request without the default date prefix
+        print(f"{self.address_string()} {format % args}")
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(host="127.0.0.1", port=8765, unix_socket=None, workers=None, memory_mb=None):
+    """
+    Run the aggregation service until interrupted, on a TCP port or on a Unix socket.
+
+    Args:
+        host (str, optional) --host : Address to listen on. Default is 127.0.0.1.
+        port (int, optional) --port : Port to listen on. Default is 8765.
+        unix_socket (str, optional) --socket : Path of a Unix socket, used instead of the TCP port. Default is None.
+        workers (int, optional) -w : Requests processed at the same time. Default is the number of physical CPU cores.
+        memory_mb (float, optional) --memory : Memory shared by the running requests in MB. Default is 60% of available memory.
+    """
+    service = AggregationService(workers, memory_mb)
+    handler = type("ServiceRequestHandler", (RequestHandler,), {"service": service})
+
+    if unix_socket:
+        if os.path.exists(unix_socket):
+            os.remove(unix_socket)
+        server = UnixHTTPServer(unix_socket, handler)
+        address = unix_socket
+    else:
+        server = ThreadingHTTPServer((host, port), handler)
+        address = f"http://{host}:{port}"
+
+    print(f"Serving on {address} with {service.workers} workers and {service.budget.total_mb:.0f} MB")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+        if unix_socket and os.path.exists(unix_socket):
+            os.remove(unix_socket)
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self.unix_socket = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.unix_socket)
+
+
+def query(request, host="127.0.0.1", port=8765, unix_socket=None):
+    """
+    Send one aggregation request to a running service.
+
+    Args:
+        request (dict): The request, see AggregationService.aggregate.
+        host (str, optional): Address of the service. Default is 127.0.0.1.
+        port (int, optional): Port of the service. Default is 8765.
+        unix_socket (str, optional): Path of the Unix socket of the service. Default is None.
+
+    Returns:
+        dict: The result of the aggregation.
+
+    Raises:
+        RuntimeError: If the service returned an error.
+    """
+    connection = UnixHTTPConnection(unix_socket) if unix_socket else http.client.HTTPConnection(host, port)
+    try:
+        connection.request("POST", "/aggregate", json.dumps(request), {"Content-Type": "application/json"})
+        response = connection.getresponse()
+        body = json.loads(response.read())
+    finally:
+        connection.close()
+    if response.status != 200:
+        raise RuntimeError(body.get("error"))
+    return body
+
+
+if __name__ == '__main__':
+    # Set up command line argument parsing
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = subparsers.add_parser("serve", help="Run the service")
+    serve_parser.add_argument('--host',type=str,default="127.0.0.1",help="Address to listen on")
+    serve_parser.add_argument('--port',type=int,default=8765,help="Port to listen on")
+    serve_parser.add_argument('--socket',type=str,default=None,help="Listen on this Unix socket instead")
+    serve_parser.add_argument('-w',type=int,default=None,help="Requests processed at the same time")
+    serve_parser.add_argument('--memory',type=float,default=None,help="Memory shared by the requests in MB")
+
+    query_parser = subparsers.add_parser("query", help="Send a request to the service")
+    query_parser.add_argument('-f',type=str,help="Give path of the file")
+    query_parser.add_argument('-a',type=str,default="sum",choices=list(AGGREGATIONS),help="Aggregation")
+    query_parser.add_argument('-m',type=float,default=None,help="Memory budget of the request in MB")
+    query_parser.add_argument('--no-cache',action='store_true',help="Do not use the result cache")
+    query_parser.add_argument('--host',type=str,default="127.0.0.1",help="Address of the service")
+    query_parser.add_argument('--port',type=int,default=8765,help="Port of the service")
+    query_parser.add_argument('--socket',type=str,default=None,help="Unix socket of the service")
+
+    # Parse the command-line arguments
+    args:Namespace = parser.parse_args()
+
+    if args.command == "serve":
+        serve(args.host, args.port, args.socket, args.w, args.memory)
+    else:
+        start_time = time.time()
+        data = query({"path": os.path.abspath(args.f), "aggregation": args.a, "memory_mb": args.m,
+                      "cache": not args.no_cache}, args.host, args.port, args.socket)
+        data["latency"] = (time.time() - start_time) * 1000
+
+        # Print Result
+        print_result(data)
@@ -1,8 +1,11 @@
+import io
+import os
+import glob
 import polars as pl
 import psutil
 
 
-def estimate_row_size(filepath, sample_row=100):
+def estimate_row_size(filepath, sample_row=100, schema=None):
     """
     Estimate the average size of a single row in a CSV file.
     This function reads a sample of rows from the file and calculates
@@ -11,6 +14,7 @@ def estimate_row_size(filepath, sample_row=100):
     Args:
         filepath (str): Path to the CSV file.
         sample_row (int, optional): The number of rows to sample for size estimation. Default is 100.
+        schema (list, optional): dtype of every column to read the sample with. Default is None (Polars defaults).
 
     Returns:
         int: The estimated size of a single row in bytes.
@@ -22,7 +26,7 @@ def estimate_row_size(filepath, sample_row=100):
     """
     try:
         # Read csv file
-        df = pl.read_csv(filepath, n_rows=sample_row)
+        df = pl.read_csv(filepath, n_rows=sample_row, schema_overrides=schema)
         # Get size of sample rows in bytes
         size_bytes = df.estimated_size()
 
@@ -40,7 +44,7 @@ def estimate_row_size(filepath, sample_row=100):
         raise
 
 
-def get_chunk_size(filepath, num_threads=1, memory_fraction= 0.6):
+def get_chunk_size(filepath, num_threads=1, memory_fraction= 0.6, schema=None):
     """
     Calculate the chunk size (number of rows) for processing a CSV file based on available system memory.
     The chunk size is calculated to ensure that each thread processes a reasonable amount of data
@@ -50,6 +54,7 @@ def get_chunk_size(filepath, num_threads=1, memory_fraction= 0.6):
         filepath (str): Path to the CSV file.
         num_threads (int, optional): Number of threads to use for processing. Default is 1.
         memory_fraction (float, optional): The fraction of available memory to be used for processing. Default is 0.6 (60%).
+        schema (list, optional): dtype of every column, narrow dtypes fit more rows. Default is None (Polars defaults).
 
     Returns:
         int: The calculated chunk size (number of rows).
@@ -59,7 +64,7 @@ def get_chunk_size(filepath, num_threads=1, memory_fraction= 0.6):
     """
     try:
         # Estimate size of one row
-        row_size = estimate_row_size(filepath)
+        row_size = estimate_row_size(filepath, schema=schema)
 
         # Get available system memory
         available_memory = psutil.virtual_memory().available
@@ -79,4 +84,195 @@ def get_chunk_size(filepath, num_threads=1, memory_fraction= 0.6):
     except Exception as e:
         # Catch any unexpected exceptions
         print(f"Error calculating chunk size: {e}")
-        raise
\ No newline at end of file
+        raise
+
+def get_byte_ranges(filepath, num_ranges):
+    """
+    Split a CSV file into byte ranges that start and end on line boundaries.
+    Every range can be parsed on its own because no row is cut in half.
+
+    Args:
+        filepath (str): Path to the CSV file.
+        num_ranges (int): The number of ranges to split the file into.
+
+    Returns:
+        list: A list of (start, end) byte offset tuples covering the whole file.
+
+    Raises:
+        FileNotFoundError: If the file doesn't exist.
+        Exception: For any other unexpected errors.
+    """
+    try:
+        file_size = os.path.getsize(filepath)
+        num_ranges = max(1, num_ranges)
+
+        # Approximate size of each range before aligning to newlines
+        range_size = max(1, file_size // num_ranges)
+
+        ranges = []
+        with open(filepath, 'rb') as f:
+            start = 0
+            while start < file_size:
+                end = start + range_size
+                if end >= file_size:
+                    end = file_size
+                else:
+                    # Move end forward to the byte after the next newline
+                    f.seek(end)
+                    f.readline()
+                    end = min(f.tell(), file_size)
+                ranges.append((start, end))
+                start = end
+        return ranges
+    except FileNotFoundError:
+        print(f"Error: File '{filepath}' not found.")
+        raise
+    except Exception as e:
+        print(f"Error splitting file into byte ranges: {e}")
+        raise
+
+
+def merge_column_sums(total, partial):
+    """
+    Adds the column sums of one range into the running column sums.
+
+    Args:
+        total (list): Running sum of each column.
+        partial (list): Sum of each column of one range.
+
+    Returns:
+        list: Updated running sum of each column.
+    """
+    if len(partial) > len(total):
+        total.extend([0] * (len(partial) - len(total)))
+    for i, value in enumerate(partial):
+        total[i] += value or 0
+    return total
+
+
+def iter_batches(reader):
+    """
+    Iterate over the batches of a Polars batched CSV reader one at a time.
+
+    Args:
+        reader (BatchedCsvReader): Polars batched reader of the CSV file.
+
+    Yields:
+        pl.DataFrame: The next batch.
+    """
+    while True:
+        batch = reader.next_batches(1)
+        if not batch:
+            break
+        yield batch[0]
+
+
+# Integer dtypes from narrowest to widest with their range
+INTEGER_DTYPES = [
+    (pl.Int8, -2 ** 7, 2 ** 7 - 1),
+    (pl.Int16, -2 ** 15, 2 ** 15 - 1),
+    (pl.Int32, -2 ** 31, 2 ** 31 - 1),
+    (pl.Int64, -2 ** 63, 2 ** 63 - 1),
+]
+
+
+def infer_schema(filepath, samples=16, sample_size=256 * 1024, has_header=False):
+    """
+    Infer the narrowest safe dtype of every column from blocks sampled over the whole file.
+    Integer columns get the smallest integer dtype holding every sampled value, other columns keep the Polars dtype.
+
+    Args:
+        filepath (str): Path to the CSV file.
+        samples (int, optional): Number of blocks sampled, the first one is the start of the file. Default is 16.
+        sample_size (int, optional): Size of each block in bytes. Default is 256 KB.
+        has_header (bool, optional): Whether the first line is a header. Default is False.
+
+    Returns:
+        list: dtype of every column, in column order.
+
+    Raises:
+        FileNotFoundError: If the file doesn't exist.
+        polars.exceptions.PolarsError: If there is an issue reading the CSV.
+    """
+    try:
+        file_size = os.path.getsize(filepath)
+        step = max(file_size - sample_size, 0) // max(samples - 1, 1)
+
+        # Read evenly spaced blocks, each cut to complete rows
+        blocks = []
+        with open(filepath, 'rb') as f:
+            if has_header:
+                f.readline()
+            for i in range(samples):
+                offset = i * step
+                f.seek(offset)
+                if offset:
+                    f.readline()  # skip the partial row
+                block = f.read(sample_size)
+                block = block[:block.rfind(b'\n') + 1] if b'\n' in block else block
+                if block.strip():
+                    blocks.append(block)
+
+        sample = pl.concat([pl.read_csv(io.BytesIO(block), has_header=False) for block in blocks], how="vertical_relaxed")
+        bounds = sample.select(pl.all().min().name.suffix("_min"), pl.all().max().name.suffix("_max")).row(0, named=True)
+
+        schema = []
+        for col, dtype in sample.schema.items():
+            if dtype.is_integer():
+                low, high = bounds[f"{col}_min"], bounds[f"{col}_max"]
+                dtype = next(int_dtype for int_dtype, min_value, max_value in INTEGER_DTYPES
+                             if low is None or (min_value <= low and high <= max_value))
+            schema.append(dtype)
+        return schema
+    except FileNotFoundError:
+        print(f"Error: File '{filepath}' not found.")
+        raise
+    except pl.exceptions.PolarsError as e:
+        print(f"Error reading CSV with Polars: {e}")
+        raise
+
+
+def sum_exprs(schema=None):
+    """
+    Sum of every column, with Int32 columns widened to Int64 first so the accumulator cannot overflow.
+    Polars already sums Int8 and Int16 columns as Int64.
+
+    Args:
+        schema (list, optional): dtype of every column as returned by infer_schema. Default is None (no narrow columns).
+
+    Returns:
+        list: One sum expression per column, in column order.
+    """
+    if schema is None:
+        return [pl.all().sum()]
+    return [pl.nth(i).cast(pl.Int64).sum() if dtype == pl.Int32 else pl.nth(i).sum()
+            for i, dtype in enumerate(schema)]
+
+
+def expand_paths(patterns, extensions=(".csv", ".csv.gz", ".csv.bz2", ".csv.zst")):
+    """
+    Expand files, directories and glob patterns into a sorted list of unique CSV files.
+    Directories are searched recursively for files with one of the extensions.
+
+    Args:
+        patterns (list): File paths, directory paths or glob patterns such as data/2025-*.csv.
+        extensions (tuple, optional): File extensions kept when a directory is searched. Default is CSV and compressed CSV.
+
+    Returns:
+        list: Paths of the matching files.
+
+    Raises:
+        FileNotFoundError: If a pattern matches no file.
+    """
+    files = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = [os.path.join(root, name)
+                       for root, _, names in os.walk(pattern)
+                       for name in names if name.lower().endswith(tuple(extensions))]
+        else:
+            matches = [path for path in glob.glob(pattern, recursive=True) if os.path.isfile(path)]
+        if not matches:
+            raise FileNotFoundError(pattern)
+        files.update(matches)
+    return sorted(files)